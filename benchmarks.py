@@ -0,0 +1,352 @@
+### Benchmark ścieżek statystyk, rankingu i matchmakingu – bez Discorda i Supabase ###
+# Uruchomienie: python benchmarks.py [--players 1000 10000 100000] [--ops 500] [--latency 0.02]
+# Baza to LocalStatsBackend za atrapą PostgrestClient ze sztucznym opóźnieniem,
+# więc mierzona jest prawdziwa ścieżka kodu (zapytania, cache, kolejka zapisów).
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import re
+import statistics
+from bisect import bisect_right
+
+os.environ.setdefault("STATE_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_state.db"))
+
+import supabase_stats
+from local_stats import LocalStatsBackend
+from leaderboard import leaderboard
+from medals import medal_index
+from timers import TimerWheel
+from matchmaking import Matchmaker
+from user_names import user_names
+import main
+
+
+# --- atrapa PostgrestClient: te same zapytania co Supabase, dane w pamięci ---
+class FakePostgrest:
+    def __init__(self, backend: LocalStatsBackend, latency: float = 0.02, jitter: float = 0.01):
+        self.backend = backend
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self._sorted = None  # (player_ids, wiersze) posortowane – do stron po player_id
+        self._ranked = None  # (klucze, wiersze) w kolejności rankingu – jak indeks w Postgresie
+
+    async def _wait(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+
+    def _ranked_rows(self):
+        if self._ranked is None:
+            rows = sorted(self.backend.get_all(), key=lambda r: (-r["rating"], -r["wins"], r["player_id"]))
+            self._ranked = ([(-r["rating"], -r["wins"], r["player_id"]) for r in rows], rows)
+        return self._ranked
+
+    def _sorted_rows(self):
+        if self._sorted is None:
+            rows = sorted(self.backend.get_all(), key=lambda row: row["player_id"])
+            self._sorted = ([row["player_id"] for row in rows], rows)
+        return self._sorted
+
+    async def select(self, table: str, **params) -> list:
+        await self._wait()
+        limit = int(params.get("limit", 1000))
+        if table == "player_stats":
+            player_id = params.get("player_id", "")
+            if player_id.startswith("eq."):
+                row = self.backend.get(player_id[3:])
+                return [row] if row else []
+            if params.get("order", "").startswith("rating"):
+                # Strona rankingu: kursor z filtra or=(rating.lt.R,...,player_id.gt.P)
+                keys, rows = self._ranked_rows()
+                start = 0
+                found = re.search(r"rating\.lt\.([^,]+),.*wins\.eq\.(-?\d+),player_id\.gt\.([^)]+)\)", params.get("or", ""))
+                if found:
+                    start = bisect_right(keys, (-float(found.group(1)), -int(found.group(2)), found.group(3)))
+                return [dict(row) for row in rows[start:start + limit]]
+            ids, rows = self._sorted_rows()
+            start = bisect_right(ids, player_id[3:]) if player_id.startswith("gt.") else 0
+            return [dict(row) for row in rows[start:start + limit]]
+        if table == "head_to_head":
+            row = self.backend.head_to_head(params["player_a"][3:], params["player_b"][3:])
+            return [row] if row else []
+        if table == "match_history":
+            return self.backend.history_page(int(params["id"][3:]), limit)
+        if table == "player_medals":
+            return [{"player_id": p} for p in self.backend.medal_holders(params["medal_id"][3:])[:limit]]
+        raise ValueError(f"Nieobsługiwana tabela: {table}")
+
+    async def rpc(self, function: str, args: dict, idempotent: bool = False):
+        await self._wait()
+        self._sorted = self._ranked = None
+        if function == "record_match_batch":
+            self.backend.record_batch(args["deltas"], args["matches"], args.get("batch_id"))
+        elif function == "set_player_ratings":
+            self.backend.set_ratings({row["player_id"]: row["rating"] for row in args["ratings"]})
+        else:
+            raise ValueError(f"Nieobsługiwana procedura: {function}")
+
+    async def upsert(self, table: str, rows: list):
+        await self._wait()
+        self.backend.upsert_medals(rows)
+
+    async def delete(self, table: str, **params):
+        await self._wait()
+        medal_ids = params["medal_id"][len("in.("):-1].split(",")
+        self.backend.delete_medals(params["player_id"][3:], medal_ids)
+
+    async def close(self):
+        pass
+
+
+# --- atrapy obiektów Discorda ---
+class FakeRole:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeAvatar:
+    url = "https://cdn.discordapp.com/embed/avatars/0.png"
+
+
+class FakeUser:
+    def __init__(self, user_id: int, roles=()):
+        self.id = user_id
+        self.name = f"gracz{user_id}"
+        self.display_name = f"Gracz {user_id}"
+        self.mention = f"<@{user_id}>"
+        self.display_avatar = FakeAvatar()
+        self.roles = [FakeRole(name) for name in roles]
+
+
+class FakeGuild:
+    id = 1
+    roles = [FakeRole("Admin"), FakeRole("Server Booster")]
+
+    def get_member(self, user_id: int):
+        # Jak pełny cache członków; nazwy i tak idą z user_names
+        return FakeUser(user_id)
+
+
+class FakeChannel:
+    id = 1
+
+    async def send(self, *args, **kwargs):
+        pass
+
+
+class FakeResponse:
+    def __init__(self):
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+    async def send_message(self, *args, **kwargs):
+        self._done = True
+
+    async def edit_message(self, *args, **kwargs):
+        self._done = True
+
+    async def send_modal(self, modal):
+        self._done = True
+
+
+class FakeFollowup:
+    async def send(self, *args, **kwargs):
+        pass
+
+
+class FakeInteraction:
+    def __init__(self, user: FakeUser):
+        self.user = user
+        self.guild = FakeGuild()
+        self.channel = FakeChannel()
+        self.client = main.bot
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+    async def edit_original_response(self, **kwargs):
+        pass
+
+
+# --- przygotowanie danych ---
+def populate(players: int, latency: float, jitter: float) -> list:
+    backend = LocalStatsBackend()
+    deltas = []
+    for player_id in range(1, players + 1):
+        wins, losses, draws = random.randint(0, 300), random.randint(0, 300), random.randint(0, 60)
+        deltas.append({
+            "player_id": str(player_id),
+            "wins": wins, "losses": losses, "draws": draws,
+            "goals_scored": wins * 2 + draws, "goals_conceded": losses * 2 + draws,
+            "rating": random.gauss(0, 150),
+        })
+    backend.increment(deltas)
+
+    supabase_stats.db = FakePostgrest(backend, latency, jitter)
+    supabase_stats.stats_cache.clear()
+    # Cache stron rankingu (TTL) przeżyłby zmianę skali – strony z poprzedniego backendu
+    main.ranking_pages.clear()
+    leaderboard.load(backend.get_all())
+    medal_index.load(leaderboard.rows())
+    # Nazwy graczy jak po rozgrzaniu cache (LRU zatrzyma najwyżej USER_NAME_CACHE_SIZE,
+    # reszta idzie przez atrapę fetch_user z opóźnieniem API)
+    for player_id in range(1, players + 1):
+        user_names._remember(FakeUser(player_id))
+    return list(range(1, players + 1))
+
+
+# --- pomiar ---
+async def measure(name: str, operation, ops: int, concurrency: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await operation(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(ops)))
+    elapsed = time.perf_counter() - started
+    return summary(name, latencies, elapsed)
+
+
+def summary(name: str, latencies: list, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    cut = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "name": name,
+        "ops": len(latencies),
+        "ops_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": cut[49] * 1000,
+        "p95": cut[94] * 1000,
+        "p99": cut[98] * 1000,
+        "max": latencies[-1] * 1000,
+    }
+
+
+async def timed_once(name: str, coroutine) -> dict:
+    started = time.perf_counter()
+    await coroutine
+    return summary(name, [time.perf_counter() - started], time.perf_counter() - started)
+
+
+async def run_scale(players: int, args) -> list:
+    random.seed(players)
+    started = time.perf_counter()
+    ids = populate(players, args.latency, args.jitter)
+    load_time = time.perf_counter() - started
+    admin = FakeUser(0, roles=("Admin",))
+    results = [summary("przygotowanie (ranking + medale)", [load_time], load_time)]
+
+    def random_pair():
+        first, second = random.sample(ids, 2)
+        return first, second
+
+    async def statystyki(i):
+        await main.statystyki.callback(FakeInteraction(FakeUser(random.choice(ids))))
+
+    async def ranking(i):
+        await main.ranking.callback(FakeInteraction(FakeUser(random.choice(ids))))
+
+    async def ranking_cold(i):
+        # Dowolna strona poza pierwszą, bez cache: kursor z bazy + jedno zapytanie keyset
+        main.ranking_pages.clear()
+        await main.ranking_pages.get(random.randrange(1, main.ranking_pages.page_count()))
+
+    async def medale(i):
+        await main.medale.callback(FakeInteraction(FakeUser(random.choice(ids))))
+
+    async def wynik(i):
+        first, second = random_pair()
+        result = f"{random.randint(0, 5)}-{random.randint(0, 5)}"
+        await main.wynik.callback(FakeInteraction(admin), FakeUser(first), FakeUser(second), result)
+
+    async def confirm(i):
+        first, second = random_pair()
+        match_key = tuple(sorted((first, second)))
+        s1, s2 = random.randint(0, 5), random.randint(0, 5)
+        main.pending_results[match_key] = {
+            "player1": first, "player2": second, "score1": s1, "score2": s2,
+            "confirmed": False, "reported_by": first,
+        }
+        view = main.ConfirmView(first, second, s1, s2, match_key)
+        await view.confirm.callback(FakeInteraction(FakeUser(second)))
+
+    async def player_stats(i):
+        await supabase_stats.get_player_stats(str(random.choice(ids)))
+
+    for name, operation in (
+        ("/statystyki", statystyki),
+        ("/ranking", ranking),
+        ("/ranking strona > 1 (zimny cache)", ranking_cold),
+        ("/medale", medale),
+        ("/wynik", wynik),
+        ("ConfirmView.confirm", confirm),
+        ("get_player_stats", player_stats),
+    ):
+        results.append(await measure(name, operation, args.ops, args.concurrency))
+
+    results.append(await timed_once("write_queue.flush", supabase_stats.write_queue.flush()))
+    results.append(await timed_once("get_all_stats", supabase_stats.get_all_stats()))
+    results.append(matchmaking(ids))
+    return results
+
+
+def matchmaking(ids: list) -> dict:
+    # Wszyscy gracze dołączają do kolejki (wąska tolerancja – część czeka, część od razu gra)
+    queue = Matchmaker(TimerWheel(), tolerance=25, widen_per_minute=100)
+    latencies = []
+    started = time.perf_counter()
+    for player_id in ids:
+        joined = time.perf_counter()
+        queue.join(player_id, leaderboard.rating(str(player_id)), 1, 180)
+        latencies.append(time.perf_counter() - joined)
+    return summary(f"Matchmaker.join (czeka {queue.depth})", latencies, time.perf_counter() - started)
+
+
+def print_results(players: int, results: list, db_calls: int):
+    print(f"\n=== {players} graczy (zapytania do bazy: {db_calls}) ===")
+    print(f"{'operacja':<38} {'ile':>7} {'op/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for r in results:
+        print(f"{r['name']:<38} {r['ops']:>7} {r['ops_per_s']:>10.1f} {r['p50']:>9.2f} "
+              f"{r['p95']:>9.2f} {r['p99']:>9.2f} {r['max']:>9.2f}")
+
+
+async def run(args):
+    async def fetch_user(user_id: int):
+        await asyncio.sleep(args.latency + random.uniform(0, args.jitter))
+        return FakeUser(user_id)
+
+    main.bot.fetch_user = fetch_user
+    main.timer_wheel.start()
+    # Kolejka zapisów działa w tle jak w bocie (flush co STATS_FLUSH_INTERVAL)
+    supabase_stats.write_queue.start()
+    for players in args.players:
+        results = await run_scale(players, args)
+        print_results(players, results, supabase_stats.db.calls)
+    await supabase_stats.write_queue.close()
+    main.timer_wheel.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ścieżek bota bez Discorda i Supabase")
+    parser.add_argument("--players", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--ops", type=int, default=500, help="wywołań każdej operacji")
+    parser.add_argument("--concurrency", type=int, default=50, help="równoległych wywołań")
+    parser.add_argument("--latency", type=float, default=0.02, help="opóźnienie bazy (s)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="losowy dodatek do opóźnienia (s)")
+    args = parser.parse_args()
+    if args.ops < 2:
+        sys.exit("--ops musi być co najmniej 2")
+    asyncio.run(run(args))
@@ -0,0 +1,41 @@
+import time
+from metrics import observe_command_latency
+
+# Powyżej tego czasu (od defer do followupu) wypisujemy ostrzeżenie w logach
+SLOW_FOLLOWUP_SECONDS = 2.5
+
+
+# --- odroczona odpowiedź na interakcję ---
+# Komenda najpierw wysyła defer() (mieści się w 3 s limicie Discorda), potem
+# wykonuje wolną pracę i kończy followupem. Czas defer -> followup trafia do histogramu.
+class DeferredReply:
+    def __init__(self, interaction, command: str):
+        self.interaction = interaction
+        self.command = command
+        self.started = time.perf_counter()
+
+    def _record(self):
+        elapsed = time.perf_counter() - self.started
+        observe_command_latency(self.command, elapsed)
+        if elapsed > SLOW_FOLLOWUP_SECONDS:
+            print(f"⚠️ Wolna komenda {self.command}: {elapsed:.2f} s od defer do odpowiedzi")
+
+    async def send(self, *args, **kwargs):
+        # Followup do komendy (zastępuje komunikat "Bot myśli...")
+        message = await self.interaction.followup.send(*args, **kwargs)
+        self._record()
+        return message
+
+    async def edit(self, **kwargs):
+        # Dla przycisków: edycja wiadomości, do której należy widok
+        message = await self.interaction.edit_original_response(**kwargs)
+        self._record()
+        return message
+
+
+async def defer_response(interaction, command: str, ephemeral: bool = False, thinking: bool = True) -> DeferredReply:
+    # thinking=False dla przycisków – odpowiedź będzie edycją istniejącej wiadomości
+    reply = DeferredReply(interaction, command)
+    if not interaction.response.is_done():
+        await interaction.response.defer(ephemeral=ephemeral, thinking=thinking)
+    return reply
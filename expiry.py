@@ -0,0 +1,86 @@
+import os
+import time
+from collections import Counter
+
+# Czas życia porzuconego stanu (sekundy), liczony od ostatniej aktywności
+MATCH_TTL = float(os.getenv("MATCH_TTL", 3 * 3600))  # mecz bez zgłoszonego wyniku
+PENDING_RESULT_TTL = float(os.getenv("PENDING_RESULT_TTL", 24 * 3600))  # wynik bez potwierdzenia
+SIGNUP_TTL = float(os.getenv("SIGNUP_TTL", 7 * 86400))  # zapisy do turnieju, który nie wystartował
+TOURNAMENT_ROUND_TTL = float(os.getenv("TOURNAMENT_ROUND_TTL", 3 * 86400))  # runda turnieju bez postępu
+
+
+# --- wygasanie stanu na jednym kole czasowym ---
+# Każdy wpis ma klucz (np. "match:1:2"), rodzaj i termin. Termin jest zapisany
+# w StateStore, więc po restarcie timery są odtwarzane z pozostałym czasem.
+# Ponowne schedule() dla tego samego klucza przesuwa termin (O(1) na kole).
+class ExpiryScheduler:
+    def __init__(self, wheel, deadlines):
+        self.wheel = wheel
+        self._deadlines = deadlines  # klucz: {"kind", "at" (czas unixowy), "args"}
+        self._handles = {}  # klucz: uchwyt timera
+        self._handlers = {}  # rodzaj: funkcja(*args)
+        self._views = {}  # klucz widoku: View – żeby zatrzymać go przy wygaśnięciu
+        self.expired = Counter()  # rodzaj: ile wpisów wygasło
+
+    def handler(self, kind: str):
+        # Dekorator: funkcja sprzątająca dany rodzaj wpisu
+        def register(callback):
+            self._handlers[kind] = callback
+            return callback
+        return register
+
+    def schedule(self, kind: str, key: str, ttl: float, *args):
+        self._cancel_timer(key)
+        self._deadlines[key] = {"kind": kind, "at": time.time() + ttl, "args": list(args)}
+        self._handles[key] = self.wheel.schedule(ttl, self._fire, key)
+
+    def cancel(self, key: str):
+        self._cancel_timer(key)
+        self._deadlines.pop(key, None)
+
+    def __contains__(self, key: str):
+        return key in self._deadlines
+
+    def _cancel_timer(self, key: str):
+        handle = self._handles.pop(key, None)
+        if handle is not None:
+            self.wheel.cancel(handle)
+
+    def _fire(self, key: str):
+        self._handles.pop(key, None)
+        record = self._deadlines.pop(key, None)
+        if record is None:
+            return None
+        self.expired[record["kind"]] += 1
+        return self._handlers[record["kind"]](*record["args"])
+
+    def restore(self) -> int:
+        # Po starcie: timery dla zapisanych terminów (przeterminowane – w pierwszym ticku)
+        now = time.time()
+        for key, record in list(self._deadlines.items()):
+            if record["kind"] not in self._handlers:
+                del self._deadlines[key]
+                continue
+            self._cancel_timer(key)
+            self._handles[key] = self.wheel.schedule(max(0.0, record["at"] - now), self._fire, key)
+        return len(self._handles)
+
+    # --- żywe obiekty View ---
+    def track_view(self, key: str, view):
+        # Nowy widok pod tym samym kluczem (np. kolejna runda turnieju) zastępuje stary
+        previous = self._views.get(key)
+        if previous is not None and previous is not view:
+            previous.stop()
+        self._views[key] = view
+
+    def stop_view(self, key: str):
+        view = self._views.pop(key, None)
+        if view is not None:
+            view.stop()
+
+    def stats(self) -> dict:
+        return {
+            "scheduled": Counter(record["kind"] for record in self._deadlines.values()),
+            "expired": dict(self.expired),
+            "views": len(self._views),
+        }
@@ -0,0 +1,46 @@
+from aiohttp import web
+
+
+# --- serwer zdrowia i metryk (aiohttp na pętli bota) ---
+# "/" – żeby hosting (Render) widział działającą usługę, "/health" – stan bota w JSON
+# (503 dopóki bot nie jest gotowy), "/metrics" – metryki w formacie Prometheusa.
+class HealthServer:
+    def __init__(self, port: int, health, metrics, host: str = "0.0.0.0"):
+        # health() -> dict z kluczem "ready", metrics() -> lista linii tekstu Prometheusa
+        self.port = port
+        self.host = host
+        self.health = health
+        self.metrics = metrics
+        self._runner = None
+
+    def _app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/", self._index)
+        app.router.add_get("/health", self._health)
+        app.router.add_get("/metrics", self._metrics)
+        return app
+
+    async def _index(self, request):
+        return web.Response(text="Discord bot is running.")
+
+    async def _health(self, request):
+        report = self.health()
+        return web.json_response(report, status=200 if report.get("ready") else 503)
+
+    async def _metrics(self, request):
+        body = "\n".join(self.metrics()) + "\n"
+        return web.Response(text=body, content_type="text/plain", charset="utf-8",
+                            headers={"X-Prometheus-Format": "0.0.4"})
+
+    async def start(self):
+        if self._runner is not None:
+            return
+        self._runner = web.AppRunner(self._app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        print(f"Serwer zdrowia i metryk działa na porcie {self.port}")
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+import functools
+import threading
+from collections import Counter, deque
+from discord import ui
+from metrics import Histogram
+
+# Powyżej tego czasu callback uznajemy za wolny (log + zrzut profilera, jeśli włączony)
+SLOW_HANDLER_SECONDS = float(os.getenv("SLOW_HANDLER_SECONDS", 0.5))
+# Profiler próbkujący jest opcjonalny – PROFILE_SLOW_HANDLERS=1
+PROFILE_SLOW_HANDLERS = os.getenv("PROFILE_SLOW_HANDLERS", "0") == "1"
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.005))
+
+# Czas wykonania całego callbacku (komendy lub przycisku), od wywołania do powrotu
+handler_latency = {}  # nazwa: Histogram
+handler_max = {}  # nazwa: najdłuższy czas
+slow_reports = deque(maxlen=20)  # ostatnie wolne wywołania: (nazwa, sekundy, [(stos, próbki)])
+
+
+# --- profiler próbkujący ---
+# Osobny wątek co PROFILE_INTERVAL zapisuje stos wątku pętli zdarzeń. Po wolnym
+# callbacku bierzemy próbki z jego okna czasowego – widać, co blokowało pętlę.
+class SamplingProfiler:
+    def __init__(self, interval: float = PROFILE_INTERVAL, depth: int = 12, keep_seconds: float = 30.0):
+        self.interval = interval
+        self.depth = depth
+        self._samples = deque(maxlen=int(keep_seconds / interval))  # (czas, stos)
+        self._thread = None
+        self._target = None
+        self._stop = threading.Event()
+
+    def start(self):
+        # Wołane z wątku pętli zdarzeń – ten wątek będziemy próbkować
+        if self._thread is not None:
+            return
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            # Pętla czekająca w select() nic nie blokuje – pomijamy
+            if frame is None or frame.f_code.co_name in ("select", "poll", "epoll"):
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+                frame = frame.f_back
+            self._samples.append((time.perf_counter(), tuple(stack)))
+
+    def between(self, start: float, end: float, top: int = 5) -> list:
+        counts = Counter(stack for at, stack in list(self._samples) if start <= at <= end)
+        return counts.most_common(top)
+
+    def stop(self):
+        self._stop.set()
+
+
+profiler = SamplingProfiler()
+
+
+def record(name: str, started: float):
+    ended = time.perf_counter()
+    elapsed = ended - started
+    histogram = handler_latency.get(name)
+    if histogram is None:
+        histogram = handler_latency[name] = Histogram()
+    histogram.observe(elapsed)
+    handler_max[name] = max(handler_max.get(name, 0.0), elapsed)
+    if elapsed < SLOW_HANDLER_SECONDS:
+        return
+
+    stacks = profiler.between(started, ended) if PROFILE_SLOW_HANDLERS else []
+    slow_reports.append((name, elapsed, stacks))
+    print(f"⚠️ Wolny callback {name}: {elapsed:.2f} s")
+    for stack, samples in stacks:
+        print(f"   {samples} próbek: " + " <- ".join(stack[:4]))
+
+
+def timed(name: str, callback):
+    @functools.wraps(callback)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await callback(*args, **kwargs)
+        finally:
+            record(name, started)
+    return wrapper
+
+
+def instrument_tree(tree):
+    # Owija callback każdej komendy slash (także w grupach) pomiarem czasu
+    pending = list(tree.get_commands())
+    while pending:
+        command = pending.pop()
+        if hasattr(command, "commands"):
+            pending.extend(command.commands)
+            continue
+        if not getattr(command._callback, "__instrumented__", False):
+            command._callback = timed(f"/{command.qualified_name}", command._callback)
+            command._callback.__instrumented__ = True
+
+
+# --- widok z pomiarem czasu każdego przycisku ---
+class InstrumentedView(ui.View):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for item in self.children:
+            callback = getattr(item.callback, "callback", item.callback)
+            item.callback = timed(f"{type(self).__name__}.{callback.__name__}", item.callback)
+
+
+def percentiles() -> list:
+    # [(nazwa, liczba wywołań, p50, p95, p99, max)] – od najwolniejszego p95
+    rows = [
+        (name, h.count, h.quantile(0.5), h.quantile(0.95), h.quantile(0.99), handler_max.get(name, 0.0))
+        for name, h in handler_latency.items()
+    ]
+    return sorted(rows, key=lambda row: row[3], reverse=True)
@@ -0,0 +1,77 @@
+from bisect import bisect_left, insort
+from local_stats import STAT_FIELDS, DEFAULT_RATING, empty_stats
+
+
+def win_ratio(player: dict) -> float:
+    total_games = player["wins"] + player["losses"] + player["draws"]
+    return player["wins"] / total_games if total_games > 0 else 0
+
+
+# --- ranking trzymany w pamięci i aktualizowany przy każdym zapisie statystyk ---
+# Klucze są posortowane rosnąco, więc pierwsze k elementów to top k:
+# najpierw rating Elo, potem liczba wygranych, na końcu player_id (stała kolejność remisów).
+class Leaderboard:
+    def __init__(self):
+        self._keys = []
+        self._rows = {}  # player_id: stats
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._rows)
+
+    @staticmethod
+    def _key(row: dict) -> tuple:
+        return (-row["rating"], -row["wins"], row["player_id"])
+
+    def load(self, rows: list):
+        self._rows = {row["player_id"]: {**empty_stats(row["player_id"]), **row} for row in rows}
+        self._keys = sorted(self._key(row) for row in self._rows.values())
+        self.loaded = True
+
+    def apply(self, deltas: list):
+        if not self.loaded:
+            return
+        for delta in deltas:
+            player_id = delta["player_id"]
+            row = self._rows.get(player_id)
+            if row is None:
+                row = self._rows[player_id] = empty_stats(player_id)
+            else:
+                self._remove_key(self._key(row))
+            for field in STAT_FIELDS:
+                row[field] += delta.get(field, 0)
+            insort(self._keys, self._key(row))
+
+    def _remove_key(self, key: tuple):
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def rating(self, player_id: str) -> float:
+        row = self._rows.get(player_id)
+        return row["rating"] if row else DEFAULT_RATING
+
+    def get(self, player_id: str):
+        row = self._rows.get(player_id)
+        return dict(row) if row else None
+
+    def rows(self):
+        return iter(self._rows.values())
+
+    def rank(self, player_id: str):
+        # Miejsce w rankingu (od 1) jednym bisect – bez sortowania wszystkich graczy
+        row = self._rows.get(player_id)
+        if row is None:
+            return None
+        return bisect_left(self._keys, self._key(row)) + 1
+
+    def cursor(self, position: int):
+        # Klucz (rating, wygrane, player_id) gracza na danej pozycji (od 0) – początek
+        # następnej strony w zapytaniu do bazy (keyset pagination)
+        if not 0 <= position < len(self._keys):
+            return None
+        rating, wins, player_id = self._keys[position]
+        return -rating, -wins, player_id
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,131 @@
+import threading
+
+# Wszystkie pola są addytywne – zapisy to zawsze delty (także rating Elo)
+STAT_FIELDS = ("wins", "losses", "draws", "goals_scored", "goals_conceded", "rating")
+DEFAULT_RATING = 1000.0
+
+
+def empty_stats(player_id: str) -> dict:
+    stats = {"player_id": player_id}
+    for field in STAT_FIELDS:
+        stats[field] = 0
+    stats["rating"] = DEFAULT_RATING
+    return stats
+
+
+# --- bilans bezpośrednich meczów (tabela head_to_head) ---
+# Para jest zawsze posortowana jak match_key w main.py: tuple(sorted((p1, p2)))
+H2H_FIELDS = ("wins_a", "wins_b", "draws", "goals_a", "goals_b")
+
+
+def pair_key(player1, player2) -> tuple:
+    return tuple(sorted((int(player1), int(player2))))
+
+
+def empty_head_to_head(player_a, player_b) -> dict:
+    row = {"player_a": str(player_a), "player_b": str(player_b), "last_played": None}
+    for field in H2H_FIELDS:
+        row[field] = 0
+    return row
+
+
+def add_match(row: dict, match: dict):
+    # Dolicza jeden wiersz match_history do bilansu pary (row["player_a"] < row["player_b"])
+    if str(match["player1"]) == row["player_a"]:
+        goals_a, goals_b = match["score1"], match["score2"]
+    else:
+        goals_a, goals_b = match["score2"], match["score1"]
+    row["wins_a"] += goals_a > goals_b
+    row["wins_b"] += goals_b > goals_a
+    row["draws"] += goals_a == goals_b
+    row["goals_a"] += goals_a
+    row["goals_b"] += goals_b
+    played_at = match.get("played_at")
+    if played_at and (row["last_played"] is None or played_at > row["last_played"]):
+        row["last_played"] = played_at
+
+
+# --- lokalny odpowiednik tabeli player_stats i procedury increment_player_stats ---
+# Używany do testów i uruchamiania bota bez Supabase (STATS_BACKEND=local).
+class LocalStatsBackend:
+    def __init__(self):
+        self._rows = {}
+        self._history = []  # match_history, id = pozycja + 1
+        self._medals = {}  # (player_id, medal_id): source
+        self._h2h = {}  # pair_key: wiersz head_to_head
+        self._batches = set()  # applied_batches
+        self._lock = threading.Lock()
+
+    def get(self, player_id: str):
+        with self._lock:
+            row = self._rows.get(player_id)
+            return dict(row) if row else None
+
+    def get_all(self) -> list:
+        with self._lock:
+            return [dict(row) for row in self._rows.values()]
+
+    def increment(self, deltas: list):
+        # Tak jak procedura w bazie: wszystkie delty w jednej "transakcji"
+        with self._lock:
+            for delta in deltas:
+                player_id = delta["player_id"]
+                row = self._rows.setdefault(player_id, empty_stats(player_id))
+                for field in STAT_FIELDS:
+                    row[field] += delta.get(field, 0)
+
+    def leaderboard_page(self, after, limit: int) -> list:
+        # Odpowiednik ORDER BY rating DESC, wins DESC, player_id + warunku "po kluczu after"
+        with self._lock:
+            rows = sorted(self._rows.values(), key=lambda r: (-r["rating"], -r["wins"], r["player_id"]))
+        if after is not None:
+            rating, wins, player_id = after
+            rows = [r for r in rows if (-r["rating"], -r["wins"], r["player_id"]) > (-rating, -wins, player_id)]
+        return [dict(row) for row in rows[:limit]]
+
+    def set_ratings(self, ratings: dict):
+        # Odpowiednik procedury set_player_ratings (pełne przeliczenie rankingu)
+        with self._lock:
+            for player_id, rating in ratings.items():
+                row = self._rows.setdefault(player_id, empty_stats(player_id))
+                row["rating"] = rating
+
+    def record_batch(self, deltas: list, matches: list, batch_id: str = None):
+        # Odpowiednik procedury record_match_batch (statystyki, historia i bilans par)
+        with self._lock:
+            if batch_id is not None:
+                if batch_id in self._batches:
+                    return
+                self._batches.add(batch_id)
+        self.increment(deltas)
+        with self._lock:
+            for match in matches:
+                self._history.append({"id": len(self._history) + 1, **match})
+                key = pair_key(match["player1"], match["player2"])
+                row = self._h2h.get(key)
+                if row is None:
+                    row = self._h2h[key] = empty_head_to_head(*key)
+                add_match(row, match)
+
+    def head_to_head(self, player_a: str, player_b: str):
+        with self._lock:
+            row = self._h2h.get((int(player_a), int(player_b)))
+            return dict(row) if row else None
+
+    def history_page(self, after_id: int, limit: int) -> list:
+        with self._lock:
+            return [dict(row) for row in self._history[after_id:after_id + limit]]
+
+    def upsert_medals(self, rows: list):
+        with self._lock:
+            for row in rows:
+                self._medals[(row["player_id"], row["medal_id"])] = row["source"]
+
+    def delete_medals(self, player_id: str, medal_ids: list):
+        with self._lock:
+            for medal_id in medal_ids:
+                self._medals.pop((player_id, medal_id), None)
+
+    def medal_holders(self, medal_id: str) -> list:
+        with self._lock:
+            return [player_id for player_id, medal in self._medals if medal == medal_id]
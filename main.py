@@ -3,47 +3,130 @@
 import discord
 from discord.ext import commands
 from discord import app_commands, ui, Interaction, User
-from discord.ui import View
 import os
 from dotenv import load_dotenv
 from typing import Optional
-from supabase_stats import get_player_stats, update_player_stats, get_all_stats
+from supabase_stats import (
+    get_player_stats, get_all_stats, enqueue_match_stats, write_queue, on_stats_change, on_stats_flushed,
+    stream_match_history, set_ratings, close as close_stats,
+    get_medal_holders, queue_medal_changes, backfill_medals, stats_cache, get_head_to_head,
+    aggregate_matches, import_matches,
+)
+from medals import MEDALE, RECZNE_MEDALE, medal_rules, medal_index
+from rating import RatingRecomputation, RECOMPUTE_CHUNK
+from leaderboard import leaderboard, win_ratio
+from user_names import user_names
+from deferred import defer_response
+from state_store import StateStore
+from timers import timer_wheel
+from expiry import ExpiryScheduler, MATCH_TTL, PENDING_RESULT_TTL, SIGNUP_TTL, TOURNAMENT_ROUND_TTL
+from matchmaking import Matchmaker
+from tournament_bracket import Bracket, FORMATY
+from message_updates import message_updates
+from permissions import role_index, require_roles, NO_PERMISSION, ADMIN, HELPER, TURNIEJ, GRACZ, BOOSTER
+from member_cache import member_cache, client_options, process_memory, LOW_MEMORY
+from sharding import sharded, shard_options, is_primary, shard_label, shard_file
+from shared_state import create_match_claims, create_stats_feed, STATS_FEED_INTERVAL
+from metrics import command_latency, loop_lag, render_metric, render_histogram
+from health_server import HealthServer
+from ranking_pages import RankingPages
+from result_import import iter_results
+from instrumentation import (
+    InstrumentedView, instrument_tree, profiler, handler_latency, percentiles, slow_reports,
+    PROFILE_SLOW_HANDLERS,
+)
 import asyncio
 import aiohttp
 from typing import Optional
-from typing import cast
 from datetime import timedelta
-import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import csv
+import json
+import math
+import time
+import hashlib
+import traceback
+import signal
+import tempfile
 
 load_dotenv()
-
-intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+# Początek startu procesu – do pomiaru czasu do gotowości (cold start na Render)
+PROCESS_STARTED = time.perf_counter()
+
+# Intencje i cache członków zależą od trybu (LOW_MEMORY=1 – minimalny zestaw)
+if sharded():
+    # AUTO_SHARD=1 albo SHARD_COUNT/SHARD_IDS – jeden proces na zakres shardów
+    bot = commands.AutoShardedBot(command_prefix="!", **client_options(), **shard_options())
+else:
+    bot = commands.Bot(command_prefix="!", **client_options())
 TOKEN = os.getenv("TOKEN")
-active_matches = {}  # user_id: opponent_id
-pending_results = {}  # match_key: wynik
-confirmed_matches = set()  # para potwierdzonych meczy
-tournaments = {}  # message_id: {name, limit, players}
-CHANNEL_ID = 1397154952903917658  # ID twojego kanału
-
-MEDALE = {
-    "zwyciezca_turnieju_1": {
-        "nazwa": "🏆 Zwycięzca Pierwszego Turnieju",
-        "kolor": 0xFFD700
-    },
-    "uczestnik_turnieju_1": {
-        "nazwa": "🎖️ Uczestnik Pierwszego Turnieju",
-        "kolor": 0xAAAAAA
-    },
-    "krol_strzelcow_turnieju_1": {
-        "nazwa": "👑 Król Strzelców Pierwszego Turnieju",
-        "kolor": 0xFF4500
-    }
-}
-awarded_medals = {}  # user_id (str) : list of medal_id (np. ["zwyciezca_turnieju_1"])
+
+# Stan przetrwa restart (SQLite w trybie WAL, zapisy paczkami w tle); przy shardach
+# każdy proces ma własny plik (turnieje i widoki należą do serwerów jego shardów)
+state = StateStore(os.getenv("STATE_DB_PATH", shard_file("bot_state.db")))
+# user_id: opponent_id – wspólne dla shardów (SHARED_STATE=sqlite), domyślnie w StateStore
+active_matches = create_match_claims(state.dict("active_matches"))
+pending_results = state.dict("pending_results")  # match_key: wynik
+confirmed_matches = state.set("confirmed_matches")  # para potwierdzonych meczy
+tournaments = state.dict("tournaments")  # message_id: {name, limit, format, players, bracket}
+persistent_views = state.dict("views")  # klucz widoku: {"kind": ..., "args": [...]}
+bot_meta = state.dict("meta")  # np. odcisk drzewa komend z ostatniej synchronizacji
+# Terminy wygaśnięcia porzuconych meczów, wyników i zapisów (jedno koło czasowe)
+expiry = ExpiryScheduler(timer_wheel, state.dict("expiry"))
+
+awarded_medals = state.dict("awarded_medals")  # user_id (str) : list of medal_id (np. ["zwyciezca_turnieju_1"])
+
+# Ranking w pamięci aktualizowany przy każdym zapisie statystyk
+on_stats_change(leaderboard.apply)
+
+
+def update_medals(deltas: list):
+    # Rejestrowane po leaderboard.apply – wiersze rankingu mają już nowe statystyki
+    if not medal_index.loaded:
+        return
+    for delta in deltas:
+        row = leaderboard.get(delta["player_id"])
+        if row is None:
+            continue
+        added, removed = medal_index.update(row["player_id"], row)
+        if added or removed:
+            queue_medal_changes(row["player_id"], added, removed)
+
+on_stats_change(update_medals)
+
+# Zmiany statystyk z innych shardów (SHARED_STATE=sqlite); przy jednym procesie nic nie robi
+stats_feed = create_stats_feed()
+on_stats_flushed(stats_feed.publish)
+
+
+def apply_shared_stats(deltas: list):
+    # Paczka zapisana przez inny proces: ranking i indeks medali jak u siebie, ale bez
+    # zapisu medali (zrobił to tamten proces), a cache tych graczy czyta od nowa z bazy
+    for delta in deltas:
+        stats_cache.invalidate(delta["player_id"])
+    leaderboard.apply(deltas)
+    if not medal_index.loaded:
+        return
+    for delta in deltas:
+        row = leaderboard.get(delta["player_id"])
+        if row is not None:
+            medal_index.update(row["player_id"], row)
+
+
+async def follow_shared_stats():
+    while True:
+        await asyncio.sleep(STATS_FEED_INTERVAL)
+        try:
+            changes = stats_feed.poll()
+            if None in changes:
+                # Inny proces przeliczył ratingi – wszystko od nowa z bazy
+                stats_cache.clear()
+                leaderboard.load(await get_all_stats())
+                ranking_pages.clear()
+                continue
+            for deltas in changes:
+                apply_shared_stats(deltas)
+        except Exception as e:
+            print(f"Błąd odczytu zmian statystyk innych shardów: {e}")
 
 
 
@@ -98,16 +181,22 @@ class ScoreModal(ui.Modal, title="Wpisz wynik meczu"):
         }
 
         view = ConfirmView(p1, p2, s1, s2, match_key)
+        remember_view(f"confirm:{p1}:{p2}", "confirm", p1, p2, s1, s2)
+        expiry.track_view(f"confirm:{p1}:{p2}", view)
+        # Niepotwierdzony wynik wygasa razem z meczem
+        expiry.schedule("pending", f"match:{p1}:{p2}", PENDING_RESULT_TTL, p1, p2)
         await interaction.response.send_message(
             f"Wynik zgłoszony: {s1} - {s2}. Drugi gracz proszony o potwierdzenie.",
             view=view
         )
 
 #turniej#
-class SignupView(discord.ui.View):
+class SignupView(InstrumentedView):
     def __init__(self, message_id: int):
         super().__init__(timeout=None)
         self.message_id = message_id
+        # Stałe custom_id – przycisk działa także po restarcie bota
+        self.signup.custom_id = f"turniej:zapisz:{message_id}"
 
     @discord.ui.button(label="Zapisz się", style=discord.ButtonStyle.primary)
     async def signup(self, interaction: Interaction, button: discord.ui.Button):
@@ -128,29 +217,37 @@ class SignupView(discord.ui.View):
             return
 
         tournament["players"].append(user_id)
+        tournaments.save(message_id)
         remaining = tournament["limit"] - len(tournament["players"])
-        zapisani = "\n".join(f"<@{uid}>" for uid in tournament["players"])
-
-        embed = discord.Embed(
-            title=f"🎮 Turniej: {tournament['name']}",
-            description=f"Zapisani gracze:\n{zapisani}\n\nPozostało miejsc: **{remaining}**",
-            color=discord.Color.green()
-        )
-        await interaction.message.edit(embed=embed)
+        # Potwierdzenie od razu, lista na wiadomości odświeża się zbiorczo
+        await interaction.response.send_message("✅ Zapisano do turnieju!", ephemeral=True)
+        message_updates.schedule(interaction.message, embed=lambda: self.signup_embed(tournament))
 
         if remaining == 0:
-            # Wyłącz przycisk
+            # Wyłącz przycisk (w tej samej edycji co lista graczy)
             button.disabled = True
-            await interaction.message.edit(view=self)
+            message_updates.schedule(interaction.message, view=self)
+            forget_view(f"signup:{message_id}")
+            expiry.cancel(f"signup:{message_id}")
 
             # Wyślij wiadomość o rozpoczęciu turnieju
             await interaction.channel.send(
                 f"🏁 Zapisy do turnieju **{tournament['name']}** zostały zakończone! Turniej rozpoczyna się teraz!"
             )
-        
-        await interaction.response.send_message("✅ Zapisano do turnieju!", ephemeral=True)
+            # Drabinka i pierwsza runda w tle – klikający dostaje odpowiedź od razu
+            bot.loop.create_task(start_tournament(message_id, interaction.channel))
+
+    @staticmethod
+    def signup_embed(tournament: dict) -> discord.Embed:
+        remaining = tournament["limit"] - len(tournament["players"])
+        zapisani = "\n".join(f"<@{uid}>" for uid in tournament["players"])
+        return discord.Embed(
+            title=f"🎮 Turniej: {tournament['name']}",
+            description=f"Zapisani gracze:\n{zapisani}\n\nPozostało miejsc: **{remaining}**",
+            color=discord.Color.green()
+        )
 
-class ChallengeAcceptView(ui.View):
+class ChallengeAcceptView(InstrumentedView):
     def __init__(self, challenger: int, opponent: int, timeout: float = 300):
         super().__init__(timeout=timeout)
         self.challenger = challenger
@@ -166,13 +263,13 @@ class ChallengeAcceptView(ui.View):
             )
             return
 
-        # Zabezpieczenie – czy nie są już w meczu
-        if str(self.challenger) in active_matches or str(self.opponent) in active_matches:
+        # Zabezpieczenie – czy nie są już w meczu (zajęcie obu graczy naraz, także między shardami)
+        if not active_matches.claim(self.challenger, self.opponent):
             await interaction.response.send_message("❌ Ktoś z was już jest w meczu.", ephemeral=True)
             return
 
-        active_matches[self.challenger] = self.opponent
-        active_matches[self.opponent] = self.challenger
+        matchmaker.leave(self.challenger)
+        matchmaker.leave(self.opponent)
 
         for child in self.children:
             child.disabled = True
@@ -184,7 +281,7 @@ class ChallengeAcceptView(ui.View):
                 title="🏁 Mecz rozpoczęty!",
                 description=f"<@{self.challenger}> vs <@{self.opponent}>. Po meczu kliknij 'Wpisz wynik'."
             ),
-            view=ResultView(self.challenger, self.opponent)
+            view=ResultView.remembered(self.challenger, self.opponent)
         )
 
     async def on_timeout(self):
@@ -193,11 +290,8 @@ class ChallengeAcceptView(ui.View):
                 child.disabled = True
             await self.message.edit(content="⌛ Czas na akceptację wyzwania minął.", view=self)
 
-        if str(self.challenger) in active_matches:
-            del active_matches[str(self.challenger)]
 
-
-class ConfirmView(View):
+class ConfirmView(InstrumentedView):
     def __init__(self, player1, player2, s1, s2, match_key):
         super().__init__(timeout=None)
         self.player1 = player1
@@ -205,6 +299,10 @@ class ConfirmView(View):
         self.s1 = s1
         self.s2 = s2
         self.match_key = match_key
+        # Stałe custom_id – przyciski działają także po restarcie bota
+        self.confirm.custom_id = f"wynik:potwierdz:{player1}:{player2}"
+        self.reject.custom_id = f"wynik:odrzuc:{player1}:{player2}"
+        self.rematch.custom_id = f"wynik:rewanz:{player1}:{player2}"
 
     @discord.ui.button(label="Potwierdź wynik", style=discord.ButtonStyle.success)
     async def confirm(self, interaction: Interaction, button: discord.ui.Button):
@@ -221,26 +319,14 @@ class ConfirmView(View):
             await interaction.response.send_message("❌ Nie możesz potwierdzić własnego zgłoszenia wyniku.", ephemeral=True)
             return
 
+        # Oznacz przed pierwszym await, żeby drugie kliknięcie nie zapisało meczu dwa razy
+        match_info["confirmed"] = True
+        reply = await defer_response(interaction, "potwierdz_wynik", thinking=False)
 
-        # Aktualizacja statystyk
-        p1_stats = {
-            "wins": 1 if self.s1 > self.s2 else 0,
-            "losses": 1 if self.s1 < self.s2 else 0,
-            "draws": 1 if self.s1 == self.s2 else 0,
-            "goals_scored": self.s1,
-            "goals_conceded": self.s2,
-        }
-        p2_stats = {
-            "wins": 1 if self.s2 > self.s1 else 0,
-            "losses": 1 if self.s2 < self.s1 else 0,
-            "draws": 1 if self.s2 == self.s1 else 0,
-            "goals_scored": self.s2,
-            "goals_conceded": self.s1,
-        }
-
-        await update_player_stats(str(self.player1), **p1_stats)
-        await update_player_stats(str(self.player2), **p2_stats)
-        pending_results[self.match_key]["confirmed"] = True
+        # Statystyki i historia trafiają do kolejki zapisów – odpowiadamy od razu
+        ratings = await current_ratings(self.player1, self.player2)
+        enqueue_match_stats(self.player1, self.player2, self.s1, self.s2, ratings,
+                            source="mecz", reported_by=match_info["reported_by"])
 
         if self.s1 > self.s2:
             msg = f"<@{self.player1}> wygrał z <@{self.player2}> {self.s1}-{self.s2}!"
@@ -249,8 +335,18 @@ class ConfirmView(View):
         else:
             msg = f"🤝 Remis {self.s1}-{self.s2} między <@{self.player1}> a <@{self.player2}>."
         pending_results.pop(self.match_key, None)
+        # Mecz zakończony – gracze mogą szukać kolejnego
+        active_matches.release(self.player1, self.player2)
+        forget_view(f"confirm:{self.player1}:{self.player2}")
+        forget_view(f"result:{self.player1}:{self.player2}")
+        expiry.cancel(f"match:{self.player1}:{self.player2}")
+        if self.match_key in tournament_matches:
+            # Mecz turniejowy – zamiast rewanżu drabinka idzie dalej
+            await reply.edit(content=msg, view=None)
+            await report_tournament_result(self.player1, self.player2, self.s1, self.s2, interaction.channel)
+            return
         view = RematchView(self.player1, self.player2)
-        await interaction.response.edit_message(content=msg + "\nKliknij poniżej, aby zagrać rewanż.", view=view)
+        await reply.edit(content=msg + "\nKliknij poniżej, aby zagrać rewanż.", view=view)
 
     @discord.ui.button(label="Odrzuć wynik", style=discord.ButtonStyle.danger)
     async def reject(self, interaction: Interaction, button: discord.ui.Button):
@@ -260,6 +356,9 @@ class ConfirmView(View):
 
         if self.match_key in pending_results:
             del pending_results[self.match_key]
+        forget_view(f"confirm:{self.player1}:{self.player2}")
+        # Mecz trwa dalej – znowu liczy się czas na zgłoszenie wyniku
+        expiry.schedule("match", f"match:{self.player1}:{self.player2}", MATCH_TTL, self.player1, self.player2)
 
         view = RematchView(self.player1, self.player2)
         await interaction.response.edit_message(content="❌ Wynik został odrzucony. Możesz zgłosić wynik ponownie.", view=view)
@@ -281,7 +380,7 @@ class ConfirmView(View):
 
 
 ### === PRZYCISK REWANŻU Z AKCEPTACJĄ === ###
-class RematchView(ui.View):
+class RematchView(InstrumentedView):
     def __init__(self, player1, player2):
         super().__init__(timeout=60)
         self.player1 = player1
@@ -304,7 +403,7 @@ class RematchView(ui.View):
         )
 
 ### === PRZYCISK AKCEPTACJI REWANŻU === ###
-class RematchAcceptView(ui.View):
+class RematchAcceptView(InstrumentedView):
     def __init__(self, challenger: int, opponent: int, timeout=60):
         super().__init__(timeout=timeout)
         self.challenger = challenger
@@ -317,32 +416,47 @@ class RematchAcceptView(ui.View):
             return
 
         # Dodaj do aktywnych meczów
-        active_matches[self.challenger] = self.opponent
-        active_matches[self.opponent] = self.challenger
+        if not active_matches.claim(self.challenger, self.opponent):
+            await interaction.response.send_message("❌ Ktoś z was już jest w meczu.", ephemeral=True)
+            return
+        matchmaker.leave(self.challenger)
+        matchmaker.leave(self.opponent)
 
         await interaction.response.send_message(
             f"🎮 Rewanż między <@{self.challenger}> a <@{self.opponent}> został zaakceptowany!\n"
             "Możecie wpisać wynik meczu.",
-            view=ResultView(self.challenger, self.opponent)
+            view=ResultView.remembered(self.challenger, self.opponent)
         )
 
 ### === WIDOK WPISYWANIA WYNIKU === ###
-class ResultView(ui.View):
+class ResultView(InstrumentedView):
     def __init__(self, p1, p2):
         super().__init__(timeout=None)
         self.match_info = {"player1": p1, "player2": p2}
+        # Stałe custom_id – przycisk działa także po restarcie bota
+        self.enter_score.custom_id = f"wynik:wpisz:{p1}:{p2}"
+
+    @classmethod
+    def remembered(cls, p1, p2):
+        # Każdy nowy mecz poza turniejem startuje tutaj – od razu z terminem wygaśnięcia
+        remember_view(f"result:{p1}:{p2}", "result", p1, p2)
+        expiry.schedule("match", f"match:{p1}:{p2}", MATCH_TTL, p1, p2)
+        view = cls(p1, p2)
+        expiry.track_view(f"result:{p1}:{p2}", view)
+        return view
 
     @ui.button(label="Wpisz wynik", style=discord.ButtonStyle.primary)
     async def enter_score(self, interaction: Interaction, button: ui.Button):
-        # Pobieranie nazw graczy z Discorda
-        player1 = await interaction.client.fetch_user(self.match_info["player1"])
-        player2 = await interaction.client.fetch_user(self.match_info["player2"])
+        # Nazwy graczy z cache (fetch_user tylko przy braku, oba naraz)
+        p1 = self.match_info["player1"]
+        p2 = self.match_info["player2"]
+        names = await user_names.resolve(interaction.client, (p1, p2), interaction.guild)
 
         # Wywołanie ScoreModal z nazwami
         await interaction.response.send_modal(ScoreModal(
             self.match_info,
-            player1.display_name,
-            player2.display_name
+            names[p1],
+            names[p2]
         ))
 
 
@@ -362,70 +476,324 @@ async def confirm_button(self, interaction: Interaction, button: ui.Button):
     pending_results.pop(match_key, None)
     confirmed_matches.add(match_key)
 
-    # **Tutaj dodajemy await!**
-    await update_player_stats(p1, goals_scored=s1, goals_conceded=s2)
-    await update_player_stats(p2, goals_scored=s2, goals_conceded=s1)
+    enqueue_match_stats(p1, p2, s1, s2, await current_ratings(p1, p2))
 
     if s1 > s2:
-        await update_player_stats(p1, wins=1)
-        await update_player_stats(p2, losses=1)
         msg = f"<@{p1}> wygrał z <@{p2}> {s1}-{s2}!"
     elif s2 > s1:
-        await update_player_stats(p2, wins=1)
-        await update_player_stats(p1, losses=1)
         msg = f"<@{p2}> wygrał z <@{p1}> {s2}-{s1}!"
     else:
-        await update_player_stats(p1, draws=1)
-        await update_player_stats(p2, draws=1)
         msg = f"Remis {s1}-{s2} między <@{p1}> a <@{p2}>."
 
     view = RematchView(player1=int(p1), player2=int(p2))
     await interaction.response.send_message(f"✅ Wynik potwierdzony! {msg}\nKliknij, aby zagrać rewanż:", view=view)
 
-class MatchAcceptView(ui.View):
-    def __init__(self, challenger_id: int, timeout: Optional[float] = 60):
-        super().__init__(timeout=timeout)
-        self.challenger_id = challenger_id
-        self.message = None  # <- potrzebne do edytowania wiadomości po czasie
+### === WIDOK WPISYWANIA WYNIKU W TURNIEJU === ###
+class TournamentRoundView(InstrumentedView):
+    # Jeden przycisk na rundę – gracz dostaje formularz dla swojego meczu w bieżącej rundzie
+    def __init__(self, message_id: int):
+        super().__init__(timeout=None)
+        self.message_id = message_id
+        # Stałe custom_id – przycisk działa także po restarcie bota i w kolejnych rundach
+        self.enter_score.custom_id = f"turniej:wynik:{message_id}"
+
+    @classmethod
+    def remembered(cls, message_id: int):
+        remember_view(f"round:{message_id}", "round", message_id)
+        view = cls(message_id)
+        expiry.track_view(f"round:{message_id}", view)
+        return view
 
-    @ui.button(label="Akceptuj mecz", style=discord.ButtonStyle.green)
-    async def accept_match(self, interaction: Interaction, button: ui.Button):
-        if interaction.user.id == self.challenger_id:
-            await interaction.response.send_message("❌ Nie możesz zaakceptować własnego meczu.", ephemeral=True)
+    @ui.button(label="Wpisz wynik", style=discord.ButtonStyle.primary)
+    async def enter_score(self, interaction: Interaction, button: ui.Button):
+        tournament = tournaments.get(self.message_id)
+        if not tournament or "bracket" not in tournament:
+            await interaction.response.send_message("❌ Ten turniej nie istnieje lub już się zakończył.", ephemeral=True)
             return
 
-        # Dodajemy do active_matches obie strony
-        active_matches[self.challenger_id] = interaction.user.id
-        active_matches[interaction.user.id] = self.challenger_id
+        match = Bracket(tournament["bracket"]).match_for(interaction.user.id)
+        if match is None:
+            await interaction.response.send_message("❌ Nie masz meczu do rozegrania w tej rundzie.", ephemeral=True)
+            return
 
-        # Wyłączamy przyciski po zaakceptowaniu
-        for child in self.children:
-            child.disabled = True
+        p1, p2 = match["p1"], match["p2"]
+        names = await user_names.resolve(interaction.client, (p1, p2), interaction.guild)
+        await interaction.response.send_modal(ScoreModal({"player1": p1, "player2": p2}, names[p1], names[p2]))
+
+
+### === TURNIEJE (drabinka) === ###
+# Para graczy (posortowana) -> message_id turnieju, w którego bieżącej rundzie grają
+tournament_matches = {}
+# Ile meczów wypisujemy w jednej wiadomości (limit długości wiadomości Discorda)
+ROUND_LINES_PER_MESSAGE = 40
+STAGES = {"W": "górna drabinka", "L": "dolna drabinka", "F": "finał", "F2": "finał – rewanż"}
+
+
+def index_tournament_matches():
+    # Po restarcie odtwarza, które trwające mecze należą do turniejów
+    tournament_matches.clear()
+    for message_id, tournament in tournaments.items():
+        if "bracket" not in tournament:
+            continue
+        for match in Bracket(tournament["bracket"]).pending_matches():
+            tournament_matches[tuple(sorted((match["p1"], match["p2"])))] = message_id
+
+async def start_tournament(message_id: int, channel):
+    tournament = tournaments[message_id]
+    # Rozstawienie po ratingu Elo – najwyżej rozstawieni trafiają na siebie najpóźniej
+    seeded = sorted(tournament["players"], key=lambda p: (-leaderboard.rating(str(p)), p))
+    bracket = Bracket.create(tournament.get("format", "single"), seeded)
+    tournament["bracket"] = bracket.data
+    tournament["channel_id"] = channel.id
+    tournaments.save(message_id)
+    await post_round(message_id, bracket, channel)
+
+async def post_round(message_id: int, bracket: Bracket, channel):
+    # Wszystkie mecze rundy startują naraz
+    tournament = tournaments[message_id]
+    lines = []
+    for number, match in enumerate(bracket.round_matches(), start=1):
+        p1, p2 = match["p1"], match["p2"]
+        stage = f" ({STAGES[match['stage']]})" if match["stage"] else ""
+        if p2 is None:
+            lines.append(f"`{number}.` <@{p1}> – wolny los{stage}")
+            continue
+        tournament_matches[tuple(sorted((p1, p2)))] = message_id
+        active_matches[p1] = p2
+        active_matches[p2] = p1
+        matchmaker.leave(p1)
+        matchmaker.leave(p2)
+        lines.append(f"`{number}.` <@{p1}> vs <@{p2}>{stage}")
+
+    chunks = [lines[i:i + ROUND_LINES_PER_MESSAGE] for i in range(0, len(lines), ROUND_LINES_PER_MESSAGE)]
+    for i, chunk in enumerate(chunks):
+        last = i == len(chunks) - 1
+        embed = discord.Embed(
+            title=f"🏆 {tournament['name']} – runda {bracket.round}",
+            description="\n".join(chunk) + ("\n\nPo meczu kliknij 'Wpisz wynik'." if last else ""),
+            color=discord.Color.blue()
+        )
+        if last:
+            await channel.send(embed=embed, view=TournamentRoundView.remembered(message_id))
+        else:
+            await channel.send(embed=embed)
+    # Runda bez postępu przez TOURNAMENT_ROUND_TTL – turniej uznajemy za porzucony
+    expiry.schedule("round", f"round:{message_id}", TOURNAMENT_ROUND_TTL, message_id)
+
+async def report_tournament_result(player1: int, player2: int, score1: int, score2: int, channel):
+    # Wynik meczu turniejowego (potwierdzony przez graczy albo wpisany przez admina)
+    match_key = tuple(sorted((player1, player2)))
+    message_id = tournament_matches.get(match_key)
+    tournament = tournaments.get(message_id)
+    if tournament is None or "bracket" not in tournament:
+        tournament_matches.pop(match_key, None)
+        return
 
-        # Edytujemy oryginalną wiadomość z widokiem (przyciskami)
-        if self.message:
-            await self.message.edit(content="✅ Mecz zaakceptowany!", view=self)
+    bracket = Bracket(tournament["bracket"])
+    status = bracket.report(player1, player2, score1, score2)
+    if status == "brak":
+        tournament_matches.pop(match_key, None)
+        return
+    if status == "remis":
+        # W eliminacji musi być zwycięzca – mecz zostaje w rundzie
+        active_matches[player1] = player2
+        active_matches[player2] = player1
+        await channel.send(f"⚖️ <@{player1}> <@{player2}>, w meczu pucharowym nie ma remisów – zagrajcie ponownie i wpiszcie nowy wynik.")
+        return
 
-        # Odpowiadamy na interakcję i wysyłamy embed + widok do wpisania wyniku
-        await interaction.response.send_message(
-            embed=discord.Embed(
-                title="🏁 Mecz rozpoczęty!",
-                description=f"<@{self.challenger_id}> vs <@{interaction.user.id}>. Po meczu kliknij 'Wpisz wynik'."
-            ),
-            view=ResultView(self.challenger_id, interaction.user.id)
-        )
+    tournament_matches.pop(match_key, None)
+    active_matches.release(player1, player2)
+    tournaments.save(message_id)
+    target = bot.get_channel(tournament.get("channel_id")) or channel
+
+    if status == "runda":
+        await post_round(message_id, bracket, target)
+    elif status == "koniec":
+        # Zakończony turniej nie jest już potrzebny w stanie
+        forget_view(f"round:{message_id}")
+        expiry.cancel(f"round:{message_id}")
+        del tournaments[message_id]
+        description = f"🥇 Zwycięzca: <@{bracket.champion}>"
+        standings = bracket.standings()
+        if standings:
+            table = "\n".join(f"{i}. <@{p}> – {points} pkt" for i, (p, points) in enumerate(standings[:10], start=1))
+            description += f"\n\n**Tabela końcowa:**\n{table}"
+        await target.send(embed=discord.Embed(
+            title=f"🏆 Turniej {tournament['name']} zakończony!",
+            description=description,
+            color=discord.Color.gold()
+        ))
+
+
+### === MATCHMAKING (/gram) === ###
+async def start_queue_match(channel_id: int, player1: int, player2: int):
+    # Para znaleziona w tle (kolejka sama poszerza tolerancję ratingu)
+    channel = bot.get_channel(channel_id)
+    if channel is None:
+        print(f"❌ Nie znaleziono kanału {channel_id} dla meczu z kolejki.")
+        return
+    if not active_matches.claim(player1, player2):
+        # Ktoś zaczął w międzyczasie mecz na innym serwerze (innym shardzie)
+        await channel.send(f"⚠️ <@{player1}> <@{player2}>, mecz z kolejki anulowany – ktoś z was gra już inny mecz.")
+        return
+    await channel.send(
+        f"<@{player1}> <@{player2}>",
+        embed=discord.Embed(
+            title="🏁 Mecz rozpoczęty!",
+            description=f"<@{player1}> vs <@{player2}>. Po meczu kliknij 'Wpisz wynik'."
+        ),
+        view=ResultView.remembered(player1, player2)
+    )
+
+async def on_queue_match(first, second):
+    await start_queue_match(first.channel_id, first.player_id, second.player_id)
+    if second.channel_id != first.channel_id:
+        # Ten sam serwer, ale drugi gracz czekał na innym kanale
+        channel = bot.get_channel(second.channel_id)
+        if channel is not None:
+            await channel.send(f"🏁 <@{second.player_id}>, znaleziono przeciwnika – mecz na <#{first.channel_id}>.")
+
+async def on_queue_timeout(entry):
+    channel = bot.get_channel(entry.channel_id)
+    if channel is not None:
+        await channel.send(f"⌛ <@{entry.player_id}>, czas na znalezienie przeciwnika minął.")
+
+# Tolerancja w punktach Elo: 100 na start, +100 za każdą minutę czekania
+matchmaker = Matchmaker(timer_wheel, tolerance=100, widen_per_minute=100,
+                        on_match=on_queue_match, on_timeout=on_queue_timeout)
+
+
+### === RATING ELO === ###
+async def current_ratings(player1, player2) -> tuple:
+    # Ratingi przed meczem: z rankingu w pamięci albo (przed jego załadowaniem) ze statystyk
+    if leaderboard.loaded:
+        return leaderboard.rating(str(player1)), leaderboard.rating(str(player2))
+    stats1, stats2 = await asyncio.gather(get_player_stats(str(player1)), get_player_stats(str(player2)))
+    return stats1["rating"], stats2["rating"]
+
+
+### === TRWAŁE WIDOKI (po restarcie) === ###
+def remember_view(key: str, kind: str, *args):
+    persistent_views[key] = {"kind": kind, "args": list(args)}
+
+def forget_view(key: str):
+    persistent_views.pop(key, None)
+    # Zatrzymany widok znika z pamięci discord.py (przestaje czekać na kliknięcia)
+    expiry.stop_view(key)
+
+def drop_pending_result(player1: int, player2: int):
+    # Mecz rozstrzygnięty inną drogą (np. /wynik admina): usuń zgłoszenie, jego termin
+    # i przyciski potwierdzenia, a graczy zwolnij jak po potwierdzeniu
+    match_info = pending_results.pop(tuple(sorted((player1, player2))), None)
+    if match_info is None:
+        return
+    p1, p2 = match_info["player1"], match_info["player2"]
+    forget_view(f"confirm:{p1}:{p2}")
+    forget_view(f"result:{p1}:{p2}")
+    expiry.cancel(f"match:{p1}:{p2}")
+    active_matches.release(p1, p2)
+
+def restore_views():
+    # Rejestruje zapisane widoki ponownie, żeby ich przyciski działały po restarcie
+    restored = 0
+    for key, record in list(persistent_views.items()):
+        kind, args = record["kind"], record["args"]
+        if kind == "signup":
+            view = SignupView(*args)
+        elif kind == "confirm":
+            p1, p2, s1, s2 = args
+            view = ConfirmView(p1, p2, s1, s2, tuple(sorted((p1, p2))))
+        elif kind == "result":
+            view = ResultView(*args)
+        elif kind == "round":
+            view = TournamentRoundView(*args)
+        else:
+            continue
+        bot.add_view(view)
+        expiry.track_view(key, view)
+        restored += 1
+    print(f"Przywrócono {restored} widoków")
+
+### === WYGASANIE PORZUCONEGO STANU === ###
+@expiry.handler("match")
+@expiry.handler("pending")
+def expire_match(p1: int, p2: int):
+    # Mecz bez wyniku albo wynik bez potwierdzenia – zwalniamy graczy
+    match_key = tuple(sorted((p1, p2)))
+    pending_results.pop(match_key, None)
+    forget_view(f"confirm:{p1}:{p2}")
+    if match_key in tournament_matches:
+        # W turnieju mecz zostaje w drabince – znika tylko niepotwierdzony wynik
+        return
+    active_matches.release(p1, p2)
+    forget_view(f"result:{p1}:{p2}")
+    print(f"Wygasł porzucony mecz {p1} vs {p2}")
+
+@expiry.handler("signup")
+def expire_signup(message_id: int):
+    tournament = tournaments.get(message_id)
+    if tournament is not None and "bracket" not in tournament:
+        del tournaments[message_id]
+        print(f"Wygasły zapisy do turnieju {tournament['name']}")
+    forget_view(f"signup:{message_id}")
+
+@expiry.handler("round")
+async def expire_round(message_id: int):
+    # Porzucony turniej: zwalniamy graczy niedokończonych meczów i usuwamy turniej
+    tournament = tournaments.get(message_id)
+    forget_view(f"round:{message_id}")
+    if tournament is None:
+        return
+    del tournaments[message_id]
+    if "bracket" in tournament:
+        for match in Bracket(tournament["bracket"]).pending_matches():
+            p1, p2 = match["p1"], match["p2"]
+            match_key = tuple(sorted((p1, p2)))
+            tournament_matches.pop(match_key, None)
+            pending_results.pop(match_key, None)
+            active_matches.release(p1, p2)
+            for first, second in ((p1, p2), (p2, p1)):
+                forget_view(f"confirm:{first}:{second}")
+                expiry.cancel(f"match:{first}:{second}")
+    print(f"Wygasł porzucony turniej {tournament['name']}")
+    channel = bot.get_channel(tournament.get("channel_id"))
+    if channel is not None:
+        await channel.send(f"⌛ Turniej **{tournament['name']}** został zamknięty – brak postępu w rundzie.")
+
+def restore_expiry():
+    # Timery z zapisanych terminów + terminy dla stanu sprzed wprowadzenia wygasania
+    expiry.restore()
+    # Najpierw wyniki czekające na potwierdzenie – mają własny czas życia
+    for record in sorted(persistent_views.values(), key=lambda record: record["kind"] != "confirm"):
+        kind, args = record["kind"], record["args"]
+        if kind == "confirm":
+            key, expiry_kind, ttl, args = f"match:{args[0]}:{args[1]}", "pending", PENDING_RESULT_TTL, args[:2]
+        elif kind == "result":
+            key, expiry_kind, ttl = f"match:{args[0]}:{args[1]}", "match", MATCH_TTL
+        elif kind == "signup":
+            key, expiry_kind, ttl = f"signup:{args[0]}", "signup", SIGNUP_TTL
+        else:
+            continue
+        if key not in expiry:
+            expiry.schedule(expiry_kind, key, ttl, *args)
+
+    # Turnieje: zakończone usuwamy, trwające dostają termin rundy
+    for message_id, tournament in list(tournaments.items()):
+        if "bracket" not in tournament:
+            continue
+        if Bracket(tournament["bracket"]).finished:
+            del tournaments[message_id]
+            forget_view(f"round:{message_id}")
+        elif f"round:{message_id}" not in expiry:
+            expiry.schedule("round", f"round:{message_id}", TOURNAMENT_ROUND_TTL, message_id)
+
+    # Aktywne mecze bez widoku (np. z wcześniejszych wersji bota) też muszą kiedyś wygasnąć
+    for player, opponent in active_matches.owned_items():
+        if player > opponent or tuple(sorted((player, opponent))) in tournament_matches:
+            continue
+        if f"match:{player}:{opponent}" not in expiry and f"match:{opponent}:{player}" not in expiry:
+            expiry.schedule("match", f"match:{player}:{opponent}", MATCH_TTL, player, opponent)
 
-    async def on_timeout(self):
-        if self.message:
-            for child in self.children:
-                button = cast(ui.Button, child)
-                button.disabled = True
-            await self.message.edit(content="⌛ Czas na znalezienie przeciwnika minął.", view=self)
-
-        # Usuwamy z active_matches jeśli nadal szukał
-        entry = active_matches.get(str(self.challenger_id))
-        if isinstance(entry, dict) and entry.get("searching"):
-            del active_matches[str(self.challenger_id)]
 #wyzwij#
 @bot.tree.command(name="wyzwij", description="Wyzwanie konkretnego gracza na mecz")
 @app_commands.describe(gracz="Gracz, którego chcesz wyzwać")
@@ -434,7 +802,8 @@ async def wyzwij(interaction: Interaction, gracz: discord.User):
         await interaction.response.send_message("❌ Nie możesz wyzwać samego siebie.", ephemeral=True)
         return
 
-    if str(interaction.user.id) in active_matches or str(gracz.id) in active_matches:
+    busy = (interaction.user.id, gracz.id)
+    if any(uid in active_matches or matchmaker.is_waiting(uid) for uid in busy):
         await interaction.response.send_message("❌ Ty lub przeciwnik już jesteście w meczu lub szukacie przeciwnika.", ephemeral=True)
         return
 
@@ -452,44 +821,68 @@ async def wyzwij(interaction: Interaction, gracz: discord.User):
 
 @bot.tree.command(name="sprawdz", description="Pokaż Discord User ID wybranego użytkownika")
 @app_commands.describe(uzytkownik="Użytkownik, którego ID chcesz zobaczyć")
+@require_roles(ADMIN, message="❌ Nie masz uprawnień, aby użyć tej komendy.")
 async def sprawdz(interaction: discord.Interaction, uzytkownik: discord.User):
-    # Sprawdzamy, czy wywołujący ma rolę 'Admin'
-    role_names = [role.name for role in interaction.user.roles]
-    if "Admin" not in role_names:
-        await interaction.response.send_message("❌ Nie masz uprawnień, aby użyć tej komendy.", ephemeral=True)
-        return
-
-    # Jeśli jest adminem, pokazujemy user ID
+    # Rolę 'Admin' sprawdza dekorator – tu wywołujący jest już adminem
     await interaction.response.send_message(f"User ID użytkownika {uzytkownik.mention} to `{uzytkownik.id}`", ephemeral=True)
 
 @bot.tree.command(name="gram", description="Szukaj przeciwnika")
 @app_commands.describe(czas="Czas oczekiwania w minutach (domyślnie 3)")
 async def gram(interaction: Interaction, czas: Optional[int] = 3):
-    role = discord.utils.get(interaction.guild.roles, name="Gracz")
-    if role is None:
-        await interaction.response.send_message("Nie znaleziono roli 'Gracz'.", ephemeral=True)
+    user_id = interaction.user.id
+    if user_id in active_matches:
+        await interaction.response.send_message("❌ Jesteś już w meczu.", ephemeral=True)
+        return
+    if matchmaker.is_waiting(user_id):
+        await interaction.response.send_message("⏳ Już szukasz przeciwnika.", ephemeral=True)
         return
 
-    # Utwórz widok z timeoutem
-    view = MatchAcceptView(interaction.user.id, timeout=czas * 60)
+    # Rating z rankingu w pamięci – bez zapytania do bazy
+    rating = leaderboard.rating(str(user_id))
+    # Kolejka osobna dla każdego serwera – przeciwnik musi widzieć kanał z meczem
+    opponent = matchmaker.join(user_id, rating, interaction.channel_id, timeout=czas * 60,
+                               pool=interaction.guild_id or 0)
 
-    # Wyślij wiadomość z przyciskiem
-    msg = await interaction.response.send_message(
-        f"{role.mention}\n<@{interaction.user.id}> szuka przeciwnika! Kliknij przycisk, aby zaakceptować mecz.",
-        view=view
+    if opponent is None:
+        role = role_index.role(interaction.guild, GRACZ)
+        mention = f"{role.mention}\n" if role else ""
+        await interaction.response.send_message(
+            f"{mention}<@{user_id}> szuka przeciwnika! Wpisz `/gram`, aby dołączyć do kolejki "
+            f"(czekających: {matchmaker.depth})."
+        )
+        return
+
+    if not active_matches.claim(user_id, opponent.player_id):
+        if opponent.player_id not in active_matches:
+            # Zajęty był ten, kto wpisał /gram (np. mecz na innym shardzie) – przeciwnik czeka dalej
+            matchmaker.requeue(opponent)
+        await interaction.response.send_message(
+            "❌ Nie udało się rozpocząć meczu – ty albo przeciwnik z kolejki gracie już inny mecz.", ephemeral=True
+        )
+        return
+    await interaction.response.send_message(
+        f"<@{opponent.player_id}>",
+        embed=discord.Embed(
+            title="🏁 Mecz rozpoczęty!",
+            description=f"<@{opponent.player_id}> vs <@{user_id}>. Po meczu kliknij 'Wpisz wynik'."
+        ),
+        view=ResultView.remembered(opponent.player_id, user_id)
     )
 
-    # Pobierz wiadomość, żeby przypisać do widoku (potrzebne do on_timeout)
-    view.message = await interaction.original_response()
 
-    # Zapisz gracza jako "szukającego"
-    active_matches[str(interaction.user.id)] = {"searching": True}
+@bot.tree.command(name="nie_gram", description="Przestań szukać przeciwnika")
+async def nie_gram(interaction: Interaction):
+    if matchmaker.leave(interaction.user.id):
+        await interaction.response.send_message("✅ Usunięto Cię z kolejki.", ephemeral=True)
+    else:
+        await interaction.response.send_message("❌ Nie szukasz teraz przeciwnika.", ephemeral=True)
 
 
 @bot.tree.command(name="statystyki", description="Sprawdź swoje lub cudze statystyki")
 @app_commands.describe(uzytkownik="Gracz, którego statystyki chcesz sprawdzić")
 async def statystyki(interaction: Interaction, uzytkownik: Optional[discord.User] = None):
     user = uzytkownik or interaction.user
+    reply = await defer_response(interaction, "statystyki", ephemeral=(uzytkownik is None))
     stats = await get_player_stats(str(user.id))
 
     total_matches = stats["wins"] + stats["losses"] + stats["draws"]
@@ -510,84 +903,155 @@ async def statystyki(interaction: Interaction, uzytkownik: Optional[discord.User
     embed.add_field(name="🛡️ Gole stracone", value=str(stats["goals_conceded"]))
     embed.add_field(name="📊 Mecze łącznie", value=str(total_matches), inline=False)
     embed.add_field(name="📈 Skuteczność", value=f"{win_rate}%", inline=False)
+    embed.add_field(name="⭐ Rating", value=str(round(stats["rating"])), inline=False)
     embed.add_field(name="🎯 Śr. gole zdobyte/mecz", value=str(avg_goals_scored))
     embed.add_field(name="🧱 Śr. gole stracone/mecz", value=str(avg_goals_conceded))
 
-    await interaction.response.send_message(
+    await reply.send(
         embed=embed,
         ephemeral=(uzytkownik is None)
     )
 
 
-@bot.tree.command(name="ranking", description="Wyświetl ranking")
-async def ranking(interaction: Interaction):
-    data = await get_all_stats()  # pamiętaj, że get_all_stats jest async!
-    # Sortujemy według wskaźnika wygranych (win ratio)
-    def win_ratio(player):
-        total_games = player["wins"] + player["losses"] + player["draws"]
-        return player["wins"] / total_games if total_games > 0 else 0
+@bot.tree.command(name="h2h", description="Bilans bezpośrednich meczów z wybranym graczem")
+@app_commands.describe(przeciwnik="Przeciwnik", gracz="Czyj bilans pokazać (domyślnie twój)")
+async def h2h(interaction: Interaction, przeciwnik: discord.User, gracz: Optional[discord.User] = None):
+    user = gracz or interaction.user
+    if user.id == przeciwnik.id:
+        await interaction.response.send_message("❌ Wybierz dwóch różnych graczy.", ephemeral=True)
+        return
 
-    sorted_players = sorted(data, key=win_ratio, reverse=True)
+    reply = await defer_response(interaction, "h2h")
+    record = await get_head_to_head(user.id, przeciwnik.id)
 
-    embed = discord.Embed(title="🏆 Ranking Graczy", color=discord.Color.gold())
-    for i, player in enumerate(sorted_players[:10], 1):
-        user = await bot.fetch_user(int(player["player_id"]))
+    embed = discord.Embed(
+        title=f"⚔️ {user.display_name} vs {przeciwnik.display_name}",
+        color=discord.Color.purple()
+    )
+    if not record["matches"]:
+        embed.description = "Ci gracze jeszcze ze sobą nie grali."
+    else:
+        embed.add_field(name="✅ Wygrane", value=str(record["wins"]))
+        embed.add_field(name="➗ Remisy", value=str(record["draws"]))
+        embed.add_field(name="❌ Przegrane", value=str(record["losses"]))
+        embed.add_field(name="⚽ Bramki", value=f"{record['goals_for']} - {record['goals_against']}")
+        embed.add_field(name="📊 Mecze łącznie", value=str(record["matches"]))
+        embed.add_field(name="📈 Skuteczność", value=f"{record['wins'] / record['matches']:.1%}")
+    await reply.send(embed=embed)
+
+
+### === RANKING ZE STRONAMI === ###
+async def render_ranking_page(rows: list, first_rank: int) -> list:
+    names = await user_names.resolve(bot, [player["player_id"] for player in rows], display=False)
+    fields = []
+    for i, player in enumerate(rows, first_rank):
         ratio = win_ratio(player)
-        embed.add_field(
-            name=f"#{i} {user.name}",
-            value=f"✅ {player['wins']} 🟥 {player['losses']} 🤝 {player['draws']} | 🎯 {ratio:.1%}",
-            inline=False
-        )
-    await interaction.response.send_message(embed=embed)
+        fields.append((
+            f"#{i} {names[int(player['player_id'])]}",
+            f"⭐ {round(player['rating'])} | ✅ {player['wins']} 🟥 {player['losses']} 🤝 {player['draws']} | 🎯 {ratio:.1%}"
+        ))
+    return fields
+
+ranking_pages = RankingPages(render_ranking_page)
+
+
+class RankingView(InstrumentedView):
+    def __init__(self, owner_id: int, page: int = 0):
+        super().__init__(timeout=300)
+        self.owner_id = owner_id
+        self.page = page
+        self.message = None
+
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        # Strony przełącza tylko ten, kto wywołał /ranking – inni mają własne /ranking
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message("❌ To nie twój ranking – użyj /ranking.", ephemeral=True)
+            return False
+        return True
+
+    async def build(self) -> discord.Embed:
+        fields, full = await ranking_pages.get(self.page)
+        total = ranking_pages.page_count()
+        embed = discord.Embed(title="🏆 Ranking Graczy", color=discord.Color.gold())
+        for name, value in fields or []:
+            embed.add_field(name=name, value=value, inline=False)
+        if not fields:
+            embed.description = "Brak graczy na tej stronie."
+        embed.set_footer(text=f"Strona {self.page + 1}" + (f"/{total}" if total else ""))
+
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = not full or (total is not None and self.page + 1 >= total)
+        return embed
+
+    async def show(self, interaction: Interaction, page: int):
+        reply = await defer_response(interaction, "ranking_strona", thinking=False)
+        self.page = page
+        await reply.edit(embed=await self.build(), view=self)
+
+    @ui.button(label="◀ Poprzednia", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: Interaction, button: ui.Button):
+        await self.show(interaction, max(0, self.page - 1))
+
+    @ui.button(label="Następna ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: Interaction, button: ui.Button):
+        await self.show(interaction, self.page + 1)
+
+    @ui.button(label="📍 Moja pozycja", style=discord.ButtonStyle.primary)
+    async def my_page(self, interaction: Interaction, button: ui.Button):
+        page = ranking_pages.page_of(str(interaction.user.id))
+        if page is None:
+            await interaction.response.send_message("❌ Nie ma cię jeszcze w rankingu – zagraj mecz!", ephemeral=True)
+            return
+        await self.show(interaction, page)
+
+    async def on_timeout(self):
+        if self.message:
+            for child in self.children:
+                child.disabled = True
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+
+
+@bot.tree.command(name="ranking", description="Wyświetl ranking")
+async def ranking(interaction: Interaction):
+    # Strony czytane z bazy na żądanie, miejsce gracza z rankingu w pamięci (bisect)
+    reply = await defer_response(interaction, "ranking")
+    view = RankingView(interaction.user.id)
+    embed = await view.build()
+    rank = leaderboard.rank(str(interaction.user.id))
+    if rank is not None:
+        embed.description = f"Twoje miejsce: **#{rank}** z {len(leaderboard)}"
+    view.message = await reply.send(embed=embed, view=view)
 
 @bot.tree.command(name="medale", description="Sprawdź swoje lub czyjeś medale")
 @app_commands.describe(user="Użytkownik, którego medale chcesz zobaczyć (opcjonalne)")
 async def medale(interaction: Interaction, user: discord.User = None):
     user = user or interaction.user
-    stats = await get_player_stats(str(user.id))
+    # Jeśli użytkownik sprawdza swoje medale — wiadomość ephemeryczna (ukryta)
+    # W przeciwnym wypadku wiadomość jest publiczna na kanale
+    ephemeral = (user == interaction.user)
+    reply = await defer_response(interaction, "medale", ephemeral=ephemeral)
 
     medals = []
 
-    # Tu dodajemy medal za Booster
-    booster_role = discord.utils.get(interaction.guild.roles, name="Server Booster")
-    if booster_role in user.roles:
+    # Tu dodajemy medal za Booster (role ma tylko członek serwera – pobierany na żądanie)
+    member = await member_cache.resolve(interaction.guild, user)
+    if role_index.has_any(member, BOOSTER):
         medals.append("🚀 Booster – wspiera serwer rolą Boostera")
-    
-    wins = stats.get("wins", 0)
-    total = stats["wins"] + stats["losses"] + stats["draws"]
-    goals = stats["goals_scored"]
-    losses = stats["losses"]
-    draws = stats["draws"]
-        # Medale za wygrane
-    if wins >= 10: medals.append("🏆 Zwycięzca – 10 wygranych")
-    if wins >= 50: medals.append("🔥 Wojownik – 50 wygranych")
-    if wins >= 100: medals.append("💪 Mistrz – 100 wygranych")
-    if wins >= 500: medals.append("👑 Legendarny Mistrz – 500 wygranych")
-
-    if total >= 10: medals.append("🎓 Początkujący Gracz – 10 rozegranych meczów")
-    if total >= 50: medals.append("🐢 Maratończyk – 50 rozegranych meczów")
-    if total >= 100: medals.append("🧱 Weteran – 100 rozegranych meczów")
-    if total >= 500: medals.append("🐉 Legenda Discorda – 500 rozegranych meczów")
-
-    if goals >= 10: medals.append("🎯 Celownik Ustawiony – 10 goli zdobytych")
-    if goals >= 50: medals.append("🔥 Snajper – 50 goli zdobytych")
-    if goals >= 100: medals.append("💥 Maszyna do goli – 100 goli zdobytych")
-    if goals >= 500: medals.append("🚀 Rzeźnik Bramkarzy – 500 goli zdobytych")
-
-    if losses >= 10: medals.append("😬 Uczeń Pokory – 10 porażek")
-    if losses >= 50: medals.append("🧹 Zamiatany – 50 porażek")
-    if losses >= 100: medals.append("🪦 Król Przegranych – 100 porażek")
 
+    # Medale za statystyki są liczone przy zapisie wyniku; bez indeksu liczymy je na miejscu
+    earned = medal_index.get(str(user.id))
+    if earned is None:
+        earned = medal_rules.evaluate(await get_player_stats(str(user.id)))
 
-    
-    if draws >= 5: medals.append("🤝 Dyplomata – 5 remisów")
-    if draws >= 20: medals.append("😐 Wieczny Remis – 20 remisów")
-    if draws >= 50: medals.append("💤 Król Nudy – 50 remisów")
-    user_medals = awarded_medals.get(str(user.id), [])
-    for key in user_medals:
+    names = dict.fromkeys(MEDALE[medal_id]["nazwa"] for medal_id in earned)
+    for key in awarded_medals.get(str(user.id), []):
         medal_info = MEDALE.get(key)
-        if medal_info and medal_info["nazwa"] not in medals:
-            medals.append(medal_info["nazwa"])
+        if medal_info:
+            names.setdefault(medal_info["nazwa"])
+    medals.extend(names)
 
     if not medals:
         medals_text = "Brak medali — graj więcej!"
@@ -600,28 +1064,23 @@ async def medale(interaction: Interaction, user: discord.User = None):
         color=discord.Color.gold()
     )
 
-    # Jeśli użytkownik sprawdza swoje medale — wiadomość ephemeryczna (ukryta)
-    # W przeciwnym wypadku wiadomość jest publiczna na kanale
-    ephemeral = (user == interaction.user)
-
-    await interaction.response.send_message(embed=embed, ephemeral=ephemeral)
+    await reply.send(embed=embed, ephemeral=ephemeral)
 #turniej#
 @bot.tree.command(name="stworz_turniej", description="Stwórz nowy turniej z zapisem")
-@app_commands.describe(nazwa="Nazwa turnieju", limit="Ile osób ma się zapisać?")
-async def stworz_turniej(interaction: Interaction, nazwa: str, limit: int):
-    # ✅ Sprawdzenie, czy użytkownik ma rolę "Turniej"
-    role_names = [role.name for role in interaction.user.roles]
-    if "Turniej" not in role_names:
-        await interaction.response.send_message("❌ Nie masz uprawnień do tworzenia turniejów.", ephemeral=True)
-        return
-
+@app_commands.describe(nazwa="Nazwa turnieju", limit="Ile osób ma się zapisać?", format="Format rozgrywek")
+@app_commands.choices(format=[app_commands.Choice(name=nazwa, value=format_id) for format_id, nazwa in FORMATY.items()])
+@require_roles(TURNIEJ, message="❌ Nie masz uprawnień do tworzenia turniejów.")
+async def stworz_turniej(interaction: Interaction, nazwa: str, limit: int,
+                         format: Optional[app_commands.Choice[str]] = None):
     if limit < 2:
         await interaction.response.send_message("❌ Minimalna liczba graczy to 2.", ephemeral=True)
         return
 
+    format_id = format.value if format else "single"
     embed = discord.Embed(
         title=f"🎮 Turniej: {nazwa}",
-        description=f"Naciśnij przycisk poniżej, aby zapisać się do turnieju.\nLiczba miejsc: **{limit}**",
+        description=f"Naciśnij przycisk poniżej, aby zapisać się do turnieju.\n"
+                    f"Format: **{FORMATY[format_id]}**\nLiczba miejsc: **{limit}**",
         color=discord.Color.green()
     )
 
@@ -638,8 +1097,12 @@ async def stworz_turniej(interaction: Interaction, nazwa: str, limit: int):
     tournaments[message.id] = {
         "name": nazwa,
         "limit": limit,
+        "format": format_id,
         "players": []
     }
+    remember_view(f"signup:{message.id}", "signup", message.id)
+    expiry.track_view(f"signup:{message.id}", view)
+    expiry.schedule("signup", f"signup:{message.id}", SIGNUP_TTL, message.id)
 
     await interaction.response.send_message("✅ Turniej utworzony!", ephemeral=True)
 
@@ -650,15 +1113,8 @@ async def stworz_turniej(interaction: Interaction, nazwa: str, limit: int):
     time="Czas wyciszenia (np. 10m, 1h, 1d)",
     reason="Powód wyciszenia"
 )
-async def mute(interaction: Interaction, user: discord.Member, time: str, reason: str = "Brak powodu"):
-    # Tylko dla Admin i HELPER
-    allowed_roles = ["Admin", "HELPER"]
-    user_roles = [role.name for role in interaction.user.roles]
-    
-    if not any(role in allowed_roles for role in user_roles):
-        await interaction.response.send_message("❌ Nie masz uprawnień do użycia tej komendy.", ephemeral=True)
-        return
-
+@require_roles(ADMIN, HELPER)  # Tylko dla Admin i HELPER
+async def mute(interaction: Interaction, user: discord.User, time: str, reason: str = "Brak powodu"):
     # Konwersja czasu
     units = {"m": 60, "h": 3600, "d": 86400}
     try:
@@ -671,9 +1127,15 @@ async def mute(interaction: Interaction, user: discord.Member, time: str, reason
         await interaction.response.send_message("❌ Podaj czas w formacie np. `10m`, `1h`, `1d`.", ephemeral=True)
         return
 
+    # Członek serwera z interakcji albo pobrany na żądanie (tryb LOW_MEMORY nie trzyma listy członków)
+    member = await member_cache.resolve(interaction.guild, user)
+    if member is None:
+        await interaction.response.send_message("❌ Tego użytkownika nie ma na serwerze.", ephemeral=True)
+        return
+
     # Nadanie timeoutu
     try:
-        await user.timeout(duration, reason=reason)
+        await member.timeout(duration, reason=reason)
         await interaction.response.send_message(
             f"🔇 {user.mention} został wyciszony na **{time}**.\n📄 Powód: {reason}"
         )
@@ -687,15 +1149,8 @@ async def mute(interaction: Interaction, user: discord.Member, time: str, reason
     gracz2="Drugi gracz",
     wynik="Wynik w formacie X-Y, np. 2-1"
 )
+@require_roles(ADMIN, message="❌ Nie masz uprawnień do użycia tej komendy. Potrzebna jest rola Admin.")
 async def wynik(interaction: Interaction, gracz1: User, gracz2: User, wynik: str):
-    role_names = [role.name for role in interaction.user.roles]
-    if "Admin" not in role_names:
-        await interaction.response.send_message(
-            "❌ Nie masz uprawnień do użycia tej komendy. Potrzebna jest rola Admin.",
-            ephemeral=True
-        )
-        return
-
     # Walidacja wyniku
     if wynik.count("-") != 1:
         await interaction.response.send_message(
@@ -718,21 +1173,29 @@ async def wynik(interaction: Interaction, gracz1: User, gracz2: User, wynik: str
         )
         return
 
-    # Aktualizacja statystyk - dopasuj do swojego kodu
-    if score1 > score2:
-        await update_player_stats(str(gracz1.id), wins=1, goals_scored=score1, goals_conceded=score2)
-        await update_player_stats(str(gracz2.id), losses=1, goals_scored=score2, goals_conceded=score1)
-    elif score2 > score1:
-        await update_player_stats(str(gracz2.id), wins=1, goals_scored=score2, goals_conceded=score1)
-        await update_player_stats(str(gracz1.id), losses=1, goals_scored=score1, goals_conceded=score2)
-    else:
-        await update_player_stats(str(gracz1.id), draws=1, goals_scored=score1, goals_conceded=score2)
-        await update_player_stats(str(gracz2.id), draws=1, goals_scored=score2, goals_conceded=score1)
+    # Zgłoszenie graczy czekające na potwierdzenie przestaje obowiązywać – inaczej
+    # późniejsze "Potwierdź wynik" zapisałoby ten mecz drugi raz
+    pending = pending_results.get(tuple(sorted((gracz1.id, gracz2.id))))
+    if pending is not None and pending.get("confirmed"):
+        await interaction.response.send_message(
+            "❌ Gracze właśnie potwierdzili wynik tego meczu – nie zapisuję go drugi raz.", ephemeral=True
+        )
+        return
+    drop_pending_result(gracz1.id, gracz2.id)
 
-    await interaction.response.send_message(
+    reply = await defer_response(interaction, "wynik", ephemeral=True)
+
+    # Statystyki trafiają do kolejki zapisów – odpowiadamy od razu
+    ratings = await current_ratings(gracz1.id, gracz2.id)
+    enqueue_match_stats(gracz1.id, gracz2.id, score1, score2, ratings,
+                        source="admin", reported_by=interaction.user.id)
+
+    await reply.send(
         f"✅ Zapisano wynik meczu:\n{gracz1.mention} **{score1}** - **{score2}** {gracz2.mention}",
         ephemeral=True
     )
+    # Jeśli to mecz bieżącej rundy turnieju, drabinka idzie dalej
+    await report_tournament_result(gracz1.id, gracz2.id, score1, score2, interaction.channel)
 #medal#
 @bot.tree.command(name="medal", description="Przyznaj graczowi medal")
 @app_commands.describe(
@@ -742,15 +1205,11 @@ async def wynik(interaction: Interaction, gracz1: User, gracz2: User, wynik: str
 @app_commands.choices(
     medal=[
         app_commands.Choice(name=data["nazwa"], value=medal_id)
-        for medal_id, data in MEDALE.items()
+        for medal_id, data in RECZNE_MEDALE.items()
     ]
 )
+@require_roles(ADMIN, message="❌ Ta komenda jest tylko dla osób z rolą **Admin**.")
 async def medal(interaction: Interaction, użytkownik: discord.User, medal: app_commands.Choice[str]):
-    admin_role = discord.utils.get(interaction.guild.roles, name="Admin")
-    if not admin_role or admin_role not in interaction.user.roles:
-        await interaction.response.send_message("❌ Ta komenda jest tylko dla osób z rolą **Admin**.", ephemeral=True)
-        return
-
     medal_data = MEDALE.get(medal.value)
     if not medal_data:
         await interaction.response.send_message("❌ Taki medal nie istnieje.", ephemeral=True)
@@ -762,6 +1221,8 @@ async def medal(interaction: Interaction, użytkownik: discord.User, medal: app_
         await interaction.response.send_message(f"Użytkownik już ma medal {medal_data['nazwa']}.", ephemeral=True)
         return
     user_medals.append(medal.value)
+    awarded_medals.save(str(użytkownik.id))
+    queue_medal_changes(str(użytkownik.id), [medal.value], source="admin")
 
     embed = discord.Embed(
         title="🥇 Medal Przyznany!",
@@ -781,16 +1242,11 @@ async def medal(interaction: Interaction, użytkownik: discord.User, medal: app_
 @app_commands.choices(
     medal=[
         app_commands.Choice(name=data["nazwa"], value=medal_id)
-        for medal_id, data in MEDALE.items()
+        for medal_id, data in RECZNE_MEDALE.items()
     ]
 )
+@require_roles(ADMIN, message="❌ Ta komenda jest tylko dla osób z rolą **Admin**.")  # Blokada: tylko rola Admin
 async def usun_medal(interaction: Interaction, użytkownik: discord.User, medal: app_commands.Choice[str]):
-    # Blokada: tylko rola Admin
-    admin_role = discord.utils.get(interaction.guild.roles, name="Admin")
-    if not admin_role or admin_role not in interaction.user.roles:
-        await interaction.response.send_message("❌ Ta komenda jest tylko dla osób z rolą **Admin**.", ephemeral=True)
-        return
-
     user_id_str = str(użytkownik.id)
     if user_id_str not in awarded_medals or medal.value not in awarded_medals[user_id_str]:
         await interaction.response.send_message(f"❌ Użytkownik nie posiada medalu **{MEDALE[medal.value]['nazwa']}**.", ephemeral=True)
@@ -798,10 +1254,13 @@ async def usun_medal(interaction: Interaction, użytkownik: discord.User, medal:
 
     # Usuwamy medal
     awarded_medals[user_id_str].remove(medal.value)
+    queue_medal_changes(user_id_str, [], [medal.value])
 
     # Jeśli lista medali jest pusta, usuń klucz, aby nie zaśmiecać
     if not awarded_medals[user_id_str]:
         del awarded_medals[user_id_str]
+    else:
+        awarded_medals.save(user_id_str)
 
     await interaction.response.send_message(
         f"✅ Usunięto medal **{MEDALE[medal.value]['nazwa']}** od <@{użytkownik.id}>.",
@@ -809,71 +1268,497 @@ async def usun_medal(interaction: Interaction, użytkownik: discord.User, medal:
     )
 
 
+#kto ma medal#
+@bot.tree.command(name="kto_ma_medal", description="Sprawdź, którzy gracze mają dany medal")
+@app_commands.describe(medal="Medal")
+@app_commands.choices(
+    medal=[
+        app_commands.Choice(name=data["nazwa"], value=medal_id)
+        for medal_id, data in MEDALE.items()
+    ]
+)
+async def kto_ma_medal(interaction: Interaction, medal: app_commands.Choice[str]):
+    reply = await defer_response(interaction, "kto_ma_medal", ephemeral=True)
+    holders = await get_medal_holders(medal.value, limit=50)
+
+    if not holders:
+        text = "Nikt jeszcze nie ma tego medalu."
+    else:
+        text = "\n".join(f"- <@{player_id}>" for player_id in holders)
+
+    embed = discord.Embed(
+        title=MEDALE[medal.value]["nazwa"],
+        description=text,
+        color=MEDALE[medal.value]["kolor"]
+    )
+    await reply.send(embed=embed, ephemeral=True)
+
+
+#historia meczów#
+MAX_IMPORT_BYTES = 5_000_000
+
+@bot.tree.command(name="eksport_meczow", description="Eksportuj historię meczów do pliku CSV")
+@require_roles(ADMIN)
+async def eksport_meczow(interaction: Interaction):
+    reply = await defer_response(interaction, "eksport_meczow", ephemeral=True)
+    await write_queue.flush()
+
+    # Historia jest czytana stronami i od razu zapisywana do pliku – pamięć nie rośnie z liczbą meczów
+    columns = ["id", "played_at", "player1", "player2", "score1", "score2", "source", "reported_by"]
+    count = 0
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "historia_meczow.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            async for page in stream_match_history():
+                writer.writerows(page)
+                count += len(page)
+
+        await reply.send(f"📄 Wyeksportowano {count} meczów.", file=discord.File(path), ephemeral=True)
+
+@bot.tree.command(name="import_wynikow", description="Zaimportuj wiele wyników meczów z pliku CSV lub JSON")
+@app_commands.describe(plik="CSV (gracz1,gracz2,wynik lub gracz1,gracz2,gole1,gole2) albo JSON z takimi polami")
+@require_roles(ADMIN)
+async def import_wynikow(interaction: Interaction, plik: discord.Attachment):
+    if plik.size > MAX_IMPORT_BYTES:
+        await interaction.response.send_message(
+            f"❌ Plik jest za duży (maks. {MAX_IMPORT_BYTES // 1_000_000} MB).", ephemeral=True
+        )
+        return
+
+    if not leaderboard.loaded:
+        await interaction.response.send_message("⏳ Ranking jeszcze się ładuje – spróbuj za chwilę.", ephemeral=True)
+        return
+
+    reply = await defer_response(interaction, "import_wynikow", ephemeral=True)
+    data = await plik.read()
+
+    # Walidacja i sumowanie delt w jednym przebiegu po pliku
+    rejected = []
+    fatal = None
+
+    def accepted():
+        nonlocal fatal
+        for number, match, error in iter_results(data, plik.filename):
+            if match is not None:
+                yield match
+            elif number == 0:
+                fatal = error
+            else:
+                rejected.append(f"wiersz {number}: {error}")
+
+    deltas, records = aggregate_matches(accepted(), leaderboard.rating, reported_by=interaction.user.id)
+    if fatal:
+        await reply.send(f"❌ Import przerwany, nic nie zapisano – {fatal}", ephemeral=True)
+        return
+
+    await import_matches(deltas, records)
+
+    message = f"✅ Zaimportowano **{len(records)}** meczów ({len(deltas)} graczy), odrzucono **{len(rejected)}** wierszy."
+    if rejected:
+        details = "\n".join(rejected[:10])
+        more = f"\n… i {len(rejected) - 10} więcej" if len(rejected) > 10 else ""
+        message += f"\n```\n{details}{more}\n```"
+    await reply.send(message[:2000], ephemeral=True)
+
+@bot.tree.command(name="przelicz_ranking", description="Przelicz rating Elo wszystkich graczy z historii meczów")
+@app_commands.describe(k="Współczynnik K (domyślnie z ELO_K_FACTOR)")
+@require_roles(ADMIN)
+async def przelicz_ranking(interaction: Interaction, k: Optional[float] = None):
+    reply = await defer_response(interaction, "przelicz_ranking", ephemeral=True)
+    # Najpierw zapisz kolejkę, żeby historia zawierała wszystkie potwierdzone mecze
+    await write_queue.flush()
+
+    recomputation = RatingRecomputation(k) if k else RatingRecomputation()
+    matches = 0
+    chunk = []
+    async for page in stream_match_history():
+        chunk.extend((m["player1"], m["player2"], m["score1"], m["score2"]) for m in page)
+        if len(chunk) >= RECOMPUTE_CHUNK:
+            await asyncio.to_thread(recomputation.feed, chunk)
+            matches += len(chunk)
+            chunk = []
+    await asyncio.to_thread(recomputation.feed, chunk)
+    matches += len(chunk)
+
+    ratings = recomputation.result()
+    await set_ratings(ratings)
+    leaderboard.load(await get_all_stats())
+    ranking_pages.clear()
+    stats_feed.publish(None)
+    await reply.send(f"✅ Przeliczono rating {len(ratings)} graczy na podstawie {matches} meczów.", ephemeral=True)
+
+
+#wydajnosc#
+@bot.tree.command(name="wydajnosc", description="Czasy komend i przycisków (p50/p95/p99) oraz opóźnienie pętli")
+@require_roles(ADMIN)
+async def wydajnosc(interaction: Interaction):
+    rows = percentiles()[:15]
+    if rows:
+        table = "\n".join(
+            f"{name[:28]:<28} {count:>6} {p50:>6.2f} {p95:>6.2f} {p99:>6.2f} {peak:>6.2f}"
+            for name, count, p50, p95, p99, peak in rows
+        )
+        table = f"```\n{'callback':<28} {'ile':>6} {'p50':>6} {'p95':>6} {'p99':>6} {'max':>6}\n{table}\n```"
+    else:
+        table = "Brak pomiarów."
+
+    embed = discord.Embed(title="⏱️ Wydajność bota (sekundy)", description=table, color=discord.Color.blue())
+    embed.add_field(
+        name="Pętla zdarzeń",
+        value=f"Opóźnienie: {loop_lag.last * 1000:.1f} ms (max {loop_lag.max * 1000:.1f} ms, "
+              f"p99 {loop_lag.histogram.quantile(0.99) * 1000:.0f} ms)",
+        inline=False
+    )
+    matchmaking = matchmaker.metrics()
+    embed.add_field(
+        name="Kolejka /gram",
+        value=f"Czeka: {matchmaking['depth']}, czas oczekiwania p50 {matchmaking['wait_p50']:.0f} s, "
+              f"p95 {matchmaking['wait_p95']:.0f} s",
+        inline=False
+    )
+    if slow_reports:
+        name, elapsed, stacks = slow_reports[-1]
+        details = f"{name}: {elapsed:.2f} s"
+        if stacks:
+            stack, samples = stacks[0]
+            details += f"\n`{samples}×` " + " ← ".join(stack[:3])
+        embed.add_field(name=f"Ostatni wolny callback ({len(slow_reports)} zapisanych)", value=details[:1024], inline=False)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+#pamiec#
+@bot.tree.command(name="pamiec", description="Zużycie pamięci i cache bota (porównanie trybów)")
+@require_roles(ADMIN)
+async def pamiec(interaction: Interaction):
+    report = memory_report()
+    embed = discord.Embed(
+        title="🧠 Pamięć bota",
+        description=f"Tryb: **{'LOW_MEMORY' if LOW_MEMORY else 'pełny'}**\n"
+                    f"Pamięć procesu (RSS): **{report['rss'] / 1_048_576:.1f} MB**",
+        color=discord.Color.blue()
+    )
+    embed.add_field(
+        name="Cache gatewaya",
+        value=f"Członkowie: {report['members']}\nUżytkownicy: {report['users']}\n"
+              f"Wiadomości: {report['messages']}\nSerwery: {report['guilds']}",
+        inline=True
+    )
+    lru = report["member_lru"]
+    embed.add_field(
+        name="Członkowie na żądanie (LRU)",
+        value=f"{lru['size']}/{lru['maxsize']}\nTrafienia: {lru['hit_rate']:.0%} "
+              f"({lru['hits']}/{lru['hits'] + lru['misses']})",
+        inline=True
+    )
+    live = state_report()
+    embed.add_field(
+        name="Stan meczów i widoków",
+        value=f"Aktywne mecze: {live['active_matches']}\nWyniki do potwierdzenia: {live['pending_results']}\n"
+              f"Widoki: {live['live_views']} (zapisane: {live['saved_views']})\n"
+              f"Wygasło: " + (", ".join(f"{kind} {count}" for kind, count in live["expired"].items()) or "nic"),
+        inline=False
+    )
+    embed.add_field(
+        name="Intencje",
+        value=f"members: {bot.intents.members}, message_content: {bot.intents.message_content}",
+        inline=False
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
 #unmute#
 @bot.tree.command(name="unmute", description="Usuwa wyciszenie z użytkownika.")
 @app_commands.describe(user="Użytkownik do odciszenia")
-async def unmute(interaction: Interaction, user: discord.Member):
-    # Tylko dla Admin i HELPER
-    allowed_roles = ["Admin", "HELPER"]
-    user_roles = [role.name for role in interaction.user.roles]
-
-    if not any(role in allowed_roles for role in user_roles):
-        await interaction.response.send_message("❌ Nie masz uprawnień do użycia tej komendy.", ephemeral=True)
+@require_roles(ADMIN, HELPER)  # Tylko dla Admin i HELPER
+async def unmute(interaction: Interaction, user: discord.User):
+    member = await member_cache.resolve(interaction.guild, user)
+    if member is None:
+        await interaction.response.send_message("❌ Tego użytkownika nie ma na serwerze.", ephemeral=True)
         return
 
     try:
-        await user.timeout(None)
+        await member.timeout(None)
         await interaction.response.send_message(f"🔊 {user.mention} został odciszony.")
     except Exception as e:
         await interaction.response.send_message(f"❌ Nie udało się odciszyć użytkownika: {e}", ephemeral=True)
 
-# Funkcja wysyłająca wiadomość co 5 minut
-async def ping_channel_loop():
-    await bot.wait_until_ready()
-    channel = bot.get_channel(CHANNEL_ID)
+### === UPRAWNIENIA (indeks ról) === ###
+@bot.tree.error
+async def on_app_command_error(interaction: Interaction, error: app_commands.AppCommandError):
+    if isinstance(error, app_commands.CheckFailure):
+        message = str(error) or NO_PERMISSION
+    else:
+        print(f"Błąd komendy /{interaction.command.name if interaction.command else '?'}:")
+        traceback.print_exception(error)
+        message = "❌ Wystąpił błąd podczas wykonywania komendy."
+    try:
+        if interaction.response.is_done():
+            await interaction.followup.send(message, ephemeral=True)
+        else:
+            await interaction.response.send_message(message, ephemeral=True)
+    except discord.HTTPException:
+        pass
 
-    if channel is None:
-        print("❌ Nie znaleziono kanału. Sprawdź ID.")
-        return
+# Zmiany ról na serwerze odświeżają mapę nazwa -> ID
+@bot.event
+async def on_guild_role_create(role):
+    role_index.refresh(role.guild)
 
-    while not bot.is_closed():
-        try:
-            await channel.send("✅ Bot działa poprawnie.")
-        except Exception as e:
-            print(f"Błąd przy wysyłaniu wiadomości: {e}")
-        await asyncio.sleep(300)  # 5 minut
+@bot.event
+async def on_guild_role_update(before, after):
+    if before.name != after.name:
+        role_index.refresh(after.guild)
 
-# Event uruchamiany po starcie bota
 @bot.event
-async def on_ready():
-    print(f"Zalogowano jako {bot.user} (ID: {bot.user.id})")
+async def on_guild_role_delete(role):
+    role_index.refresh(role.guild)
+
+@bot.event
+async def on_guild_remove(guild):
+    role_index.forget(guild.id)
+
+### === ZDROWIE I METRYKI (/health, /metrics) === ###
+def memory_report() -> dict:
+    return {
+        "rss": process_memory(),
+        "members": sum(len(guild.members) for guild in bot.guilds),
+        "users": len(bot.users),
+        "messages": len(bot.cached_messages),
+        "guilds": len(bot.guilds),
+        "member_lru": member_cache.stats(),
+    }
+
+def state_report() -> dict:
+    # Liczba żywych wpisów stanu i widoków (do wykrywania wycieków)
+    stats = expiry.stats()
+    return {
+        "active_matches": len(active_matches) // 2,
+        "pending_results": len(pending_results),
+        "saved_views": len(persistent_views),
+        "live_views": len(bot.persistent_views),
+        "tracked_views": stats["views"],
+        "scheduled": stats["scheduled"],
+        "expired": stats["expired"],
+    }
+
+def health_report() -> dict:
+    latency = bot.latency
+    return {
+        "ready": bot.is_ready() and not bot.is_closed(),
+        "latency": latency if math.isfinite(latency) else None,
+        "guilds": len(bot.guilds),
+        "loop_lag": loop_lag.last,
+        "stats_queue": len(write_queue),
+        "shards": shard_label(),
+    }
+
+def gateway_sockets() -> list:
+    # AutoShardedBot nie ma bot.ws – każdy shard ma własne połączenie z gatewayem
+    if isinstance(bot, discord.AutoShardedClient):
+        return [info._parent.ws for info in bot.shards.values()]
+    return [bot.ws] if bot.ws else []
+
+def last_heartbeat_age() -> float:
+    # discord.py nie udostępnia czasu heartbeatu publicznie – czytamy go z keep-alive gatewaya.
+    # Przy shardach liczy się najgorszy z nich (-1, gdy żaden nie ma jeszcze potwierdzenia)
+    now = time.perf_counter()
+    ages = []
+    for ws in gateway_sockets():
+        last_ack = getattr(getattr(ws, "_keep_alive", None), "_last_ack", None)
+        if last_ack is not None:
+            ages.append(now - last_ack)
+    return max(ages, default=-1.0)
+
+def collect_metrics() -> list:
+    latency = bot.latency
+    matchmaking = matchmaker.metrics()
+    caches = {"stats": stats_cache.stats(), "user_names": user_names.stats()}
+    lines = []
+    lines += render_metric("discord_gateway_latency_seconds", "Opóźnienie heartbeatu gatewaya",
+                           latency if math.isfinite(latency) else -1)
+    lines += render_metric("discord_heartbeat_ack_age_seconds", "Czas od ostatniego potwierdzenia heartbeatu",
+                           last_heartbeat_age())
+    lines += render_metric("discord_ready", "Czy bot jest połączony i gotowy", int(bot.is_ready()))
+    lines += render_metric("discord_guilds", "Liczba serwerów", len(bot.guilds))
+    if sharded():
+        lines += render_metric("discord_shard_latency_seconds", "Opóźnienie heartbeatu każdego shardu",
+                               [({"shard": shard_id}, shard_latency if math.isfinite(shard_latency) else -1)
+                                for shard_id, shard_latency in bot.latencies])
+    memory = memory_report()
+    lines += render_metric("process_resident_memory_bytes", "Pamięć rezydentna procesu", memory["rss"])
+    lines += render_metric("discord_cached_members", "Członkowie w cache gatewaya", memory["members"])
+    lines += render_metric("discord_cached_users", "Użytkownicy w cache gatewaya", memory["users"])
+    lines += render_metric("member_lru_size", "Członkowie pobrani na żądanie (LRU)", memory["member_lru"]["size"])
+    live = state_report()
+    lines += render_metric("bot_state_entries", "Żywe wpisy stanu", [
+        ({"kind": "active_matches"}, live["active_matches"]),
+        ({"kind": "pending_results"}, live["pending_results"]),
+        ({"kind": "saved_views"}, live["saved_views"]),
+        ({"kind": "live_views"}, live["live_views"]),
+    ])
+    lines += render_metric("bot_state_expiring", "Wpisy z terminem wygaśnięcia",
+                           [({"kind": kind}, count) for kind, count in live["scheduled"].items()])
+    lines += render_metric("bot_state_expired_total", "Wpisy usunięte po czasie życia",
+                           [({"kind": kind}, count) for kind, count in live["expired"].items()], kind="counter")
+    lines += render_metric("bot_time_to_ready_seconds", "Czas od startu procesu do pierwszego on_ready",
+                           startup["time_to_ready"] if startup["time_to_ready"] is not None else -1)
+    lines += render_metric("bot_ready_events_total", "Liczba zdarzeń on_ready (połączenia z gatewayem)",
+                           startup["ready_events"], kind="counter")
+    lines += render_metric("bot_tree_synced", "Czy przy starcie wysłano komendy do Discorda (0 = hash bez zmian)",
+                           int(bool(startup["tree_synced"])))
+    lines += render_metric("event_loop_lag_seconds", "Ostatni pomiar opóźnienia pętli zdarzeń", loop_lag.last)
+    lines += render_metric("event_loop_lag_max_seconds", "Największe opóźnienie pętli zdarzeń", loop_lag.max)
+    lines += render_histogram("event_loop_lag_distribution_seconds", "Rozkład opóźnienia pętli zdarzeń",
+                              {"loop": loop_lag.histogram}, "source")
+    lines += render_metric("queue_depth", "Długość kolejek", [
+        ({"queue": "stats_players"}, len(write_queue)),
+        ({"queue": "stats_matches"}, write_queue.pending_matches),
+        ({"queue": "matchmaking"}, matchmaking["depth"]),
+        ({"queue": "state_store"}, state.pending()),
+        ({"queue": "timers"}, len(timer_wheel)),
+        ({"queue": "message_edits"}, len(message_updates)),
+    ])
+    lines += render_metric("matchmaking_longest_wait_seconds", "Najdłuższe czekanie w kolejce /gram",
+                           matchmaking["longest_wait"])
+    lines += render_metric("matchmaking_matched_total", "Pary znalezione przez kolejkę",
+                           matchmaking["matched_total"], kind="counter")
+    lines += render_metric("matchmaking_timeout_total", "Wyjścia z kolejki po czasie",
+                           matchmaking["timeout_total"], kind="counter")
+    lines += render_histogram("matchmaking_wait_seconds", "Czas oczekiwania w kolejce /gram (para albo timeout)",
+                              {"gram": matchmaker.wait_time}, "queue")
+    lines += render_metric("cache_hit_ratio", "Odsetek trafień w cache",
+                           [({"cache": name}, stats["hit_rate"]) for name, stats in caches.items()])
+    lines += render_metric("cache_hits_total", "Trafienia w cache",
+                           [({"cache": name}, stats["hits"]) for name, stats in caches.items()], kind="counter")
+    lines += render_metric("cache_misses_total", "Chybienia w cache",
+                           [({"cache": name}, stats["misses"]) for name, stats in caches.items()], kind="counter")
+    lines += render_metric("cache_size", "Liczba wpisów w cache",
+                           [({"cache": name}, stats["size"]) for name, stats in caches.items()])
+    lines += render_histogram("command_latency_seconds", "Czas od defer do odpowiedzi komendy",
+                              command_latency, "command")
+    lines += render_histogram("handler_latency_seconds", "Czas wykonania callbacku komendy lub przycisku",
+                              handler_latency, "handler")
+    return lines
+
+health_server = HealthServer(int(os.getenv("PORT", 10000)), health_report, collect_metrics)
+
+### === START BOTA === ###
+startup = {"time_to_ready": None, "ready_events": 0, "tree_synced": None}
+
+
+def tree_fingerprint() -> str:
+    # Hash definicji wszystkich komend (nazwy, opisy, opcje, choices – np. lista medali)
+    payload = sorted((command.to_dict(bot.tree) for command in bot.tree.get_commands()),
+                     key=lambda command: command["name"])
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+async def sync_tree_if_changed():
+    # Synchronizacja tylko po zmianie komend – Discord ma niski limit na sync
+    fingerprint = tree_fingerprint()
+    key = f"tree_hash:{bot.application_id}"
+    if bot_meta.get(key) == fingerprint and os.getenv("FORCE_SYNC") != "1":
+        startup["tree_synced"] = False
+        print("Komendy bez zmian – pomijam synchronizację")
+        return
     try:
         synced = await bot.tree.sync()
+        bot_meta[key] = fingerprint
+        startup["tree_synced"] = True
         print(f"Zsynchronizowano {len(synced)} komend")
     except Exception as e:
         print(f"Błąd synchronizacji komend: {e}")
 
-    # Uruchom pętlę pingującą kanał
-    bot.loop.create_task(ping_channel_loop())
+def medals_fingerprint() -> str:
+    # Zmiana progów lub listy medali = tabelę player_medals trzeba uzupełnić od nowa
+    rules = {medal_id: [data.get("metryka"), data.get("prog")] for medal_id, data in MEDALE.items()}
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode()).hexdigest()
 
-# Webserver do Render (aby bot nie zasypiał)
-class DummyHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        self.send_response(200)
-        self.end_headers()
-        self.wfile.write(b'Discord bot is running.')
+async def backfill_player_medals(pairs: list):
+    # Pełne uzupełnienie tabeli medali tylko raz (i po zmianie reguł) – dalej zapisujemy
+    # same zmiany przy każdym wyniku i przy /medal, /usun_medal
+    fingerprint = medals_fingerprint()
+    if bot_meta.get("medals_backfilled") == fingerprint:
+        return
+    admin = [(player_id, medal_id) for player_id, medal_ids in awarded_medals.items() for medal_id in medal_ids]
+    if await backfill_medals(pairs) and await backfill_medals(admin, source="admin"):
+        bot_meta["medals_backfilled"] = fingerprint
+        print(f"Uzupełniono tabelę medali ({len(pairs)} za statystyki, {len(admin)} przyznanych)")
 
-def start_web_server():
-    port = int(os.environ.get("PORT", 10000))
-    server = HTTPServer(("0.0.0.0", port), DummyHandler)
-    print(f"Fake web server running on port {port}")
-    server.serve_forever()
+async def load_leaderboard():
+    # Ranking ładujemy z bazy tylko raz, dalej aktualizują go zapisy statystyk
+    try:
+        leaderboard.load(await get_all_stats())
+        print(f"Załadowano ranking ({len(leaderboard)} graczy)")
+        # Medale za statystyki liczymy raz dla wszystkich, potem przy każdym zapisie
+        pairs = medal_index.load(leaderboard.rows())
+        await backfill_player_medals(pairs)
+    except Exception as e:
+        print(f"Błąd ładowania rankingu: {e}")
+
+@bot.event
+async def setup_hook():
+    # Wywoływane raz, po zalogowaniu i przed połączeniem z gatewayem – a nie przy każdym reconnect
+    write_queue.start()
+    bot.loop.create_task(load_leaderboard())
+    if stats_feed.shared:
+        bot.loop.create_task(follow_shared_stats())
+    # Przy kilku procesach komendy synchronizuje tylko ten z shardem 0
+    if is_primary(bot):
+        await sync_tree_if_changed()
+
+# Event uruchamiany po starcie bota (także po każdym ponownym połączeniu)
+@bot.event
+async def on_ready():
+    startup["ready_events"] += 1
+    if startup["time_to_ready"] is None:
+        startup["time_to_ready"] = time.perf_counter() - PROCESS_STARTED
+        print(f"Zalogowano jako {bot.user} (ID: {bot.user.id}) po {startup['time_to_ready']:.1f} s")
+    else:
+        print(f"Ponowne połączenie z Discordem ({startup['ready_events']})")
 
 if __name__ == "__main__":
     if not TOKEN:
         print("Błąd: Brak tokena w .env")
         exit(1)
 
-    threading.Thread(target=start_web_server, daemon=True).start()
-    bot.run(TOKEN)
+    async def run_bot():
+        async with bot:
+            restore_views()
+            index_tournament_matches()
+            restore_expiry()
+            state.start()
+            timer_wheel.start()
+            loop_lag.start()
+            # Pomiar czasu wszystkich komend (widoki mierzą się same – InstrumentedView)
+            instrument_tree(bot.tree)
+            if PROFILE_SLOW_HANDLERS:
+                profiler.start()
+            # Serwer zdrowia (Render) na tej samej pętli co bot
+            await health_server.start()
+            # Render przy deployu/restarcie wysyła SIGTERM – zamykamy bota, żeby wykonał się finally
+            # (bez tego proces ginie z niezapisaną kolejką statystyk i buforem StateStore)
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                try:
+                    loop.add_signal_handler(sig, lambda: asyncio.create_task(bot.close()))
+                except NotImplementedError:
+                    pass  # Windows – zostaje KeyboardInterrupt
+            try:
+                await bot.start(TOKEN)
+            finally:
+                # Zapisz zaległe statystyki i stan przed wyjściem
+                await health_server.close()
+                await message_updates.flush_all()
+                await close_stats()
+                await state.close()
+                if hasattr(active_matches, "close"):
+                    active_matches.close()
+                stats_feed.close()
+
+    discord.utils.setup_logging()
+    try:
+        asyncio.run(run_bot())
+    except KeyboardInterrupt:
+        pass
 
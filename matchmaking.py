@@ -0,0 +1,169 @@
+import time
+from bisect import bisect_left, insort
+from metrics import Histogram
+
+# Kubełki czasu oczekiwania w kolejce (sekundy)
+WAIT_BUCKETS = (5, 15, 30, 60, 120, 300, 600)
+
+
+class WaitingPlayer:
+    __slots__ = ("player_id", "rating", "channel_id", "pool", "joined_at", "expires_at", "timer")
+
+    def __init__(self, player_id: int, rating: float, channel_id: int, pool: int = 0):
+        self.player_id = player_id
+        self.rating = rating
+        self.channel_id = channel_id
+        self.pool = pool  # np. ID serwera – gracze z różnych pul nie są parowani
+        self.joined_at = time.monotonic()
+        self.expires_at = None  # koniec czasu oczekiwania (monotonic)
+        self.timer = None
+
+    @property
+    def key(self) -> tuple:
+        return (self.pool, self.rating, self.joined_at, self.player_id)
+
+    def waited(self) -> float:
+        return time.monotonic() - self.joined_at
+
+
+# --- kolejka matchmakingu ---
+# Gracze czekają na liście posortowanej po ratingu. Nowy gracz jest parowany
+# z najbliższym sąsiadem (bisect, O(log n)), jeśli różnica mieści się w tolerancji,
+# która rośnie z czasem oczekiwania. Klucz zaczyna się od puli (serwera), więc
+# sąsiedzi z innej puli są pomijani. Timeouty obsługuje wspólne koło czasowe.
+class Matchmaker:
+    def __init__(self, wheel, tolerance: float = 0.1, widen_per_minute: float = 0.1,
+                 sweep_interval: float = 15.0, on_match=None, on_timeout=None):
+        self.wheel = wheel
+        self.tolerance = tolerance
+        self.widen_per_minute = widen_per_minute
+        self.sweep_interval = sweep_interval
+        self.on_match = on_match  # async (gracz1, gracz2) – para znaleziona w tle
+        self.on_timeout = on_timeout  # async (gracz) – czas oczekiwania minął
+        self._keys = []
+        self._waiting = {}  # player_id: WaitingPlayer
+        self._sweep_timer = None
+        self.wait_time = Histogram(WAIT_BUCKETS)
+        self.matched_total = 0
+        self.timeout_total = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._waiting)
+
+    def is_waiting(self, player_id: int) -> bool:
+        return player_id in self._waiting
+
+    def _allowed_gap(self, entry: WaitingPlayer) -> float:
+        return self.tolerance + self.widen_per_minute * entry.waited() / 60
+
+    def _remove(self, entry: WaitingPlayer):
+        del self._waiting[entry.player_id]
+        i = bisect_left(self._keys, entry.key)
+        del self._keys[i]
+        if entry.timer is not None:
+            self.wheel.cancel(entry.timer)
+
+    def _closest(self, entry: WaitingPlayer):
+        # Sąsiedzi na posortowanej liście to jedyni kandydaci na najbliższy rating
+        i = bisect_left(self._keys, entry.key)
+        best = None
+        for j in (i - 1, i):
+            if 0 <= j < len(self._keys):
+                other = self._waiting[self._keys[j][-1]]
+                if other.pool != entry.pool:
+                    continue
+                gap = abs(other.rating - entry.rating)
+                if gap <= max(self._allowed_gap(entry), self._allowed_gap(other)):
+                    if best is None or gap < abs(best.rating - entry.rating):
+                        best = other
+        return best
+
+    def _matched(self, first: WaitingPlayer, second: WaitingPlayer):
+        for entry in (first, second):
+            self.wait_time.observe(entry.waited())
+        self.matched_total += 1
+
+    def join(self, player_id: int, rating: float, channel_id: int, timeout: float, pool: int = 0):
+        # Zwraca przeciwnika, jeśli para znalazła się od razu; inaczej gracz czeka w kolejce
+        entry = WaitingPlayer(player_id, rating, channel_id, pool)
+        opponent = self._closest(entry)
+        if opponent is not None:
+            self._remove(opponent)
+            self._matched(entry, opponent)
+            return opponent
+
+        entry.expires_at = entry.joined_at + timeout
+        self._insert(entry)
+        return None
+
+    def _insert(self, entry: WaitingPlayer):
+        insort(self._keys, entry.key)
+        self._waiting[entry.player_id] = entry
+        entry.timer = self.wheel.schedule(max(0.0, entry.expires_at - time.monotonic()), self._expire, entry.player_id)
+        if self._sweep_timer is None:
+            self._sweep_timer = self.wheel.schedule(self.sweep_interval, self._sweep)
+
+    def requeue(self, entry: WaitingPlayer):
+        # Przeciwnik z join(), z którym mecz jednak nie ruszył – wraca na swoje miejsce
+        # (ten sam klucz i czas dołączenia, pozostały czas oczekiwania)
+        if entry.player_id in self._waiting:
+            return
+        self.matched_total -= 1
+        self._insert(entry)
+
+    def leave(self, player_id: int) -> bool:
+        entry = self._waiting.get(player_id)
+        if entry is None:
+            return False
+        self._remove(entry)
+        return True
+
+    async def _expire(self, player_id: int):
+        entry = self._waiting.get(player_id)
+        if entry is None:
+            return
+        entry.timer = None
+        self._remove(entry)
+        self.timeout_total += 1
+        self.wait_time.observe(entry.waited())
+        if self.on_timeout is not None:
+            await self.on_timeout(entry)
+
+    async def _sweep(self):
+        # Tolerancja rośnie z czasem, więc co jakiś czas sprawdzamy sąsiednie pary
+        self._sweep_timer = None
+        pairs = []
+        i = 0
+        while i < len(self._keys) - 1:
+            first = self._waiting[self._keys[i][-1]]
+            second = self._waiting[self._keys[i + 1][-1]]
+            gap = second.rating - first.rating
+            if first.pool == second.pool and gap <= max(self._allowed_gap(first), self._allowed_gap(second)):
+                pairs.append((first, second))
+                i += 2
+            else:
+                i += 1
+
+        for first, second in pairs:
+            self._remove(first)
+            self._remove(second)
+            self._matched(first, second)
+
+        if self._waiting:
+            self._sweep_timer = self.wheel.schedule(self.sweep_interval, self._sweep)
+
+        if self.on_match is not None:
+            for first, second in pairs:
+                await self.on_match(first, second)
+
+    def metrics(self) -> dict:
+        waits = [entry.waited() for entry in self._waiting.values()]
+        return {
+            "depth": self.depth,
+            "longest_wait": max(waits, default=0.0),
+            "matched_total": self.matched_total,
+            "timeout_total": self.timeout_total,
+            "wait_p50": self.wait_time.quantile(0.5),
+            "wait_p95": self.wait_time.quantile(0.95),
+        }
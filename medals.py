@@ -0,0 +1,110 @@
+from bisect import bisect_right
+
+# --- rejestr medali ---
+# Medale z "metryka" i "prog" są przyznawane automatycznie za statystyki,
+# pozostałe przyznaje ręcznie administrator (/medal).
+MEDALE = {
+    "zwyciezca_turnieju_1": {
+        "nazwa": "🏆 Zwycięzca Pierwszego Turnieju",
+        "kolor": 0xFFD700
+    },
+    "uczestnik_turnieju_1": {
+        "nazwa": "🎖️ Uczestnik Pierwszego Turnieju",
+        "kolor": 0xAAAAAA
+    },
+    "krol_strzelcow_turnieju_1": {
+        "nazwa": "👑 Król Strzelców Pierwszego Turnieju",
+        "kolor": 0xFF4500
+    },
+
+    # Medale za wygrane
+    "wygrane_10": {"nazwa": "🏆 Zwycięzca – 10 wygranych", "kolor": 0xFFD700, "metryka": "wygrane", "prog": 10},
+    "wygrane_50": {"nazwa": "🔥 Wojownik – 50 wygranych", "kolor": 0xFFD700, "metryka": "wygrane", "prog": 50},
+    "wygrane_100": {"nazwa": "💪 Mistrz – 100 wygranych", "kolor": 0xFFD700, "metryka": "wygrane", "prog": 100},
+    "wygrane_500": {"nazwa": "👑 Legendarny Mistrz – 500 wygranych", "kolor": 0xFFD700, "metryka": "wygrane", "prog": 500},
+
+    "mecze_10": {"nazwa": "🎓 Początkujący Gracz – 10 rozegranych meczów", "kolor": 0x3498DB, "metryka": "mecze", "prog": 10},
+    "mecze_50": {"nazwa": "🐢 Maratończyk – 50 rozegranych meczów", "kolor": 0x3498DB, "metryka": "mecze", "prog": 50},
+    "mecze_100": {"nazwa": "🧱 Weteran – 100 rozegranych meczów", "kolor": 0x3498DB, "metryka": "mecze", "prog": 100},
+    "mecze_500": {"nazwa": "🐉 Legenda Discorda – 500 rozegranych meczów", "kolor": 0x3498DB, "metryka": "mecze", "prog": 500},
+
+    "gole_10": {"nazwa": "🎯 Celownik Ustawiony – 10 goli zdobytych", "kolor": 0xFF4500, "metryka": "gole", "prog": 10},
+    "gole_50": {"nazwa": "🔥 Snajper – 50 goli zdobytych", "kolor": 0xFF4500, "metryka": "gole", "prog": 50},
+    "gole_100": {"nazwa": "💥 Maszyna do goli – 100 goli zdobytych", "kolor": 0xFF4500, "metryka": "gole", "prog": 100},
+    "gole_500": {"nazwa": "🚀 Rzeźnik Bramkarzy – 500 goli zdobytych", "kolor": 0xFF4500, "metryka": "gole", "prog": 500},
+
+    "porazki_10": {"nazwa": "😬 Uczeń Pokory – 10 porażek", "kolor": 0xAAAAAA, "metryka": "porazki", "prog": 10},
+    "porazki_50": {"nazwa": "🧹 Zamiatany – 50 porażek", "kolor": 0xAAAAAA, "metryka": "porazki", "prog": 50},
+    "porazki_100": {"nazwa": "🪦 Król Przegranych – 100 porażek", "kolor": 0xAAAAAA, "metryka": "porazki", "prog": 100},
+
+    "remisy_5": {"nazwa": "🤝 Dyplomata – 5 remisów", "kolor": 0x95A5A6, "metryka": "remisy", "prog": 5},
+    "remisy_20": {"nazwa": "😐 Wieczny Remis – 20 remisów", "kolor": 0x95A5A6, "metryka": "remisy", "prog": 20},
+    "remisy_50": {"nazwa": "💤 Król Nudy – 50 remisów", "kolor": 0x95A5A6, "metryka": "remisy", "prog": 50},
+}
+
+# Medale do ręcznego przyznawania (/medal, /usun_medal)
+RECZNE_MEDALE = {medal_id: data for medal_id, data in MEDALE.items() if "metryka" not in data}
+
+# Jak liczyć każdą metrykę ze statystyk gracza (kolejność = kolejność na liście medali)
+METRYKI = {
+    "wygrane": lambda stats: stats["wins"],
+    "mecze": lambda stats: stats["wins"] + stats["losses"] + stats["draws"],
+    "gole": lambda stats: stats["goals_scored"],
+    "porazki": lambda stats: stats["losses"],
+    "remisy": lambda stats: stats["draws"],
+}
+
+
+# --- reguły medali za statystyki ---
+# Progi każdej metryki są posortowane, więc zdobyte medale to prefiks listy
+# wyznaczony jednym bisect na metrykę zamiast sprawdzania każdego progu.
+class MedalRules:
+    def __init__(self, registry: dict):
+        self._rules = {}  # metryka: ([progi rosnąco], [medal_id])
+        for metric in METRYKI:
+            rules = sorted(
+                (data["prog"], medal_id) for medal_id, data in registry.items()
+                if data.get("metryka") == metric
+            )
+            self._rules[metric] = ([prog for prog, _ in rules], [medal_id for _, medal_id in rules])
+
+    def evaluate(self, stats: dict) -> tuple:
+        earned = []
+        for metric, (thresholds, medal_ids) in self._rules.items():
+            earned.extend(medal_ids[:bisect_right(thresholds, METRYKI[metric](stats))])
+        return tuple(earned)
+
+
+# --- zdobyte medale każdego gracza, liczone przy zmianie statystyk ---
+class MedalIndex:
+    def __init__(self, rules: MedalRules):
+        self.rules = rules
+        self._earned = {}  # player_id: krotka medal_id
+        self.loaded = False
+
+    def get(self, player_id: str):
+        if player_id in self._earned:
+            return self._earned[player_id]
+        # Po załadowaniu brak wpisu = brak statystyk, więc i medali
+        return () if self.loaded else None
+
+    def update(self, player_id: str, stats: dict) -> tuple:
+        # Zwraca (nowe medale, utracone medale) względem poprzedniego stanu
+        previous = self._earned.get(player_id, ())
+        earned = self._earned[player_id] = self.rules.evaluate(stats)
+        if earned == previous:
+            return (), ()
+        return (
+            [medal_id for medal_id in earned if medal_id not in previous],
+            [medal_id for medal_id in previous if medal_id not in earned],
+        )
+
+    def load(self, rows) -> list:
+        # Zwraca wszystkie pary (player_id, medal_id) – do uzupełnienia tabeli w bazie
+        self._earned = {row["player_id"]: self.rules.evaluate(row) for row in rows}
+        self.loaded = True
+        return [(player_id, medal_id) for player_id, earned in self._earned.items() for medal_id in earned]
+
+
+medal_rules = MedalRules(MEDALE)
+medal_index = MedalIndex(medal_rules)
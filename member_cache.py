@@ -0,0 +1,137 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+import discord
+
+# Tryb oszczędzania pamięci – LOW_MEMORY=1: bez listy członków serwera w pamięci
+LOW_MEMORY = os.getenv("LOW_MEMORY", "0") == "1"
+MEMBER_CACHE_SIZE = int(os.getenv("MEMBER_CACHE_SIZE", 2000))
+# Bez intencji members nie dostajemy zmian ról – wpis w LRU wygasa po tym czasie
+MEMBER_CACHE_TTL = float(os.getenv("MEMBER_CACHE_TTL", 300))
+
+
+def client_options() -> dict:
+    # Argumenty dla commands.Bot zależnie od trybu
+    intents = discord.Intents.default()
+    if not LOW_MEMORY:
+        intents.message_content = True
+        intents.members = True
+        return {"intents": intents}
+
+    # Komendy slash dostają członka (z rolami) w samej interakcji – intencje
+    # members i message_content nie są potrzebne, a bez nich gateway nie wysyła
+    # list członków (brak chunkowania przy starcie na dużych serwerach)
+    intents.members = False
+    intents.message_content = False
+    intents.presences = False
+    intents.typing = False
+    intents.dm_typing = False
+    intents.voice_states = False
+    return {
+        "intents": intents,
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+        "chunk_guilds_at_startup": False,
+        "max_messages": None,
+    }
+
+
+# --- członkowie pobierani na żądanie, z ograniczonym cache LRU ---
+# Kolejność: cache gatewaya (pełny tryb) -> LRU -> guild.fetch_member (jedno
+# wspólne zapytanie dla równoległych wywołań o tego samego członka).
+class MemberLRU:
+    def __init__(self, maxsize: int = MEMBER_CACHE_SIZE, ttl: float = MEMBER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._members = OrderedDict()  # (guild_id, user_id): (wygasa, Member)
+        self._inflight = {}  # (guild_id, user_id): Task
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._members)
+
+    def remember(self, member):
+        if not isinstance(member, discord.Member):
+            return
+        key = (member.guild.id, member.id)
+        self._members[key] = (time.monotonic() + self.ttl, member)
+        self._members.move_to_end(key)
+        while len(self._members) > self.maxsize:
+            self._members.popitem(last=False)
+
+    def forget(self, guild_id: int, user_id: int):
+        self._members.pop((guild_id, user_id), None)
+
+    async def _fetch(self, guild, user_id: int):
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            return None
+        except discord.HTTPException as e:
+            print(f"Nie udało się pobrać członka {user_id}: {e}")
+            return None
+        self.remember(member)
+        return member
+
+    async def get(self, guild, user_id: int):
+        # Member albo None, gdy użytkownika nie ma na serwerze
+        if guild is None:
+            return None
+        member = guild.get_member(user_id)
+        if member is not None:
+            self.hits += 1
+            return member
+
+        key = (guild.id, user_id)
+        entry = self._members.get(key)
+        if entry is not None:
+            if entry[0] >= time.monotonic():
+                self._members.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._members[key]
+
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(guild, user_id))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await task
+
+    async def resolve(self, guild, user):
+        # User z opcji komendy -> Member tego serwera (role, nick); bez pobierania, jeśli już jest
+        if isinstance(user, discord.Member):
+            self.remember(user)
+            return user
+        return await self.get(guild, user.id)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._members),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+member_cache = MemberLRU()
+
+
+def process_memory() -> int:
+    # Pamięć rezydentna procesu (bajty); 0, jeśli system jej nie udostępnia
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return 0
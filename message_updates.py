@@ -0,0 +1,60 @@
+import os
+import discord
+from timers import timer_wheel
+
+# Okno zbierania zmian jednej wiadomości (sekundy)
+EDIT_WINDOW = float(os.getenv("MESSAGE_EDIT_WINDOW", 1.5))
+
+
+# --- zbiorcze edycje wiadomości ---
+# Zmiany tej samej wiadomości z jednego okna są łączone w jedną edycję, więc
+# 64 kliknięcia naraz to kilka edycji zamiast 64 (limit edycji na wiadomość).
+# Wartości mogą być funkcjami – wtedy treść (np. embed z listą graczy) budujemy
+# raz, w chwili edycji, z aktualnego stanu.
+class MessageUpdater:
+    def __init__(self, wheel, window: float = EDIT_WINDOW):
+        self.wheel = wheel
+        self.window = window
+        self._pending = {}  # message.id: [message, {pole: wartość}]
+        self._inflight = set()  # message.id aktualnie edytowanych
+        self.edits = 0
+        self.merged = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def schedule(self, message, **fields):
+        entry = self._pending.get(message.id)
+        if entry is not None:
+            entry[1].update(fields)
+            self.merged += 1
+            return
+        self._pending[message.id] = [message, dict(fields)]
+        self.wheel.schedule(self.window, self._flush, message.id)
+
+    async def _flush(self, message_id: int):
+        if message_id in self._inflight:
+            # Poprzednia edycja jeszcze trwa – nowa pójdzie w następnym oknie, zachowując kolejność
+            self.wheel.schedule(self.window, self._flush, message_id)
+            return
+        entry = self._pending.pop(message_id, None)
+        if entry is None:
+            return
+        message, fields = entry
+        kwargs = {name: value() if callable(value) else value for name, value in fields.items()}
+        self._inflight.add(message_id)
+        try:
+            await message.edit(**kwargs)
+            self.edits += 1
+        except discord.HTTPException as e:
+            print(f"Błąd edycji wiadomości {message_id}: {e}")
+        finally:
+            self._inflight.discard(message_id)
+
+    async def flush_all(self):
+        # Przy zamykaniu bota – wyślij zaległe edycje od razu
+        for message_id in list(self._pending):
+            await self._flush(message_id)
+
+
+message_updates = MessageUpdater(timer_wheel)
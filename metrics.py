@@ -0,0 +1,115 @@
+import asyncio
+from bisect import bisect_left
+from collections import deque
+
+# Domyślne progi (sekundy) – Discord daje 3 s na pierwszą odpowiedź na interakcję
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0)
+# Ile ostatnich surowych pomiarów trzyma histogram – do dokładnych percentyli
+SAMPLE_SIZE = 1024
+
+
+# --- prosty histogram z kubełkami (zgodny z formatem Prometheusa) ---
+# Kubełki liczą wszystko od startu; percentyle dla widoku admina liczymy z ostatnich
+# SAMPLE_SIZE surowych pomiarów (górna granica kubełka dawała p50 = p95 = 0.05).
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS, sample_size: int = SAMPLE_SIZE):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # ostatni kubełek = +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=sample_size)
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def cumulative(self) -> list:
+        # [(próg, liczba obserwacji <= próg), ..., ("+Inf", wszystkie)]
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q: float) -> float:
+        # Kwantyl z ostatnich pomiarów (interpolacja liniowa między sąsiednimi wartościami)
+        if not self.samples:
+            return 0.0
+        values = sorted(self.samples)
+        position = q * (len(values) - 1)
+        lower = int(position)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+# Czas od defer() do followupu dla każdej komendy
+command_latency = {}  # nazwa komendy: Histogram
+
+def observe_command_latency(command: str, seconds: float):
+    histogram = command_latency.get(command)
+    if histogram is None:
+        histogram = command_latency[command] = Histogram()
+    histogram.observe(seconds)
+
+
+# --- opóźnienie pętli zdarzeń ---
+# Task śpi stały interwał i mierzy, o ile później się obudził. Duże wartości
+# znaczą, że coś blokuje pętlę (synchroniczne I/O, ciężkie obliczenia).
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.histogram = Histogram(LAG_BUCKETS)
+        self.last = 0.0
+        self.max = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self.last = lag
+            self.max = max(self.max, lag)
+            self.histogram.observe(lag)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+
+loop_lag = LoopLagMonitor()
+
+
+# --- format tekstowy Prometheusa ---
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+def render_metric(name: str, help_text: str, samples, kind: str = "gauge") -> list:
+    # samples: liczba albo lista par (etykiety, wartość)
+    if not isinstance(samples, list):
+        samples = [({}, samples)]
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{_labels(labels)} {float(value)}" for labels, value in samples)
+    return lines
+
+def render_histogram(name: str, help_text: str, histograms: dict, label: str) -> list:
+    # histograms: wartość etykiety (np. nazwa komendy): Histogram
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for value, histogram in histograms.items():
+        for bound, total in histogram.cumulative():
+            lines.append(f'{name}_bucket{_labels({label: value, "le": bound})} {total}')
+        lines.append(f"{name}_sum{_labels({label: value})} {histogram.sum}")
+        lines.append(f"{name}_count{_labels({label: value})} {histogram.count}")
+    return lines
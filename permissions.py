@@ -0,0 +1,77 @@
+import discord
+from discord import app_commands
+
+# Role, na które patrzy bot (nazwy jak na serwerze)
+ADMIN = "Admin"
+HELPER = "HELPER"
+TURNIEJ = "Turniej"
+GRACZ = "Gracz"
+BOOSTER = "Server Booster"
+ROLE_NAMES = (ADMIN, HELPER, TURNIEJ, GRACZ, BOOSTER)
+
+NO_PERMISSION = "❌ Nie masz uprawnień do użycia tej komendy."
+
+
+# --- indeks nazwa roli -> ID roli, osobno dla każdego serwera ---
+# Budowany raz (przy pierwszym użyciu na serwerze) i odświeżany przy zdarzeniach
+# tworzenia/zmiany/usunięcia roli, zamiast skanowania listy ról przy każdej komendzie.
+class RoleIndex:
+    def __init__(self, names=ROLE_NAMES):
+        self.names = frozenset(names)
+        self._guilds = {}  # guild_id: {nazwa: frozenset(role_id)}
+        self.rebuilds = 0
+
+    def refresh(self, guild):
+        ids = {}
+        for role in guild.roles:
+            if role.name in self.names:
+                ids.setdefault(role.name, set()).add(role.id)
+        self._guilds[guild.id] = {name: frozenset(found) for name, found in ids.items()}
+        self.rebuilds += 1
+
+    def forget(self, guild_id: int):
+        self._guilds.pop(guild_id, None)
+
+    def ids(self, guild, *names) -> frozenset:
+        if guild is None:
+            return frozenset()
+        roles = self._guilds.get(guild.id)
+        if roles is None:
+            self.refresh(guild)
+            roles = self._guilds[guild.id]
+        if len(names) == 1:
+            return roles.get(names[0], frozenset())
+        return frozenset().union(*(roles.get(name, ()) for name in names))
+
+    def role(self, guild, name: str):
+        # Obiekt roli (np. do wzmianki); None, jeśli serwer jej nie ma
+        for role_id in self.ids(guild, name):
+            role = guild.get_role(role_id)
+            if role is not None:
+                return role
+        return None
+
+    def has_any(self, member, *names) -> bool:
+        # Członek ma posortowaną listę ID ról – get_role to bisect, bez budowania member.roles
+        if not isinstance(member, discord.Member):
+            return False
+        return any(member.get_role(role_id) is not None for role_id in self.ids(member.guild, *names))
+
+    def __len__(self):
+        return len(self._guilds)
+
+
+role_index = RoleIndex()
+
+
+class MissingRole(app_commands.CheckFailure):
+    pass
+
+
+def require_roles(*names, message: str = NO_PERMISSION):
+    # Dekorator komendy slash: wystarczy jedna z podanych ról
+    def predicate(interaction: discord.Interaction) -> bool:
+        if role_index.has_any(interaction.user, *names):
+            return True
+        raise MissingRole(message)
+    return app_commands.check(predicate)
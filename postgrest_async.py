@@ -0,0 +1,95 @@
+import random
+import asyncio
+import aiohttp
+
+# Statusy, przy których warto ponowić zapytanie
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class PostgrestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"PostgREST {status}: {message}")
+        self.status = status
+
+
+# --- asynchroniczny klient PostgREST (REST API Supabase) na aiohttp ---
+# Jedna sesja z pulą połączeń keep-alive zamiast wątku z executora na każde
+# zapytanie; limit równoległych zapytań i ponawianie z wykładniczym opóźnieniem.
+# Zapytania, których powtórzenie zmienia dane (np. rpc dodające delty), ponawiamy
+# tylko, gdy nie doszły do serwera (błąd nawiązania połączenia).
+class PostgrestClient:
+    def __init__(self, url: str, key: str, max_connections: int = 10, max_retries: int = 3,
+                 backoff: float = 0.5, timeout: float = 10.0):
+        self.base_url = f"{url.rstrip('/')}/rest/v1" if url else None
+        self.key = key
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._session = None
+        self._semaphore = asyncio.Semaphore(max_connections)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Sesję tworzymy leniwie – musi powstać wewnątrz działającej pętli zdarzeń
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    "apikey": self.key,
+                    "Authorization": f"Bearer {self.key}",
+                    "Content-Type": "application/json",
+                },
+            )
+        return self._session
+
+    async def request(self, method: str, path: str, params=None, json=None, headers=None,
+                      idempotent: bool = None):
+        if idempotent is None:
+            idempotent = method in ("GET", "DELETE")
+        session = self._get_session()
+        url = f"{self.base_url}/{path}"
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+            try:
+                async with self._semaphore:
+                    async with session.request(method, url, params=params, json=json, headers=headers) as response:
+                        if response.status < 300:
+                            if response.status == 204 or response.content_length == 0:
+                                return None
+                            return await response.json()
+
+                        message = await response.text()
+                        # 5xx/timeout po wysłaniu – serwer mógł już wykonać zapytanie
+                        retry = response.status in RETRY_STATUSES and (idempotent or response.status == 429)
+                        if not retry or attempt == self.max_retries:
+                            raise PostgrestError(response.status, message)
+                        retry_after = response.headers.get("Retry-After")
+                        if retry_after and retry_after.isdigit():
+                            delay = max(delay, float(retry_after))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                sent = not isinstance(e, aiohttp.ClientConnectorError)
+                if attempt == self.max_retries or (sent and not idempotent):
+                    raise
+                print(f"Błąd połączenia z bazą ({method} {path}), próba {attempt + 1}: {e}")
+            await asyncio.sleep(delay)
+
+    async def select(self, table: str, **params) -> list:
+        # params w składni PostgREST, np. player_id="eq.123", order="id.asc", limit=100
+        return await self.request("GET", table, params={"select": "*", **params}) or []
+
+    async def rpc(self, function: str, args: dict, idempotent: bool = False):
+        # idempotent=True tylko dla procedur, które można bezpiecznie wywołać drugi raz
+        return await self.request("POST", f"rpc/{function}", json=args, idempotent=idempotent)
+
+    async def upsert(self, table: str, rows: list):
+        # INSERT ... ON CONFLICT DO UPDATE po kluczu głównym tabeli
+        headers = {"Prefer": "resolution=merge-duplicates,return=minimal"}
+        await self.request("POST", table, json=rows, headers=headers, idempotent=True)
+
+    async def delete(self, table: str, **params):
+        await self.request("DELETE", table, params=params, headers={"Prefer": "return=minimal"})
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
@@ -0,0 +1,82 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from leaderboard import leaderboard
+from supabase_stats import fetch_leaderboard_page, fetch_player_stats
+
+PAGE_SIZE = 10
+PAGE_TTL = float(os.getenv("RANKING_PAGE_TTL", 30))
+
+
+# --- strony pełnego rankingu ---
+# Każda strona to jedno zapytanie do bazy (ORDER BY + keyset). Początek strony to
+# klucz ostatniego wiersza poprzedniej strony zwróconego przez bazę. Przy skoku na
+# dowolną stronę gracza granicznego wskazuje ranking w pamięci, ale jego rating
+# czytamy z bazy – suma delt w pamięci i w bazie może różnić się na ostatnich bitach
+# floata, a rating.eq musi trafić dokładnie. Wyrenderowane strony trzymamy krótko w cache.
+class RankingPages:
+    def __init__(self, render, page_size: int = PAGE_SIZE, ttl: float = PAGE_TTL, maxsize: int = 256):
+        self.render = render  # async (wiersze, pierwsze miejsce) -> wyrenderowana strona
+        self.page_size = page_size
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._pages = OrderedDict()  # numer strony: (wygasa, wyrenderowana strona, liczba wierszy)
+        self._last_keys = {}  # numer strony: (wygasa, klucz jej ostatniego wiersza w bazie)
+        self._inflight = {}  # numer strony: Task – jedno zapytanie dla równoległych kliknięć
+
+    def page_count(self):
+        if not leaderboard.loaded:
+            return None
+        return max(1, -(-len(leaderboard) // self.page_size))
+
+    def page_of(self, player_id: str):
+        rank = leaderboard.rank(player_id)
+        return None if rank is None else (rank - 1) // self.page_size
+
+    async def _cursor(self, page: int):
+        if page == 0:
+            return None
+        entry = self._last_keys.get(page - 1)
+        if entry is not None and entry[0] >= time.monotonic():
+            return entry[1]
+        if not leaderboard.loaded:
+            return None
+        boundary = leaderboard.cursor(page * self.page_size - 1)
+        if boundary is None:
+            return None
+        row = await fetch_player_stats(boundary[2])
+        return row["rating"], row["wins"], row["player_id"]
+
+    async def get(self, page: int) -> tuple:
+        # Zwraca (wyrenderowana strona, czy to pełna strona – jeśli nie, dalej nic nie ma)
+        entry = self._pages.get(page)
+        if entry is not None and entry[0] >= time.monotonic():
+            self._pages.move_to_end(page)
+            return entry[1], entry[2] == self.page_size
+
+        task = self._inflight.get(page)
+        if task is None:
+            task = self._inflight[page] = asyncio.ensure_future(self._load(page))
+            task.add_done_callback(lambda _: self._inflight.pop(page, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, page: int) -> tuple:
+        cursor = await self._cursor(page)
+        if page > 0 and cursor is None:
+            return None, False
+        rows = await fetch_leaderboard_page(cursor, self.page_size)
+        if rows:
+            last = rows[-1]
+            self._last_keys[page] = (time.monotonic() + self.ttl, (last["rating"], last["wins"], last["player_id"]))
+        rendered = await self.render(rows, page * self.page_size + 1)
+
+        self._pages[page] = (time.monotonic() + self.ttl, rendered, len(rows))
+        self._pages.move_to_end(page)
+        while len(self._pages) > self.maxsize:
+            self._pages.popitem(last=False)
+        return rendered, len(rows) == self.page_size
+
+    def clear(self):
+        self._pages.clear()
+        self._last_keys.clear()
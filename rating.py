@@ -0,0 +1,80 @@
+import os
+import numpy as np
+from local_stats import DEFAULT_RATING
+
+K_FACTOR = float(os.getenv("ELO_K_FACTOR", 32))
+# Ile meczów naraz trzymamy w pamięci przy pełnym przeliczaniu
+RECOMPUTE_CHUNK = 10_000
+
+
+def expected_score(rating_a: float, rating_b: float) -> float:
+    return 1 / (1 + 10 ** ((rating_b - rating_a) / 400))
+
+def match_score(score1: int, score2: int) -> float:
+    # Wynik meczu z perspektywy gracza 1: wygrana 1, remis 0.5, porażka 0
+    return 1.0 if score1 > score2 else 0.5 if score1 == score2 else 0.0
+
+def elo_deltas(rating1: float, rating2: float, score1: int, score2: int, k: float = K_FACTOR) -> tuple:
+    # Zmiana ratingu obu graczy po jednym meczu (suma zmian = 0)
+    delta = k * (match_score(score1, score2) - expected_score(rating1, rating2))
+    return delta, -delta
+
+
+# --- pełne przeliczenie ratingów z historii meczów (NumPy) ---
+# Mecze dzielimy na "poziomy": mecz trafia o poziom dalej niż ostatni mecz każdego
+# z jego graczy. W obrębie poziomu żaden gracz nie występuje dwa razy, więc cały
+# poziom liczymy jedną operacją na wektorach, a wynik jest identyczny z odtwarzaniem
+# meczów po kolei. Historia jest czytana paczkami, więc pamięć nie rośnie z liczbą meczów.
+class RatingRecomputation:
+    def __init__(self, k: float = K_FACTOR, initial: float = DEFAULT_RATING):
+        self.k = k
+        self.initial = initial
+        self._index = {}  # player_id: pozycja w wektorze ratingów
+        self._ratings = np.empty(0)
+
+    def _player(self, player_id: str) -> int:
+        i = self._index.get(player_id)
+        if i is None:
+            i = self._index[player_id] = len(self._index)
+            if i >= len(self._ratings):
+                grown = np.full(max(64, 2 * len(self._ratings)), self.initial)
+                grown[:len(self._ratings)] = self._ratings
+                self._ratings = grown
+        return i
+
+    def feed(self, matches):
+        # matches: (player1, player2, score1, score2) w kolejności chronologicznej
+        first, second, scores, levels = [], [], [], []
+        last_level = {}
+        for player1, player2, score1, score2 in matches:
+            i = self._player(str(player1))
+            j = self._player(str(player2))
+            if i == j:
+                continue
+            level = max(last_level.get(i, -1), last_level.get(j, -1)) + 1
+            last_level[i] = last_level[j] = level
+            first.append(i)
+            second.append(j)
+            scores.append(match_score(score1, score2))
+            levels.append(level)
+
+        if not levels:
+            return
+        levels = np.asarray(levels)
+        order = np.argsort(levels, kind="stable")
+        first = np.asarray(first)[order]
+        second = np.asarray(second)[order]
+        scores = np.asarray(scores)[order]
+        bounds = np.searchsorted(levels[order], np.arange(levels.max() + 2))
+
+        ratings = self._ratings
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            a = first[start:end]
+            b = second[start:end]
+            expected = 1 / (1 + 10 ** ((ratings[b] - ratings[a]) / 400))
+            delta = self.k * (scores[start:end] - expected)
+            ratings[a] += delta
+            ratings[b] -= delta
+
+    def result(self) -> dict:
+        return {player_id: float(self._ratings[i]) for player_id, i in self._index.items()}
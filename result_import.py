@@ -0,0 +1,112 @@
+import io
+import csv
+import json
+import re
+
+# Maksymalna liczba wierszy w jednym pliku importu
+MAX_IMPORT_ROWS = 10_000
+MENTION = re.compile(r"^<@!?(\d+)>$")
+
+# Nazwy kolumn akceptowane w pliku (CSV z nagłówkiem albo klucze obiektów JSON)
+COLUMNS = {
+    "gracz1": "player1", "player1": "player1",
+    "gracz2": "player2", "player2": "player2",
+    "gole1": "score1", "score1": "score1",
+    "gole2": "score2", "score2": "score2",
+    "wynik": "result", "result": "result",
+}
+
+
+def _player(value) -> int:
+    # ID Discorda albo wzmianka <@123>
+    text = str(value or "").strip()
+    found = MENTION.match(text)
+    if found:
+        text = found.group(1)
+    if not text.isdigit():
+        raise ValueError(f"niepoprawny gracz '{text}'")
+    return int(text)
+
+
+def _score(value) -> int:
+    text = str(value if value is not None else "").strip()
+    if not text.isdigit():
+        raise ValueError(f"niepoprawna liczba goli '{text}'")
+    return int(text)
+
+
+def parse_row(row: dict) -> tuple:
+    # Zwraca (gracz1, gracz2, gole1, gole2) albo rzuca ValueError z powodem odrzucenia
+    row = {COLUMNS[key.strip().lower()]: value for key, value in row.items()
+           if key and key.strip().lower() in COLUMNS}
+    player1 = _player(row.get("player1"))
+    player2 = _player(row.get("player2"))
+    if player1 == player2:
+        raise ValueError("ten sam gracz po obu stronach")
+
+    if row.get("result") not in (None, ""):
+        parts = str(row["result"]).strip().split("-")
+        if len(parts) != 2:
+            raise ValueError(f"wynik '{row['result']}' nie jest w formacie X-Y")
+        score1, score2 = _score(parts[0]), _score(parts[1])
+    else:
+        score1, score2 = _score(row.get("score1")), _score(row.get("score2"))
+    return player1, player2, score1, score2
+
+
+def _positional(rows):
+    for row in rows:
+        names = ("player1", "player2", "score1", "score2") if len(row) >= 4 else ("player1", "player2", "result")
+        yield dict(zip(names, row))
+
+
+def _records(data: bytes, filename: str):
+    # Kolejne (numer wiersza, słownik) bez budowania listy wszystkich wierszy
+    text = data.decode("utf-8-sig")
+    if filename.lower().endswith((".json", ".jsonl")):
+        stripped = text.lstrip()
+        if stripped.startswith("["):
+            for number, item in enumerate(json.loads(text), start=1):
+                yield number, item
+        else:
+            # JSON Lines – jeden obiekt na linię
+            for number, line in enumerate(io.StringIO(text), start=1):
+                if line.strip():
+                    yield number, json.loads(line)
+        return
+
+    lines = io.StringIO(text)
+    first = lines.readline()
+    header = next(csv.reader([first]), [])
+    if any(column.strip().lower() in COLUMNS for column in header):
+        reader = csv.DictReader(lines, fieldnames=header)
+        start = 2
+    else:
+        # Bez nagłówka: gracz1,gracz2,wynik albo gracz1,gracz2,gole1,gole2
+        lines.seek(0)
+        reader = _positional(csv.reader(lines))
+        start = 1
+    for number, row in enumerate(reader, start=start):
+        if any((value or "").strip() for value in row.values() if isinstance(value, str)):
+            yield number, row
+
+
+def iter_results(data: bytes, filename: str):
+    # Jeden przebieg po pliku: (numer wiersza, mecz albo None, powód odrzucenia albo None)
+    count = 0
+    try:
+        for number, row in _records(data, filename):
+            count += 1
+            if count > MAX_IMPORT_ROWS:
+                # Cały plik albo nic – częściowy import trudno potem uzupełnić bez duplikatów
+                yield 0, None, f"plik ma więcej niż {MAX_IMPORT_ROWS} wierszy, podziel go na mniejsze"
+                return
+            if not isinstance(row, dict):
+                yield number, None, "wiersz nie jest obiektem"
+                continue
+            try:
+                yield number, parse_row(row), None
+            except ValueError as e:
+                yield number, None, str(e)
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error) as e:
+        yield 0, None, f"nie można odczytać pliku: {e}"
@@ -0,0 +1,58 @@
+import os
+
+# --- konfiguracja shardów ---
+# SHARD_COUNT=N SHARD_IDS=0-3 -> ten proces obsługuje shardy 0..3 z N (proces na zakres shardów)
+# AUTO_SHARD=1 bez SHARD_COUNT -> wszystkie shardy w jednym procesie, liczba z zalecenia Discorda
+AUTO_SHARD = os.getenv("AUTO_SHARD", "0") == "1"
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", 0)) or None
+
+
+def parse_shard_ids(text: str):
+    # "0-3" albo "0,2,5" albo "0-1,4"; pusty tekst -> wszystkie shardy
+    if not text.strip():
+        return None
+    ids = []
+    for part in text.split(","):
+        first, _, last = part.strip().partition("-")
+        ids.extend(range(int(first), int(last or first) + 1))
+    return sorted(set(ids))
+
+
+SHARD_IDS = parse_shard_ids(os.getenv("SHARD_IDS", ""))
+
+
+def sharded() -> bool:
+    return AUTO_SHARD or SHARD_COUNT is not None
+
+
+def shard_options() -> dict:
+    # Argumenty dla commands.AutoShardedBot
+    if SHARD_COUNT is None:
+        return {}
+    if SHARD_IDS is not None and max(SHARD_IDS) >= SHARD_COUNT:
+        raise ValueError(f"SHARD_IDS {SHARD_IDS} poza zakresem 0-{SHARD_COUNT - 1}")
+    return {"shard_count": SHARD_COUNT, "shard_ids": SHARD_IDS}
+
+
+def is_primary(bot) -> bool:
+    # Zadania globalne (np. synchronizacja komend) robi tylko proces z shardem 0
+    shard_ids = getattr(bot, "shard_ids", None)
+    return shard_ids is None or 0 in shard_ids
+
+
+def shard_label() -> str:
+    if not sharded():
+        return "single"
+    if SHARD_IDS is None:
+        return "auto"
+    return f"{SHARD_IDS[0]}-{SHARD_IDS[-1]}/{SHARD_COUNT}"
+
+
+def shard_file(path: str) -> str:
+    # Osobny plik na proces: bot_state.db -> bot_state.shard0-3of8.db (jeden proces – bez zmian)
+    if not sharded():
+        return path
+    base, ext = os.path.splitext(path)
+    if SHARD_IDS is None:
+        return f"{base}.auto{ext}"
+    return f"{base}.shard{SHARD_IDS[0]}-{SHARD_IDS[-1]}of{SHARD_COUNT}{ext}"
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+
+from sharding import shard_label
+
+# Gdzie trzymać stan wspólny dla shardów: local (ten proces) albo sqlite (wspólny plik)
+SHARED_STATE = os.getenv("SHARED_STATE", "local")
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "shared_state.db")
+# Co ile sekund proces czyta zmiany statystyk zapisane przez inne shardy
+STATS_FEED_INTERVAL = float(os.getenv("STATS_FEED_INTERVAL", 1.0))
+STATS_FEED_KEEP = 3600.0  # starsze wpisy dziennika są usuwane
+
+
+# --- zajęcie graczy przez mecz (user_id -> id przeciwnika) ---
+# Gracz może być na kilku serwerach obsługiwanych przez różne shardy, więc to,
+# czy jest w meczu, musi być wspólne. claim() zajmuje obu graczy atomowo albo wcale.
+class LocalMatchClaims(MutableMapping):
+    # Jeden proces: zwykły słownik (np. PersistentDict); claim() nie ma await, więc jest atomowe w pętli
+    def __init__(self, data):
+        self._data = data
+
+    def __getitem__(self, player_id):
+        return self._data[player_id]
+
+    def __setitem__(self, player_id, opponent_id):
+        self._data[player_id] = opponent_id
+
+    def __delitem__(self, player_id):
+        del self._data[player_id]
+
+    def __iter__(self):
+        return iter(list(self._data))
+
+    def __len__(self):
+        return len(self._data)
+
+    def claim(self, player1: int, player2: int) -> bool:
+        if player1 in self._data or player2 in self._data:
+            return False
+        self._data[player1] = player2
+        self._data[player2] = player1
+        return True
+
+    def owned_items(self) -> list:
+        # Jeden proces – wszystkie wpisy są jego
+        return list(self._data.items())
+
+    def release(self, player1: int, player2: int):
+        # Zwalnia tylko wpisy tej pary (gracz mógł już zacząć inny mecz)
+        if self._data.get(player1) == player2:
+            del self._data[player1]
+        if self._data.get(player2) == player1:
+            del self._data[player2]
+
+
+class SqliteMatchClaims(MutableMapping):
+    # Kilka procesów (shardów) na jednej maszynie: wspólny plik SQLite, claim() w transakcji
+    # BEGIN IMMEDIATE – blokada zapisu na pliku, więc dwa procesy nie zajmą tego samego gracza
+    def __init__(self, path: str, owner: str = ""):
+        self.path = path
+        self.owner = owner
+        self._conn = sqlite3.connect(path, timeout=2.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS match_claims ("
+            " player_id INTEGER PRIMARY KEY, opponent_id INTEGER NOT NULL,"
+            " owner TEXT NOT NULL, claimed_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def _query(self, sql: str, args=()):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def __getitem__(self, player_id):
+        rows = self._query("SELECT opponent_id FROM match_claims WHERE player_id = ?", (player_id,))
+        if not rows:
+            raise KeyError(player_id)
+        return rows[0][0]
+
+    def __setitem__(self, player_id, opponent_id):
+        # Bez sprawdzania – do przypisań wymuszonych (np. kolejna runda turnieju)
+        self._query(
+            "INSERT INTO match_claims (player_id, opponent_id, owner, claimed_at) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (player_id) DO UPDATE SET opponent_id = excluded.opponent_id,"
+            " owner = excluded.owner, claimed_at = excluded.claimed_at",
+            (player_id, opponent_id, self.owner, time.time()),
+        )
+
+    def __delitem__(self, player_id):
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM match_claims WHERE player_id = ?", (player_id,)).rowcount
+        if not deleted:
+            raise KeyError(player_id)
+
+    def __contains__(self, player_id):
+        return bool(self._query("SELECT 1 FROM match_claims WHERE player_id = ?", (player_id,)))
+
+    def __iter__(self):
+        return iter([row[0] for row in self._query("SELECT player_id FROM match_claims")])
+
+    def __len__(self):
+        return self._query("SELECT COUNT(*) FROM match_claims")[0][0]
+
+    def claim(self, player1: int, player2: int) -> bool:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                taken = self._conn.execute(
+                    "SELECT COUNT(*) FROM match_claims WHERE player_id IN (?, ?)", (player1, player2)
+                ).fetchone()[0]
+                if taken:
+                    self._conn.execute("ROLLBACK")
+                    return False
+                self._conn.executemany(
+                    "INSERT INTO match_claims (player_id, opponent_id, owner, claimed_at) VALUES (?, ?, ?, ?)",
+                    [(player1, player2, self.owner, now), (player2, player1, self.owner, now)],
+                )
+                self._conn.execute("COMMIT")
+                return True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def owned_items(self) -> list:
+        # Tylko mecze zajęte przez ten zakres shardów – cudzych nie wygaszamy ani nie zwalniamy
+        return self._query("SELECT player_id, opponent_id FROM match_claims WHERE owner = ?", (self.owner,))
+
+    def release(self, player1: int, player2: int):
+        self._query(
+            "DELETE FROM match_claims WHERE (player_id = ? AND opponent_id = ?) OR (player_id = ? AND opponent_id = ?)",
+            (player1, player2, player2, player1),
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- zmiany statystyk między procesami ---
+# Ranking w pamięci i cache statystyk są w każdym procesie osobno. Po zapisie paczki
+# do bazy proces dopisuje jej delty do wspólnego dziennika, a pozostałe co chwilę
+# czytają nowe wpisy: delty idą do ich rankingu, a wpisy cache tych graczy są
+# usuwane (kolejny odczyt trafi do bazy, która ma już tę paczkę). Wpis bez delt
+# (None) oznacza, że zmieniły się wszystkie statystyki (np. przeliczenie ratingu).
+class LocalStatsFeed:
+    # Jeden proces – nie ma komu przekazywać zmian
+    shared = False
+
+    def publish(self, deltas):
+        pass
+
+    def poll(self) -> list:
+        return []
+
+    def close(self):
+        pass
+
+
+class SqliteStatsFeed:
+    shared = True
+
+    def __init__(self, path: str, owner: str = "", keep: float = STATS_FEED_KEEP):
+        self.path = path
+        self.owner = owner
+        self.keep = keep
+        self._conn = sqlite3.connect(path, timeout=2.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stats_feed ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, owner TEXT NOT NULL,"
+            " deltas TEXT, created_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        # Czytamy tylko to, co zapisano po starcie – wcześniejsze zmiany są już w bazie
+        self._last_id = self._query("SELECT COALESCE(MAX(id), 0) FROM stats_feed")[0][0]
+
+    def _query(self, sql: str, args=()):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def publish(self, deltas):
+        now = time.time()
+        self._query(
+            "INSERT INTO stats_feed (owner, deltas, created_at) VALUES (?, ?, ?)",
+            (self.owner, None if deltas is None else json.dumps(deltas), now),
+        )
+        self._query("DELETE FROM stats_feed WHERE created_at < ?", (now - self.keep,))
+
+    def poll(self) -> list:
+        # Nowe wpisy innych procesów, od najstarszego: lista delt albo None
+        rows = self._query(
+            "SELECT id, owner, deltas FROM stats_feed WHERE id > ? ORDER BY id", (self._last_id,)
+        )
+        if rows:
+            self._last_id = rows[-1][0]
+        return [None if deltas is None else json.loads(deltas) for _, owner, deltas in rows if owner != self.owner]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_stats_feed():
+    if SHARED_STATE == "sqlite":
+        return SqliteStatsFeed(SHARED_STATE_PATH, owner=shard_label())
+    return LocalStatsFeed()
+
+
+def create_match_claims(local_data):
+    # local_data: słownik dla trybu jednego procesu (trwały PersistentDict z StateStore)
+    if SHARED_STATE == "sqlite":
+        print(f"Wspólny stan meczów: SQLite {SHARED_STATE_PATH} (shardy {shard_label()})")
+        # Właściciel = zakres shardów (stały między restartami procesu, w przeciwieństwie do PID)
+        return SqliteMatchClaims(SHARED_STATE_PATH, owner=shard_label())
+    if SHARED_STATE != "local":
+        raise ValueError(f"Nieznany SHARED_STATE: {SHARED_STATE} (dostępne: local, sqlite)")
+    return LocalMatchClaims(local_data)
@@ -0,0 +1,162 @@
+import json
+import sqlite3
+import asyncio
+import threading
+from collections.abc import MutableMapping, MutableSet
+
+
+def encode_key(key) -> str:
+    return json.dumps(key)
+
+def decode_key(raw: str):
+    # Krotki (np. match_key) zapisują się w JSON jako listy
+    key = json.loads(raw)
+    return tuple(key) if isinstance(key, list) else key
+
+
+# --- trwały stan bota (mecze, turnieje, medale) w lokalnym SQLite ---
+# Odczyty idą z pamięci, a zmiany są zbierane i zapisywane paczkami w osobnym
+# wątku, więc pętla zdarzeń nie czeka na dysk przy każdej zmianie.
+class StateStore:
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.commit()
+        self._db_lock = threading.Lock()
+        self._dirty = {}  # (namespace, key): wartość JSON albo None (usunięcie)
+        self._task = None
+        self._closing = False
+        self._wakeup = asyncio.Event()
+
+    def load(self, namespace: str) -> dict:
+        with self._db_lock:
+            rows = self._conn.execute("SELECT key, value FROM state WHERE namespace = ?", (namespace,)).fetchall()
+        return {decode_key(key): json.loads(value) for key, value in rows}
+
+    def mark(self, namespace: str, key, value=None, deleted: bool = False):
+        self._dirty[(namespace, encode_key(key))] = None if deleted else json.dumps(value)
+
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    def _write(self, batch: dict):
+        with self._db_lock, self._conn:
+            for (namespace, key), value in batch.items():
+                if value is None:
+                    self._conn.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+                else:
+                    self._conn.execute(
+                        "INSERT INTO state (namespace, key, value) VALUES (?, ?, ?)"
+                        " ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value",
+                        (namespace, key, value),
+                    )
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        try:
+            await asyncio.to_thread(self._write, batch)
+        except Exception as e:
+            print(f"Błąd zapisu stanu ({len(batch)} zmian), ponowię później: {e}")
+            # Nowsze zmiany tych samych kluczy mają pierwszeństwo
+            self._dirty = {**batch, **self._dirty}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def close(self):
+        # Bez przerywania trwającego zapisu – pętla kończy się po bieżącym flushu
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def dict(self, namespace: str) -> "PersistentDict":
+        return PersistentDict(self, namespace)
+
+    def set(self, namespace: str) -> "PersistentSet":
+        return PersistentSet(self, namespace)
+
+
+class PersistentDict(MutableMapping):
+    # Zwykły słownik w pamięci; po zmianie wartości "w miejscu" (np. append do listy)
+    # trzeba wywołać save(key), żeby zmiana trafiła na dysk.
+    def __init__(self, store: StateStore, namespace: str):
+        self._store = store
+        self._namespace = namespace
+        self._data = store.load(namespace)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+        self._store.mark(self._namespace, key, value)
+
+    def __delitem__(self, key):
+        del self._data[key]
+        self._store.mark(self._namespace, key, deleted=True)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"PersistentDict({self._namespace!r}, {self._data!r})"
+
+    def save(self, key):
+        if key in self._data:
+            self._store.mark(self._namespace, key, self._data[key])
+
+
+class PersistentSet(MutableSet):
+    def __init__(self, store: StateStore, namespace: str):
+        self._store = store
+        self._namespace = namespace
+        self._data = set(store.load(namespace))
+
+    def __contains__(self, item):
+        return item in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def add(self, item):
+        if item not in self._data:
+            self._data.add(item)
+            self._store.mark(self._namespace, item, True)
+
+    def discard(self, item):
+        if item in self._data:
+            self._data.discard(item)
+            self._store.mark(self._namespace, item, deleted=True)
@@ -0,0 +1,174 @@
+-- Schemat bazy Supabase używany przez supabase_stats.py
+
+create table if not exists player_stats (
+    player_id text primary key,
+    wins integer not null default 0,
+    losses integer not null default 0,
+    draws integer not null default 0,
+    goals_scored integer not null default 0,
+    goals_conceded integer not null default 0,
+    rating double precision not null default 1000
+);
+
+alter table player_stats add column if not exists rating double precision not null default 1000;
+-- Kolejność rankingu (także stronicowanego po kluczu): rating, wygrane, player_id
+drop index if exists player_stats_rating_idx;
+create index if not exists player_stats_ranking_idx on player_stats (rating desc, wins desc, player_id);
+
+-- Atomowe dodanie delt statystyk wielu graczy w jednym wywołaniu (upsert z inkrementacją).
+-- deltas: [{"player_id": "...", "wins": 1, "losses": 0, "draws": 0, "goals_scored": 2, "goals_conceded": 1, "rating": 16.0}, ...]
+-- rating to zmiana ratingu Elo (nowy gracz startuje z 1000).
+create or replace function increment_player_stats(deltas jsonb)
+returns void
+language sql
+as $$
+    insert into player_stats as s (player_id, wins, losses, draws, goals_scored, goals_conceded, rating)
+    select d.player_id,
+           coalesce(sum(d.wins), 0), coalesce(sum(d.losses), 0), coalesce(sum(d.draws), 0),
+           coalesce(sum(d.goals_scored), 0), coalesce(sum(d.goals_conceded), 0),
+           1000 + coalesce(sum(d.rating), 0)
+    from jsonb_to_recordset(deltas) as d(
+        player_id text, wins integer, losses integer, draws integer,
+        goals_scored integer, goals_conceded integer, rating double precision
+    )
+    group by d.player_id
+    on conflict (player_id) do update set
+        wins = s.wins + excluded.wins,
+        losses = s.losses + excluded.losses,
+        draws = s.draws + excluded.draws,
+        goals_scored = s.goals_scored + excluded.goals_scored,
+        goals_conceded = s.goals_conceded + excluded.goals_conceded,
+        rating = s.rating + (excluded.rating - 1000);
+$$;
+
+-- Nadpisanie ratingów po pełnym przeliczeniu historii (/przelicz_ranking, rating.RatingRecomputation).
+-- ratings: [{"player_id": "...", "rating": 1043.5}, ...]
+create or replace function set_player_ratings(ratings jsonb)
+returns void
+language sql
+as $$
+    insert into player_stats as s (player_id, rating)
+    select r.player_id, r.rating
+    from jsonb_to_recordset(ratings) as r(player_id text, rating double precision)
+    on conflict (player_id) do update set rating = excluded.rating;
+$$;
+
+-- Historia meczów (tylko dopisywanie). Odczyt stronami po id (keyset pagination).
+create table if not exists match_history (
+    id bigserial primary key,
+    played_at timestamptz not null default now(),
+    player1 text not null,
+    player2 text not null,
+    score1 integer not null,
+    score2 integer not null,
+    source text not null default 'mecz',  -- 'mecz' (potwierdzony przez graczy), 'admin' (/wynik), 'import' (/import_wynikow)
+    reported_by text
+);
+create index if not exists match_history_player1_idx on match_history (player1);
+create index if not exists match_history_player2_idx on match_history (player2);
+
+-- Bilans bezpośrednich meczów każdej pary. Para posortowana jak match_key w bocie
+-- (mniejsze ID jako player_a), więc "mój bilans z X" to jeden odczyt po kluczu głównym.
+create table if not exists head_to_head (
+    player_a text not null,
+    player_b text not null,
+    wins_a integer not null default 0,
+    wins_b integer not null default 0,
+    draws integer not null default 0,
+    goals_a integer not null default 0,
+    goals_b integer not null default 0,
+    last_played timestamptz,
+    primary key (player_a, player_b)
+);
+
+-- Jednorazowe uzupełnienie z istniejącej historii (tylko gdy tabela jest pusta)
+insert into head_to_head (player_a, player_b, wins_a, wins_b, draws, goals_a, goals_b, last_played)
+select p.player_a, p.player_b,
+       count(*) filter (where p.goals_a > p.goals_b),
+       count(*) filter (where p.goals_b > p.goals_a),
+       count(*) filter (where p.goals_a = p.goals_b),
+       sum(p.goals_a), sum(p.goals_b), max(p.played_at)
+from (
+    select case when o.first then m.player1 else m.player2 end as player_a,
+           case when o.first then m.player2 else m.player1 end as player_b,
+           case when o.first then m.score1 else m.score2 end as goals_a,
+           case when o.first then m.score2 else m.score1 end as goals_b,
+           m.played_at
+    from match_history m,
+    lateral (select m.player1::numeric < m.player2::numeric as first) o
+) p
+where not exists (select 1 from head_to_head)
+group by p.player_a, p.player_b;
+
+-- Identyfikatory zapisanych paczek z kolejki – ponowione wywołanie z tym samym batch_id
+-- (np. po timeoucie odpowiedzi, gdy transakcja już się wykonała) niczego nie dodaje drugi raz.
+create table if not exists applied_batches (
+    batch_id text primary key,
+    applied_at timestamptz not null default now()
+);
+
+-- Paczka z kolejki zapisów: delty statystyk, nowe wiersze historii i bilanse par w jednej transakcji.
+drop function if exists record_match_batch(jsonb, jsonb);
+create or replace function record_match_batch(deltas jsonb, matches jsonb, batch_id text default null)
+returns void
+language plpgsql
+as $$
+begin
+    if record_match_batch.batch_id is not null then
+        insert into applied_batches (batch_id) values (record_match_batch.batch_id) on conflict do nothing;
+        if not found then
+            return;  -- ta paczka jest już w bazie
+        end if;
+    end if;
+
+    perform increment_player_stats(deltas);
+
+    insert into match_history (played_at, player1, player2, score1, score2, source, reported_by)
+    select m.played_at, m.player1, m.player2, m.score1, m.score2, m.source, m.reported_by
+    from rows from (
+        jsonb_to_recordset(matches) as (
+            played_at timestamptz, player1 text, player2 text,
+            score1 integer, score2 integer, source text, reported_by text
+        )
+    ) with ordinality as m(played_at, player1, player2, score1, score2, source, reported_by, n)
+    order by m.n;
+
+    -- ID Discorda porównujemy liczbowo – tak samo sortuje para w Pythonie
+    insert into head_to_head as h (player_a, player_b, wins_a, wins_b, draws, goals_a, goals_b, last_played)
+    select p.player_a, p.player_b,
+           count(*) filter (where p.goals_a > p.goals_b),
+           count(*) filter (where p.goals_b > p.goals_a),
+           count(*) filter (where p.goals_a = p.goals_b),
+           sum(p.goals_a), sum(p.goals_b), max(p.played_at)
+    from (
+        select case when o.first then m.player1 else m.player2 end as player_a,
+               case when o.first then m.player2 else m.player1 end as player_b,
+               case when o.first then m.score1 else m.score2 end as goals_a,
+               case when o.first then m.score2 else m.score1 end as goals_b,
+               m.played_at
+        from jsonb_to_recordset(matches) as m(
+            played_at timestamptz, player1 text, player2 text, score1 integer, score2 integer
+        ),
+        lateral (select m.player1::numeric < m.player2::numeric as first) o
+    ) p
+    group by p.player_a, p.player_b
+    on conflict (player_a, player_b) do update set
+        wins_a = h.wins_a + excluded.wins_a,
+        wins_b = h.wins_b + excluded.wins_b,
+        draws = h.draws + excluded.draws,
+        goals_a = h.goals_a + excluded.goals_a,
+        goals_b = h.goals_b + excluded.goals_b,
+        last_played = greatest(h.last_played, excluded.last_played);
+end;
+$$;
+
+-- Zdobyte medale (automatyczne za statystyki i przyznane przez admina).
+-- Indeks po medal_id pozwala szybko sprawdzić, kto ma dany medal.
+create table if not exists player_medals (
+    player_id text not null,
+    medal_id text not null,
+    source text not null default 'auto',  -- 'auto' albo 'admin'
+    awarded_at timestamptz not null default now(),
+    primary key (player_id, medal_id)
+);
+create index if not exists player_medals_medal_idx on player_medals (medal_id);
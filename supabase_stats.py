@@ -1,63 +1,548 @@
 import os
+import time
+import uuid
 import asyncio
-from supabase import create_client
+from datetime import datetime, timezone
+from collections import OrderedDict
+from local_stats import STAT_FIELDS, empty_stats, LocalStatsBackend, pair_key, empty_head_to_head, add_match
+from rating import elo_deltas
+from postgrest_async import PostgrestClient
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# "supabase" (domyślnie) albo "local" – statystyki trzymane w pamięci procesu
+STATS_BACKEND = os.getenv("STATS_BACKEND", "supabase")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+if STATS_BACKEND == "local":
+    db = None
+    local_backend = LocalStatsBackend()
+else:
+    db = PostgrestClient(
+        SUPABASE_URL,
+        SUPABASE_KEY,
+        max_connections=int(os.getenv("DB_MAX_CONNECTIONS", 10)),
+        max_retries=int(os.getenv("DB_MAX_RETRIES", 3)),
+    )
+    local_backend = None
 
-# --- synchroniczne funkcje, które wykonują zapytania ---
-def get_player_stats_sync(player_id: str) -> dict:
-    response = supabase.table("player_stats").select("*").eq("player_id", player_id).execute()
-    data = response.data
+
+def match_deltas(player1, player2, score1: int, score2: int, ratings=None) -> list:
+    # Delty statystyk obu graczy dla jednego meczu;
+    # ratings = (rating1, rating2) przed meczem -> dochodzi zmiana ratingu Elo
+    rating1, rating2 = elo_deltas(*ratings, score1, score2) if ratings else (0, 0)
+    return [
+        {
+            "player_id": str(player1),
+            "wins": 1 if score1 > score2 else 0,
+            "losses": 1 if score1 < score2 else 0,
+            "draws": 1 if score1 == score2 else 0,
+            "goals_scored": score1,
+            "goals_conceded": score2,
+            "rating": rating1,
+        },
+        {
+            "player_id": str(player2),
+            "wins": 1 if score2 > score1 else 0,
+            "losses": 1 if score2 < score1 else 0,
+            "draws": 1 if score2 == score1 else 0,
+            "goals_scored": score2,
+            "goals_conceded": score1,
+            "rating": rating2,
+        },
+    ]
+
+
+def match_record(player1, player2, score1: int, score2: int, source: str, reported_by=None) -> dict:
+    # Wiersz tabeli match_history
+    return {
+        "played_at": datetime.now(timezone.utc).isoformat(),
+        "player1": str(player1),
+        "player2": str(player2),
+        "score1": score1,
+        "score2": score2,
+        "source": source,
+        "reported_by": str(reported_by) if reported_by is not None else None,
+    }
+
+
+# --- zapytania do bazy (natywnie async, bez wątków) ---
+async def fetch_player_stats(player_id: str) -> dict:
+    if local_backend is not None:
+        return local_backend.get(player_id) or empty_stats(player_id)
+
+    data = await db.select("player_stats", player_id=f"eq.{player_id}")
     if data:
         return data[0]
     else:
-        return {
-            "player_id": player_id,
-            "wins": 0,
-            "losses": 0,
-            "draws": 0,
-            "goals_scored": 0,
-            "goals_conceded": 0,
-        }
+        return empty_stats(player_id)
 
-def update_player_stats_sync(player_id: str, wins=0, losses=0, draws=0, goals_scored=0, goals_conceded=0):
-    response = supabase.table("player_stats").select("*").eq("player_id", player_id).execute()
-    data = response.data
+def _stats_payload(deltas: list) -> list:
+    return [{"player_id": d["player_id"], **{f: d.get(f, 0) for f in STAT_FIELDS}} for d in deltas]
 
-    if data:
-        stats = data[0]
-        updated_stats = {
-            "wins": stats.get("wins", 0) + wins,
-            "losses": stats.get("losses", 0) + losses,
-            "draws": stats.get("draws", 0) + draws,
-            "goals_scored": stats.get("goals_scored", 0) + goals_scored,
-            "goals_conceded": stats.get("goals_conceded", 0) + goals_conceded,
-        }
-        supabase.table("player_stats").update(updated_stats).eq("player_id", player_id).execute()
-    else:
-        new_stats = {
-            "player_id": player_id,
-            "wins": wins,
-            "losses": losses,
-            "draws": draws,
-            "goals_scored": goals_scored,
-            "goals_conceded": goals_conceded,
-        }
-        supabase.table("player_stats").insert(new_stats).execute()
+async def record_match_batch(deltas: list, matches: list, batch_id: str = None):
+    # Statystyki i historia meczów w jednej transakcji – procedura record_match_batch.
+    # Z batch_id baza pomija paczkę zapisaną już wcześniej, więc można ją bezpiecznie ponowić.
+    if local_backend is not None:
+        local_backend.record_batch(_stats_payload(deltas), matches, batch_id)
+        return
+
+    await db.rpc("record_match_batch", {"deltas": _stats_payload(deltas), "matches": matches, "batch_id": batch_id},
+                 idempotent=batch_id is not None)
+
+async def get_match_history_page(after_id: int = 0, limit: int = 1000) -> list:
+    # Paginacja po kluczu (id > ostatnie id), a nie offsetem – każda strona to szybki odczyt z indeksu
+    if local_backend is not None:
+        return local_backend.history_page(after_id, limit)
+
+    return await db.select("match_history", id=f"gt.{after_id}", order="id.asc", limit=limit)
+
+async def fetch_all_stats(page_size: int = 1000) -> list:
+    if local_backend is not None:
+        return local_backend.get_all()
+
+    # PostgREST zwraca najwyżej max-rows wierszy, więc czytamy stronami po player_id
+    rows = []
+    last_id = None
+    while True:
+        params = {"order": "player_id.asc", "limit": page_size}
+        if last_id is not None:
+            params["player_id"] = f"gt.{last_id}"
+        page = await db.select("player_stats", **params)
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        last_id = page[-1]["player_id"]
+
+async def fetch_leaderboard_page(after=None, limit: int = 10) -> list:
+    # Strona rankingu posortowana po stronie bazy (indeks player_stats_ranking_idx).
+    # after = (rating, wins, player_id) ostatniego gracza poprzedniej strony – keyset zamiast offsetu.
+    if local_backend is not None:
+        return local_backend.leaderboard_page(after, limit)
+
+    params = {"order": "rating.desc,wins.desc,player_id.asc", "limit": limit}
+    if after is not None:
+        rating, wins, player_id = after
+        params["or"] = (
+            f"(rating.lt.{rating!r},"
+            f"and(rating.eq.{rating!r},wins.lt.{wins}),"
+            f"and(rating.eq.{rating!r},wins.eq.{wins},player_id.gt.{player_id}))"
+        )
+    return await db.select("player_stats", **params)
+
+async def fetch_head_to_head(player_a: str, player_b: str) -> dict:
+    # Jeden odczyt po kluczu głównym (player_a, player_b) zamiast przeglądania historii
+    if local_backend is not None:
+        return local_backend.head_to_head(player_a, player_b) or empty_head_to_head(player_a, player_b)
+
+    rows = await db.select("head_to_head", player_a=f"eq.{player_a}", player_b=f"eq.{player_b}")
+    return rows[0] if rows else empty_head_to_head(player_a, player_b)
 
-def get_all_stats_sync():
-    response = supabase.table("player_stats").select("*").execute()
-    return response.data if response.data else []
+async def store_ratings(ratings: dict):
+    # Nadpisuje ratingi (po pełnym przeliczeniu) – procedura set_player_ratings
+    if local_backend is not None:
+        local_backend.set_ratings(ratings)
+        return
+
+    payload = [{"player_id": player_id, "rating": rating} for player_id, rating in ratings.items()]
+    await db.rpc("set_player_ratings", {"ratings": payload}, idempotent=True)
+
+async def upsert_player_medals(rows: list):
+    # rows: [{"player_id": ..., "medal_id": ..., "source": "auto" | "admin"}]
+    if not rows:
+        return
+    if local_backend is not None:
+        local_backend.upsert_medals(rows)
+        return
+
+    await db.upsert("player_medals", rows)
+
+async def delete_player_medals(player_id: str, medal_ids: list):
+    if not medal_ids:
+        return
+    if local_backend is not None:
+        local_backend.delete_medals(player_id, medal_ids)
+        return
+
+    await db.delete("player_medals", player_id=f"eq.{player_id}", medal_id=f"in.({','.join(medal_ids)})")
+
+async def get_medal_holders(medal_id: str, limit: int = 1000) -> list:
+    # Odczyt z indeksu po medal_id – bez przeglądania statystyk wszystkich graczy
+    if local_backend is not None:
+        return local_backend.medal_holders(medal_id)[:limit]
+
+    rows = await db.select("player_medals", medal_id=f"eq.{medal_id}", order="awarded_at.asc", limit=limit)
+    return [row["player_id"] for row in rows]
+
+# --- API dla bota: cache, kolejka zapisów i powiadomienia ---
+async def _read_consistent(fetch, *args, attempts: int = 3, lock: bool = False) -> tuple:
+    # Odczyt z bazy jest spójny z kolejką tylko, jeśli w międzyczasie nie było flusha
+    # (inaczej delta mogłaby zostać policzona dwa razy albo wcale) – wtedy ponów.
+    # Zwraca (wynik, czy spójny); po ostatniej próbie wynik może być niespójny,
+    # chyba że lock=True – wtedy jeszcze jeden odczyt przy wstrzymanym flushu.
+    for _ in range(attempts):
+        version = write_queue.version
+        result = await fetch(*args)
+        consistent = version % 2 == 0 and version == write_queue.version
+        if consistent:
+            break
+    if not consistent and lock:
+        async with write_queue._flush_lock:
+            result = await fetch(*args)
+        consistent = True
+    return result, consistent
 
-# --- async wrappery wywołujące sync funkcje w osobnym wątku ---
 async def get_player_stats(player_id: str) -> dict:
-    return await asyncio.to_thread(get_player_stats_sync, player_id)
+    cached = stats_cache.get(player_id)
+    if cached is not None:
+        return cached
+
+    stats, consistent = await _read_consistent(fetch_player_stats, player_id)
+    stats = dict(stats)
+    deltas = [write_queue.pending_delta(player_id)]
+    if not consistent:
+        # Wynik przybliżony (nie trafi do cache) – zakładamy, że trwający flush jeszcze nie doszedł
+        deltas.append(write_queue.inflight_delta(player_id))
+    for delta in deltas:
+        if delta:
+            for field in STAT_FIELDS:
+                stats[field] = stats.get(field, 0) + delta[field]
+
+    if consistent:
+        stats_cache.put(player_id, stats)
+    return dict(stats)
 
-async def update_player_stats(player_id: str, wins=0, losses=0, draws=0, goals_scored=0, goals_conceded=0):
-    await asyncio.to_thread(update_player_stats_sync, player_id, wins, losses, draws, goals_scored, goals_conceded)
+async def get_head_to_head(player1, player2) -> dict:
+    # Bilans z perspektywy player1; mecze czekające w kolejce zapisów są doliczane
+    player_a, player_b = pair_key(player1, player2)
+    row, consistent = await _read_consistent(fetch_head_to_head, str(player_a), str(player_b))
+    row = dict(row)
+    matches = write_queue.pending_match_records()
+    if not consistent:
+        matches += write_queue.inflight_match_records()
+    for match in matches:
+        if pair_key(match["player1"], match["player2"]) == (player_a, player_b):
+            add_match(row, match)
+
+    first = int(player1) == player_a
+    return {
+        "wins": row["wins_a"] if first else row["wins_b"],
+        "losses": row["wins_b"] if first else row["wins_a"],
+        "draws": row["draws"],
+        "goals_for": row["goals_a"] if first else row["goals_b"],
+        "goals_against": row["goals_b"] if first else row["goals_a"],
+        "matches": row["wins_a"] + row["wins_b"] + row["draws"],
+        "last_played": row["last_played"],
+    }
+
+async def set_ratings(ratings: dict):
+    # Ratingi z przeliczenia zastępują dotychczasowe, więc cache trzeba wyczyścić
+    await store_ratings(ratings)
+    stats_cache.clear()
+
+async def stream_match_history(page_size: int = 1000):
+    # Asynchroniczny generator stron historii (od najstarszego meczu).
+    # W pamięci jest zawsze najwyżej jedna strona, niezależnie od liczby meczów.
+    after_id = 0
+    while True:
+        page = await get_match_history_page(after_id, page_size)
+        if not page:
+            return
+        yield page
+        after_id = page[-1]["id"]
 
 async def get_all_stats():
-    return await asyncio.to_thread(get_all_stats_sync)
+    # Baza + delty czekające w kolejce. Odczyt wszystkich stron trwa dłużej niż odstęp
+    # między flushami, więc bez blokady paczka zapisana w trakcie mogłaby przepaść
+    # na stałe z rankingu w pamięci – w ostateczności wstrzymujemy flush na czas odczytu.
+    rows, _ = await _read_consistent(fetch_all_stats, lock=True)
+    rows = {row["player_id"]: dict(row) for row in rows}
+    for player_id, delta in write_queue.pending_items():
+        row = rows.setdefault(player_id, empty_stats(player_id))
+        for field in STAT_FIELDS:
+            row[field] = row.get(field, 0) + delta[field]
+    return list(rows.values())
+
+
+# --- powiadomienia o zmianach statystyk (np. ranking w pamięci) ---
+_stats_listeners = []
+
+def on_stats_change(callback):
+    _stats_listeners.append(callback)
+    return callback
+
+# Po zapisie paczki do bazy (np. dziennik zmian dla innych shardów)
+_flush_listeners = []
+
+def on_stats_flushed(callback):
+    _flush_listeners.append(callback)
+    return callback
+
+def _notify(listeners: list, deltas: list):
+    for callback in listeners:
+        try:
+            callback(deltas)
+        except Exception as e:
+            print(f"Błąd w obsłudze zmiany statystyk ({callback.__name__}): {e}")
+
+def _notify_stats_change(deltas: list):
+    _notify(_stats_listeners, deltas)
+
+
+# --- kolejka zapisów w tle (write-behind) ---
+# Handlery tylko dodają delty do kolejki i od razu odpowiadają Discordowi.
+# Delty tego samego gracza są sumowane, a całość trafia do bazy jednym
+# wywołaniem record_match_batch po przekroczeniu rozmiaru lub czasu.
+# Paczka, której zapis się nie powiódł, jest wysyłana ponownie bez zmian i z tym
+# samym batch_id – jeśli baza zapisała ją mimo błędu odpowiedzi, pominie duplikat.
+class StatsWriteQueue:
+    def __init__(self, max_batch: int = 50, flush_interval: float = 2.0):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._pending = {}  # player_id: delta
+        self._matches = []  # wiersze match_history czekające na zapis
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+        self._flush_lock = asyncio.Lock()
+        self._inflight = {}  # paczka właśnie zapisywana do bazy
+        self._inflight_matches = []
+        self._unsent = None  # (batch_id, delty, mecze) – paczka do ponowienia po błędzie
+        self.version = 0  # nieparzysta = flush w toku
+
+    def __len__(self):
+        return len(self._pending.keys() | (self._unsent[1].keys() if self._unsent else set()))
+
+    @property
+    def pending_matches(self) -> int:
+        return len(self._matches) + (len(self._unsent[2]) if self._unsent else 0)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def pending_delta(self, player_id: str):
+        # Paczka do ponowienia liczy się jak czekająca (nie wiemy, czy baza ją ma)
+        delta = self._pending.get(player_id)
+        unsent = self._unsent[1].get(player_id) if self._unsent else None
+        if unsent is None:
+            return delta
+        if delta is None:
+            return unsent
+        return {"player_id": player_id, **{f: delta[f] + unsent[f] for f in STAT_FIELDS}}
+
+    def inflight_delta(self, player_id: str):
+        return self._inflight.get(player_id)
+
+    def pending_items(self) -> list:
+        players = dict.fromkeys(list(self._unsent[1]) if self._unsent else [])
+        players.update(dict.fromkeys(self._pending))
+        return [(player_id, self.pending_delta(player_id)) for player_id in players]
+
+    def pending_match_records(self) -> list:
+        return (list(self._unsent[2]) if self._unsent else []) + self._matches
+
+    def inflight_match_records(self) -> list:
+        return list(self._inflight_matches)
+
+    def enqueue(self, deltas: list, matches: list = ()):
+        for delta in deltas:
+            player_id = delta["player_id"]
+            current = self._pending.setdefault(player_id, {"player_id": player_id, **{f: 0 for f in STAT_FIELDS}})
+            for field in STAT_FIELDS:
+                current[field] += delta.get(field, 0)
+        self._matches.extend(matches)
+
+        if len(self._pending) >= self.max_batch or len(self._matches) >= self.max_batch:
+            self._wakeup.set()
+
+    def start(self):
+        if not self.running:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> bool:
+        # True, jeśli wszystko z kolejki trafiło do bazy. Najpierw ewentualna paczka
+        # do ponowienia (bez zmian), potem to, co czeka w kolejce – dwa osobne zapisy.
+        async with self._flush_lock:
+            for _ in range(2):
+                if self._unsent is None:
+                    if not self._pending and not self._matches:
+                        return True
+                    self._unsent = (uuid.uuid4().hex, self._pending, self._matches)
+                    self._pending, self._matches = {}, []
+                batch_id, batch, matches = self._unsent
+                self._inflight = batch
+                self._inflight_matches = matches
+                self.version += 1
+                try:
+                    await record_match_batch(list(batch.values()), matches, batch_id)
+                    self._unsent = None
+                    _notify(_flush_listeners, list(batch.values()))
+                except Exception as e:
+                    print(f"Błąd zapisu statystyk ({len(batch)} graczy, {len(matches)} meczów), ponowię później: {e}")
+                    return False
+                finally:
+                    self._inflight = {}
+                    self._inflight_matches = []
+                    self.version += 1
+            return not self._pending and not self._matches
+
+    async def close(self):
+        # Zatrzymaj pętlę (bez przerywania trwającego zapisu) i zapisz resztę kolejki
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+        if self._unsent or self._pending or self._matches:
+            print(f"⚠️ Nie udało się zapisać statystyk {len(self)} graczy "
+                  f"i {self.pending_matches} meczów przy zamykaniu.")
+
+
+write_queue = StatsWriteQueue(
+    max_batch=int(os.getenv("STATS_FLUSH_BATCH", 50)),
+    flush_interval=float(os.getenv("STATS_FLUSH_INTERVAL", 2.0)),
+)
+
+def enqueue_match_stats(player1, player2, score1: int, score2: int, ratings=None,
+                        source: str = "mecz", reported_by=None):
+    deltas = match_deltas(player1, player2, score1, score2, ratings)
+    write_queue.enqueue(deltas, [match_record(player1, player2, score1, score2, source, reported_by)])
+    stats_cache.apply(deltas)
+    _notify_stats_change(deltas)
+
+def aggregate_matches(matches, rating_of, source: str = "import", reported_by=None) -> tuple:
+    # Wiele wyników naraz: mecze liczone po kolei (Elo zależy od kolejności), delty
+    # sumowane per gracz w pamięci. Zwraca (delty graczy, wiersze match_history).
+    ratings = {}
+    totals = {}
+    records = []
+    for player1, player2, score1, score2 in matches:
+        before = tuple(ratings.get(str(p), rating_of(str(p))) for p in (player1, player2))
+        for delta in match_deltas(player1, player2, score1, score2, before):
+            player_id = delta["player_id"]
+            total = totals.setdefault(player_id, {"player_id": player_id, **{f: 0 for f in STAT_FIELDS}})
+            for field in STAT_FIELDS:
+                total[field] += delta[field]
+            ratings[player_id] = ratings.get(player_id, rating_of(player_id)) + delta["rating"]
+        records.append(match_record(player1, player2, score1, score2, source, reported_by))
+    return list(totals.values()), records
+
+async def import_matches(deltas: list, records: list):
+    # Jeden zapis record_match_batch dla całego importu (razem z resztą kolejki)
+    if not records:
+        return
+    write_queue.enqueue(deltas, records)
+    stats_cache.apply(deltas)
+    _notify_stats_change(deltas)
+    await write_queue.flush()
+
+
+# --- cache odczytów get_player_stats (TTL + LRU) ---
+# Zapisy przez kolejkę od razu aktualizują wpisy w cache, więc /statystyki
+# i /medale widzą wynik meczu, zanim trafi on do bazy.
+class StatsCache:
+    def __init__(self, maxsize: int = 1000, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # player_id: (expires_at, stats)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, player_id: str):
+        entry = self._data.get(player_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[player_id]
+            self.misses += 1
+            return None
+        self._data.move_to_end(player_id)
+        self.hits += 1
+        return dict(entry[1])
+
+    def put(self, player_id: str, stats: dict):
+        self._data[player_id] = (time.monotonic() + self.ttl, dict(stats))
+        self._data.move_to_end(player_id)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def apply(self, deltas: list):
+        for delta in deltas:
+            entry = self._data.get(delta["player_id"])
+            if entry is None:
+                continue
+            stats = entry[1]
+            for field in STAT_FIELDS:
+                stats[field] = stats.get(field, 0) + delta.get(field, 0)
+
+    def invalidate(self, player_id: str):
+        self._data.pop(player_id, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+stats_cache = StatsCache(
+    maxsize=int(os.getenv("STATS_CACHE_SIZE", 1000)),
+    ttl=float(os.getenv("STATS_CACHE_TTL", 300)),
+)
+
+
+async def close():
+    # Zapisz kolejkę i zamknij pulę połączeń z bazą
+    await write_queue.close()
+    if db is not None:
+        await db.close()
+
+
+# --- zapisy medali w tle (rzadkie: tylko przy przekroczeniu progu lub /medal) ---
+_background_tasks = set()
+
+async def sync_player_medals(player_id: str, added: list, removed: list, source: str = "auto"):
+    try:
+        await upsert_player_medals([
+            {"player_id": player_id, "medal_id": medal_id, "source": source} for medal_id in added
+        ])
+        await delete_player_medals(player_id, removed)
+    except Exception as e:
+        print(f"Błąd zapisu medali gracza {player_id}: {e}")
+
+def queue_medal_changes(player_id: str, added: list, removed: list = (), source: str = "auto"):
+    task = asyncio.create_task(sync_player_medals(player_id, list(added), list(removed), source))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+async def backfill_medals(pairs: list, source: str = "auto", chunk: int = 500) -> bool:
+    # Uzupełnienie player_medals (upsert, więc można powtarzać); True, jeśli wszystko zapisane
+    try:
+        for i in range(0, len(pairs), chunk):
+            await upsert_player_medals([
+                {"player_id": player_id, "medal_id": medal_id, "source": source}
+                for player_id, medal_id in pairs[i:i + chunk]
+            ])
+    except Exception as e:
+        print(f"Błąd uzupełniania tabeli medali: {e}")
+        return False
+    return True
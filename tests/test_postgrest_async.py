@@ -0,0 +1,110 @@
+### Testy ponawiania w PostgrestClient na lokalnym serwerze-atrapie (aiohttp.web) ###
+# Uruchomienie: python -m pytest -q
+
+import time
+import asyncio
+import pytest
+from aiohttp import web
+
+from postgrest_async import PostgrestClient, PostgrestError
+
+
+def reply(status: int = 200, body=None, headers=None):
+    # Fabryka odpowiedzi – web.Response można wysłać tylko raz, a odpowiedź się powtarza
+    if body is None:
+        return lambda: web.Response(status=status, headers=headers)
+    if isinstance(body, str):
+        return lambda: web.Response(status=status, text=body, headers=headers)
+    return lambda: web.json_response(body, status=status, headers=headers)
+
+
+# --- serwer-atrapa: kolejne odpowiedzi z listy, ostatnia powtarzana ---
+class StubServer:
+    def __init__(self, responses: list):
+        self.responses = list(responses)  # fabryki web.Response dla kolejnych zapytań
+        self.calls = 0
+        self._runner = None
+        self.url = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.calls += 1
+        if len(self.responses) > 1:
+            return self.responses.pop(0)()
+        return self.responses[0]()
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_route("*", "/rest/v1/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._runner.cleanup()
+
+
+def run(responses: list, call, **options):
+    # Zwraca (wynik albo wyjątek, liczba zapytań, czas w sekundach)
+    async def scenario():
+        async with StubServer(responses) as server:
+            client = PostgrestClient(server.url, "klucz", **{"backoff": 0.01, **options})
+            started = time.perf_counter()
+            try:
+                result = await call(client)
+            except PostgrestError as e:
+                result = e
+            finally:
+                await client.close()
+            return result, server.calls, time.perf_counter() - started
+    return asyncio.run(scenario())
+
+
+def test_get_retried_after_503_until_success():
+    responses = [reply(503, "busy"), reply(503, "busy"), reply(200, [{"player_id": "1"}])]
+    result, calls, _ = run(responses, lambda client: client.select("player_stats"))
+    assert result == [{"player_id": "1"}]
+    assert calls == 3
+
+
+def test_non_idempotent_rpc_not_retried():
+    responses = [reply(503, "busy"), reply(200, {"ok": True})]
+    result, calls, _ = run(responses, lambda client: client.rpc("record_match_batch", {"deltas": []}))
+    assert isinstance(result, PostgrestError) and result.status == 503
+    assert calls == 1
+
+
+def test_idempotent_rpc_retried_up_to_max_retries():
+    responses = [reply(502, "bad gateway")]
+    result, calls, _ = run(
+        responses, lambda client: client.rpc("record_match_batch", {"batch_id": "a"}, idempotent=True),
+        max_retries=2,
+    )
+    assert isinstance(result, PostgrestError) and result.status == 502
+    assert calls == 3  # pierwsza próba + max_retries
+
+
+def test_429_waits_for_retry_after():
+    responses = [reply(429, "slow down", {"Retry-After": "1"}), reply(200, [])]
+    result, calls, elapsed = run(responses, lambda client: client.select("player_stats"))
+    assert result == []
+    assert calls == 2
+    assert elapsed >= 1.0
+
+
+def test_429_retried_for_non_idempotent_rpc():
+    # 429 = serwer odrzucił zapytanie przed wykonaniem, więc ponowienie jest bezpieczne
+    responses = [reply(429, "slow down"), reply(200, {"ok": True})]
+    result, calls, _ = run(responses, lambda client: client.rpc("record_match_batch", {"deltas": []}))
+    assert result == {"ok": True}
+    assert calls == 2
+
+
+@pytest.mark.parametrize("response", [reply(204), reply(200, "")])
+def test_empty_response_returns_none(response):
+    result, calls, _ = run([response], lambda client: client.rpc("set_player_ratings", {"ratings": []}))
+    assert result is None
+    assert calls == 1
@@ -0,0 +1,81 @@
+import math
+import asyncio
+import itertools
+
+
+# --- koło czasowe (timer wheel) ---
+# Jeden task obsługuje wszystkie timeouty bota: dodanie i anulowanie to O(1),
+# a co tick sprawdzany jest tylko jeden slot zamiast osobnego zadania na każdy timer.
+class TimerWheel:
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        self.tick = tick
+        self._slots = [{} for _ in range(slots)]  # handle: [rounds, callback, args]
+        self._where = {}  # handle: indeks slotu
+        self._cursor = 0
+        self._ids = itertools.count(1)
+        self._task = None
+
+    def __len__(self):
+        return len(self._where)
+
+    def schedule(self, delay: float, callback, *args) -> int:
+        ticks = max(1, math.ceil(delay / self.tick))
+        slot = (self._cursor + ticks) % len(self._slots)
+        rounds = (ticks - 1) // len(self._slots)
+        handle = next(self._ids)
+        self._slots[slot][handle] = [rounds, callback, args]
+        self._where[handle] = slot
+        return handle
+
+    def cancel(self, handle) -> bool:
+        slot = self._where.pop(handle, None)
+        if slot is None:
+            return False
+        del self._slots[slot][handle]
+        return True
+
+    def _advance(self):
+        self._cursor = (self._cursor + 1) % len(self._slots)
+        bucket = self._slots[self._cursor]
+        due = []
+        for handle, entry in bucket.items():
+            if entry[0] > 0:
+                entry[0] -= 1
+            else:
+                due.append(handle)
+
+        for handle in due:
+            _, callback, args = bucket.pop(handle)
+            del self._where[handle]
+            try:
+                result = callback(*args)
+                if asyncio.iscoroutine(result):
+                    asyncio.create_task(result)
+            except Exception as e:
+                print(f"Błąd w timerze {getattr(callback, '__name__', callback)}: {e}")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time() + self.tick
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            # Nadrabiamy ticki, jeśli pętla była zablokowana dłużej niż tick
+            while next_tick <= loop.time():
+                self._advance()
+                next_tick += self.tick
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+timer_wheel = TimerWheel()
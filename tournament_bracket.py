@@ -0,0 +1,280 @@
+import math
+
+FORMATY = {
+    "single": "Pojedyncza eliminacja",
+    "double": "Podwójna eliminacja",
+    "swiss": "System szwajcarski",
+}
+
+# Punkty w systemie szwajcarskim (jak w lidze piłkarskiej)
+SWISS_WIN = 3
+SWISS_DRAW = 1
+
+
+def seed_positions(size: int) -> list:
+    # Klasyczne rozstawienie drabinki: 1 vs n, 2 vs n-1..., najwyżej rozstawieni spotykają się najpóźniej
+    positions = [1]
+    while len(positions) < size:
+        total = 2 * len(positions) + 1
+        positions = [p for seed in positions for p in (seed, total - seed)]
+    return positions
+
+
+# --- drabinka turnieju ---
+# Stan to zwykły słownik (JSON), więc zapisuje się razem z turniejem w state_store.
+# Każda runda tworzy od razu wszystkie mecze; gdy ostatni wynik rundy zostanie
+# zgłoszony, kolejna runda jest generowana automatycznie.
+class Bracket:
+    def __init__(self, data: dict):
+        self.data = data
+
+    @classmethod
+    def create(cls, format: str, seeded_players: list, rounds: int = None) -> "Bracket":
+        # seeded_players: od najwyżej rozstawionego (np. po ratingu)
+        if format not in FORMATY:
+            raise ValueError(f"Nieznany format turnieju: {format}")
+        players = [int(p) for p in seeded_players]
+        data = {
+            "format": format,
+            "players": players,
+            "round": 0,
+            "matches": [],
+            "champion": None,
+        }
+        if format == "single":
+            data["alive"] = cls._seeded_order(players)
+        elif format == "double":
+            data["alive"] = cls._seeded_order(players)
+            data["losers"] = []
+        else:
+            data["rounds"] = rounds or max(1, math.ceil(math.log2(len(players))))
+            data["points"] = {str(p): 0 for p in players}
+            data["opponents"] = {str(p): [] for p in players}
+            data["byes"] = []
+        bracket = cls(data)
+        bracket._next_round()
+        return bracket
+
+    @staticmethod
+    def _seeded_order(players: list) -> list:
+        # Pozycje w drabince; brakujące miejsca (None) to wolne losy dla najwyżej rozstawionych
+        size = 1 << max(1, math.ceil(math.log2(len(players))))
+        return [players[seed - 1] if seed <= len(players) else None for seed in seed_positions(size)]
+
+    @property
+    def format(self) -> str:
+        return self.data["format"]
+
+    @property
+    def round(self) -> int:
+        return self.data["round"]
+
+    @property
+    def finished(self) -> bool:
+        return self.data["champion"] is not None
+
+    @property
+    def champion(self):
+        return self.data["champion"]
+
+    def round_matches(self, round_number: int = None) -> list:
+        round_number = self.round if round_number is None else round_number
+        return [m for m in self.data["matches"] if m["round"] == round_number]
+
+    def pending_matches(self) -> list:
+        return [m for m in self.round_matches() if m["winner"] is None and not m["draw"]]
+
+    def find_pending(self, player1: int, player2: int):
+        pair = {int(player1), int(player2)}
+        for match in self.pending_matches():
+            if {match["p1"], match["p2"]} == pair:
+                return match
+        return None
+
+    def match_for(self, player_id: int):
+        for match in self.pending_matches():
+            if player_id in (match["p1"], match["p2"]):
+                return match
+        return None
+
+    def _add_match(self, p1, p2, stage: str = ""):
+        match = {
+            "id": len(self.data["matches"]) + 1,
+            "round": self.round,
+            "stage": stage,
+            "p1": p1,
+            "p2": p2,
+            "score": None,
+            "winner": None,
+            "draw": False,
+        }
+        if p2 is None:
+            match["winner"] = p1  # wolny los
+        self.data["matches"].append(match)
+        return match
+
+    @staticmethod
+    def _pair_in_order(players: list) -> list:
+        # Sąsiednie pozycje grają ze sobą; nieparzysty ostatni dostaje wolny los
+        pairs = [(players[i], players[i + 1]) for i in range(0, len(players) - 1, 2)]
+        if len(players) % 2:
+            pairs.append((players[-1], None))
+        return pairs
+
+    def report(self, player1: int, player2: int, score1: int, score2: int) -> str:
+        # Zwraca: "brak" (to nie jest mecz turnieju), "remis" (w eliminacji trzeba zagrać ponownie),
+        # "ok" (runda trwa), "runda" (nowa runda utworzona), "koniec" (turniej rozstrzygnięty)
+        match = self.find_pending(player1, player2)
+        if match is None:
+            return "brak"
+        if match["p1"] != int(player1):
+            score1, score2 = score2, score1
+
+        if score1 == score2:
+            if self.format != "swiss":
+                return "remis"
+            match["draw"] = True
+        match["score"] = [score1, score2]
+        if score1 != score2:
+            match["winner"] = match["p1"] if score1 > score2 else match["p2"]
+
+        if self.pending_matches():
+            return "ok"
+        self._next_round()
+        return "koniec" if self.finished else "runda"
+
+    def _next_round(self):
+        getattr(self, f"_next_{self.format}")()
+        # Runda złożona wyłącznie z wolnych losów rozstrzyga się od razu
+        if not self.finished and not self.pending_matches():
+            self._next_round()
+
+    # --- pojedyncza eliminacja ---
+    def _next_single(self):
+        if self.round > 0:
+            self.data["alive"] = [m["winner"] for m in self.round_matches()]
+        alive = self.data["alive"]
+        if len(alive) == 1:
+            self.data["champion"] = alive[0]
+            return
+        self.data["round"] += 1
+        for p1, p2 in self._pair_in_order(alive):
+            if p1 is None:
+                p1, p2 = p2, None
+            self._add_match(p1, p2)
+
+    # --- podwójna eliminacja ---
+    def _next_double(self):
+        if self.round > 0:
+            winners, losers = [], list(self.data["losers"])
+            for match in self.round_matches():
+                loser = match["p2"] if match["winner"] == match["p1"] else match["p1"]
+                if match["stage"] == "W":
+                    winners.append(match["winner"])
+                    if loser is not None:
+                        losers.append(loser)  # pierwsza porażka – spada do dolnej drabinki
+                elif match["stage"] == "L":
+                    losers.append(match["winner"])  # przegrany odpada
+                elif match["stage"] == "F" and match["winner"] == match["p2"]:
+                    # Zwycięzca dolnej drabinki wygrał finał – obaj mają po porażce, gramy rewanż
+                    self.data["round"] += 1
+                    self._add_match(match["p1"], match["p2"], "F2")
+                    return
+                else:
+                    self.data["champion"] = match["winner"]  # finał
+                    return
+            # Gracze czekający w dolnej drabince (wolny los) są już w "losers"
+            self.data["alive"] = winners
+            self.data["losers"] = losers
+
+        alive = self.data["alive"]  # w 1. rundzie z pustymi miejscami (None) na wolne losy
+        losers = self.data["losers"]
+        real_alive = [p for p in alive if p is not None]
+        self.data["round"] += 1
+
+        if len(real_alive) == 1 and len(losers) <= 1:
+            if not losers:
+                self.data["champion"] = real_alive[0]
+                return
+            self._add_match(real_alive[0], losers[0], "F")
+            self.data["losers"] = []
+            return
+
+        if len(real_alive) > 1:
+            for p1, p2 in self._pair_in_order(alive):
+                if p1 is None:
+                    p1, p2 = p2, None
+                if p1 is not None:
+                    self._add_match(p1, p2, "W")
+        else:
+            # Zwycięzca górnej drabinki czeka na finał
+            self._add_match(real_alive[0], None, "W")
+
+        waiting = []
+        for p1, p2 in self._pair_in_order(losers):
+            if p2 is None:
+                waiting.append(p1)
+            else:
+                self._add_match(p1, p2, "L")
+        self.data["losers"] = waiting
+
+    # --- system szwajcarski ---
+    def _standings(self) -> list:
+        points = self.data["points"]
+        opponents = self.data["opponents"]
+        seed = {p: i for i, p in enumerate(self.data["players"])}
+        # Punkty, potem Buchholz (suma punktów przeciwników), potem rozstawienie
+        return sorted(
+            self.data["players"],
+            key=lambda p: (-points[str(p)], -sum(points[str(o)] for o in opponents[str(p)]), seed[p]),
+        )
+
+    def standings(self) -> list:
+        return [(p, self.data["points"][str(p)]) for p in self._standings()] if self.format == "swiss" else []
+
+    def _next_swiss(self):
+        points = self.data["points"]
+        opponents = self.data["opponents"]
+        for match in self.round_matches():
+            if match["p2"] is None:
+                points[str(match["p1"])] += SWISS_WIN
+                continue
+            opponents[str(match["p1"])].append(match["p2"])
+            opponents[str(match["p2"])].append(match["p1"])
+            if match["draw"]:
+                points[str(match["p1"])] += SWISS_DRAW
+                points[str(match["p2"])] += SWISS_DRAW
+            else:
+                points[str(match["winner"])] += SWISS_WIN
+
+        if self.round >= self.data["rounds"]:
+            self.data["champion"] = self._standings()[0]
+            return
+
+        self.data["round"] += 1
+        order = self._standings()
+        if len(order) % 2:
+            # Wolny los dla najniżej sklasyfikowanego, który jeszcze go nie miał
+            byes = set(self.data["byes"])
+            bye = next((p for p in reversed(order) if p not in byes), order[-1])
+            order.remove(bye)
+            self.data["byes"].append(bye)
+            self._add_match(bye, None)
+
+        for p1, p2 in self._swiss_pairs(order):
+            self._add_match(p1, p2)
+
+    def _swiss_pairs(self, order: list) -> list:
+        # Sąsiedzi w tabeli grają ze sobą; powtórkę naprawiamy lokalną zamianą
+        # z następną parą (sprawdzenie w zbiorze to O(1), cała runda O(n)).
+        played = {p: set(self.data["opponents"][str(p)]) for p in order}
+        pairs = [[order[i], order[i + 1]] for i in range(0, len(order), 2)]
+        for i, (a, b) in enumerate(pairs):
+            if b not in played[a] or i + 1 >= len(pairs):
+                continue
+            c, d = pairs[i + 1]
+            if c not in played[a] and d not in played[b]:
+                pairs[i][1], pairs[i + 1][0] = c, b
+            elif d not in played[a] and c not in played[b]:
+                pairs[i][1], pairs[i + 1][1] = d, b
+        return [tuple(pair) for pair in pairs]
@@ -0,0 +1,91 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+import discord
+
+# Ile nazw spoza cache gatewaya pamiętamy (przeglądanie całego rankingu nie rośnie bez końca)
+USER_NAME_CACHE_SIZE = int(os.getenv("USER_NAME_CACHE_SIZE", 5000))
+
+
+# --- rozwiązywanie nazw graczy bez seryjnych wywołań fetch_user ---
+# Kolejność: cache gatewaya (członkowie serwera / użytkownicy) -> lokalny cache z TTL
+# -> równoległe fetch_user z limitem współbieżności (discord.py sam czeka przy 429).
+# Lokalny cache to LRU z limitem rozmiaru, jak StatsCache i MemberLRU.
+class UserNameResolver:
+    def __init__(self, ttl: float = 3600.0, max_concurrency: int = 4, maxsize: int = USER_NAME_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._cache = OrderedDict()  # user_id: (expires_at, name, display_name)
+        self._inflight = {}  # user_id: Task – wspólne pobranie dla równoległych zapytań
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, user):
+        self._cache[user.id] = (time.monotonic() + self.ttl, user.name, user.display_name)
+        self._cache.move_to_end(user.id)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def _lookup(self, client, user_id: int, guild):
+        user = (guild.get_member(user_id) if guild else None) or client.get_user(user_id)
+        if user is not None:
+            return user.name, user.display_name
+
+        entry = self._cache.get(user_id)
+        if entry is not None:
+            if entry[0] >= time.monotonic():
+                self._cache.move_to_end(user_id)
+                return entry[1], entry[2]
+            del self._cache[user_id]
+        return None
+
+    async def _fetch(self, client, user_id: int):
+        async with self._semaphore:
+            try:
+                user = await client.fetch_user(user_id)
+            except discord.HTTPException as e:
+                print(f"Nie udało się pobrać użytkownika {user_id}: {e}")
+                return str(user_id), str(user_id)
+        self._remember(user)
+        return user.name, user.display_name
+
+    async def resolve(self, client, user_ids, guild=None, display: bool = True) -> dict:
+        # Zwraca {user_id: nazwa}; display=False -> nazwa konta zamiast wyświetlanej
+        names = {}
+        missing = []
+        for user_id in dict.fromkeys(int(uid) for uid in user_ids):
+            found = self._lookup(client, user_id, guild)
+            if found is None:
+                missing.append(user_id)
+            else:
+                names[user_id] = found[1] if display else found[0]
+
+        tasks = []
+        for user_id in missing:
+            task = self._inflight.get(user_id)
+            if task is None:
+                task = asyncio.ensure_future(self._fetch(client, user_id))
+                self._inflight[user_id] = task
+                task.add_done_callback(lambda _, uid=user_id: self._inflight.pop(uid, None))
+            tasks.append(task)
+
+        self.hits += len(names)
+        self.misses += len(missing)
+        for user_id, found in zip(missing, await asyncio.gather(*tasks)):
+            names[user_id] = found[1] if display else found[0]
+        return names
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._cache),
+            "maxsize": self.maxsize,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+user_names = UserNameResolver()